@@ -0,0 +1,27 @@
+"""
+Замеры производительности на реальной БД из настроек.
+
+Запуск из каталога backend: python -m benchmarks.<имя> --help
+Скрипты создают свои данные и удаляют их после замера.
+"""
+import os
+import statistics
+import time
+
+
+def setup_django():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'document_manager.settings')
+    import django
+    django.setup()
+
+
+def measure(func, repeat):
+    """Время вызовов func в мс: (p50, p95, max)"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    return statistics.median(timings), p95, timings[-1]
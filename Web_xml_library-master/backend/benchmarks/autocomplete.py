@@ -0,0 +1,70 @@
+"""
+Автодополнение и поиск по подстроке на большом числе папок.
+
+python -m benchmarks.autocomplete --folders 1000000 --repeat 50
+"""
+import argparse
+import random
+
+from benchmarks import measure, setup_django
+
+WORDS = [
+    'Проект', 'Раздел', 'Том', 'Чертежи', 'Спецификация', 'Ведомость', 'Отчет', 'Схема',
+    'Архитектура', 'Конструкции', 'Водоснабжение', 'Электроснабжение', 'Отопление', 'Связь',
+]
+
+
+def populate(structure, count, batch_size=10000):
+    from structures.models import Folder
+
+    rnd = random.Random(1)
+    for start in range(0, count, batch_size):
+        Folder.objects.bulk_create([
+            Folder(
+                structure=structure,
+                code=f'F{i:08d}',
+                name=f'{rnd.choice(WORDS)} {rnd.choice(WORDS).lower()} {i}',
+                materialized_path=f'/F{i:08d}/'
+            )
+            for i in range(start, min(start + batch_size, count))
+        ], batch_size=batch_size)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--folders', type=int, default=100000)
+    parser.add_argument('--repeat', type=int, default=30)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.db import connection
+    from django.test import Client
+    from structures.models import Structure
+
+    structure = Structure.objects.create(name='benchmark autocomplete')
+    try:
+        populate(structure, args.folders)
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE structures_folder')
+
+        client = Client()
+        cases = {
+            'autocomplete prefix': ('/api/structures/autocomplete/', 'Водоснаб'),
+            'autocomplete fuzzy': ('/api/structures/autocomplete/', 'Электроснабжние'),
+            'autocomplete code': ('/api/structures/autocomplete/', 'F0004213'),
+            'search substring': ('/api/structures/search/', 'снабжение отоп'),
+        }
+        print(f'{connection.vendor}, папок: {args.folders}')
+        for title, (url, query) in cases.items():
+            p50, p95, worst = measure(
+                lambda: client.get(url, {'q': query, 'structure_id': structure.id}, HTTP_HOST='localhost'),
+                args.repeat
+            )
+            print(f'{title:22} p50 {p50:8.2f} мс  p95 {p95:8.2f} мс  max {worst:8.2f} мс')
+    finally:
+        structure.delete()
+
+
+if __name__ == '__main__':
+    main()
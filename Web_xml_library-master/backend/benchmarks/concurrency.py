@@ -0,0 +1,155 @@
+"""
+Конкурентная нагрузка на эндпоинты чтения: синхронный (WSGI) и async (ASGI) путь.
+
+python -m benchmarks.concurrency --serve wsgi,asgi --workers 2 --concurrency 64 --requests 5000
+python -m benchmarks.concurrency --url http://127.0.0.1:8000 --concurrency 64
+
+--serve поднимает сервер на каждый режим (gunicorn с gthread для WSGI,
+uvicorn для ASGI) на той же БД из настроек; --url нагружает уже запущенный.
+Запросы идут по кругу по дереву, деталям структуры и документа, списку документов
+папки и поиску; для каждого режима печатаются запросов/с и задержки p50/p99.
+Дерево и детали структуры кэшируются - чтобы сравнивать работу с БД,
+запускайте с CACHE_BACKEND=django.core.cache.backends.dummy.DummyCache.
+"""
+import argparse
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlsplit
+
+from benchmarks import setup_django
+
+
+def sample_paths():
+    """Пути запросов на данных из БД (нужна хотя бы одна структура с папками)"""
+    from documents.models import Document, FolderDocument
+    from structures.models import Folder, Structure
+
+    structure = Structure.objects.filter(is_active=True).order_by('-folders_count').first()
+    if structure is None:
+        raise SystemExit('В БД нет структур - загрузите хотя бы одну')
+    folder = Folder.objects.filter(structure=structure).order_by('-documents_count').first()
+    paths = [
+        '/api/structures/',
+        f'/api/structures/{structure.id}/',
+        f'/api/structures/{structure.id}/folders/?depth=2',
+        f'/api/structures/search/?q={folder.code if folder else "a"}',
+        '/api/documents/search/?limit=50',
+    ]
+    if folder is not None:
+        paths.append(f'/api/documents/folder/{folder.id}/?limit=50')
+    link = FolderDocument.objects.filter(folder__structure=structure).first()
+    document = link.document if link else Document.objects.first()
+    if document is not None:
+        paths.append(f'/api/documents/{document.id}/')
+    return paths
+
+
+def run_load(base_url, paths, concurrency, total):
+    """(запросов/с, p50 мс, p99 мс, ошибок)"""
+    url = urlsplit(base_url)
+    timings = []
+    errors = [0]
+    lock = threading.Lock()
+    counter = iter(range(total))
+
+    def client():
+        connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+        local = []
+        for n in counter:
+            path = paths[n % len(paths)]
+            started = time.perf_counter()
+            try:
+                connection.request('GET', path)
+                response = connection.getresponse()
+                response.read()
+                ok = response.status < 500
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(url.hostname, url.port or 80, timeout=60)
+                ok = False
+            local.append((time.perf_counter() - started) * 1000)
+            if not ok:
+                with lock:
+                    errors[0] += 1
+        connection.close()
+        with lock:
+            timings.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    timings.sort()
+    p50 = timings[len(timings) // 2]
+    p99 = timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    return len(timings) / elapsed, p50, p99, errors[0]
+
+
+def _wait_for_port(port, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f'Сервер завершился с кодом {process.returncode}')
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise SystemExit('Сервер не запустился')
+
+
+def server_command(mode, port, workers, threads):
+    bind = f'127.0.0.1:{port}'
+    if mode == 'wsgi':
+        return [sys.executable, '-m', 'gunicorn', 'document_manager.wsgi:application', '--bind', bind,
+                '--workers', str(workers), '--worker-class', 'gthread', '--threads', str(threads),
+                '--log-level', 'warning']
+    return [sys.executable, '-m', 'uvicorn', 'document_manager.asgi:application', '--host', '127.0.0.1',
+            '--port', str(port), '--workers', str(workers), '--log-level', 'warning', '--no-access-log']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Нагружать уже запущенный сервер')
+    parser.add_argument('--serve', default='wsgi,asgi', help='Режимы сервера через запятую: wsgi, asgi')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--workers', type=int, default=2, help='Процессов сервера')
+    parser.add_argument('--threads', type=int, default=4, help='Потоков на процесс gunicorn (WSGI)')
+    parser.add_argument('--concurrency', type=int, default=64, help='Одновременных клиентов')
+    parser.add_argument('--requests', type=int, default=5000)
+    args = parser.parse_args()
+
+    setup_django()
+    paths = sample_paths()
+    print(f'клиентов: {args.concurrency}, запросов: {args.requests}, эндпоинтов: {len(paths)}')
+
+    if args.url:
+        rate, p50, p99, errors = run_load(args.url, paths, args.concurrency, args.requests)
+        print(f'{args.url}: {rate:8.1f} запр/с  p50 {p50:7.1f} мс  p99 {p99:7.1f} мс  ошибок {errors}')
+        return
+
+    for mode in args.serve.split(','):
+        env = dict(os.environ, ASYNC_READ_VIEWS='true' if mode == 'asgi' else 'false')
+        process = subprocess.Popen(server_command(mode, args.port, args.workers, args.threads), env=env)
+        try:
+            _wait_for_port(args.port, process)
+            # Прогрев: соединения с БД и импорт модулей в процессах сервера
+            run_load(f'http://127.0.0.1:{args.port}', paths, args.concurrency, args.concurrency * 2)
+            rate, p50, p99, errors = run_load(f'http://127.0.0.1:{args.port}', paths, args.concurrency, args.requests)
+            print(f'{mode:5}: {rate:8.1f} запр/с  p50 {p50:7.1f} мс  p99 {p99:7.1f} мс  ошибок {errors}')
+        finally:
+            process.terminate()
+            process.wait(timeout=30)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+"""
+Стоимость соединения с БД на запрос: новое соединение, постоянное (CONN_MAX_AGE) и пул psycopg 3.
+
+python -m benchmarks.db_connections --requests 2000 --concurrency 4
+
+Цикл повторяет обработку запроса в Django: request_started, небольшое чтение
+(детали структуры), request_finished - close_old_connections закрывает
+соединение или оставляет его (возвращает в пул). Каждый режим запускается
+в отдельном процессе с DB_CONN_MAX_AGE / DB_POOL, нужна PostgreSQL из настроек.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+from benchmarks import setup_django
+
+
+MODES = {
+    'new': {'DB_CONN_MAX_AGE': '0', 'DB_POOL': 'false'},
+    'persistent': {'DB_CONN_MAX_AGE': '60', 'DB_POOL': 'false'},
+    'pool': {'DB_POOL': 'true'},
+}
+
+
+def run_mode(mode, requests, concurrency):
+    setup_django()
+    from django.core.signals import request_finished, request_started
+    from django.db import connection, connections
+    from django.db.backends.signals import connection_created
+    from structures.models import Structure
+
+    if connection.vendor != 'postgresql':
+        raise SystemExit('Нужна PostgreSQL (DB_HOST, DB_NAME, ... в окружении)')
+
+    opened = []
+    connection_created.connect(lambda **kwargs: opened.append(1), weak=False)
+    structure_id = Structure.objects.values_list('id', flat=True).first() or 0
+    connections.close_all()
+
+    timings = []
+    lock = threading.Lock()
+
+    def client(count):
+        local = []
+        for _ in range(count):
+            started = time.perf_counter()
+            request_started.send(sender=None)
+            Structure.objects.filter(id=structure_id).values('id', 'name', 'folders_count').first()
+            request_finished.send(sender=None)
+            local.append((time.perf_counter() - started) * 1000)
+        connections.close_all()
+        with lock:
+            timings.extend(local)
+
+    threads = [threading.Thread(target=client, args=(requests // concurrency,)) for _ in range(concurrency)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    # С пулом connection_created срабатывает на каждую выдачу, реальные соединения считает пул
+    opened = connection.pool.get_stats()['connections_num'] if connection.pool else len(opened)
+
+    timings.sort()
+    p95 = timings[min(len(timings) - 1, int(len(timings) * 0.95))]
+    print(f'{mode:11} {len(timings) / elapsed:9.0f} запр/с  p50 {statistics.median(timings):6.2f} мс  '
+          f'p95 {p95:6.2f} мс  соединений с сервером {opened}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--concurrency', type=int, default=4, help='Потоков (как потоки воркера gthread)')
+    parser.add_argument('--modes', default=','.join(MODES))
+    parser.add_argument('--mode', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        run_mode(args.mode, args.requests, args.concurrency)
+        return
+
+    print(f'запросов: {args.requests}, потоков: {args.concurrency}')
+    for mode in args.modes.split(','):
+        subprocess.run(
+            [sys.executable, '-m', 'benchmarks.db_connections', '--mode', mode,
+             '--requests', str(args.requests), '--concurrency', str(args.concurrency)],
+            env={**os.environ, **MODES[mode]},
+            check=True
+        )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Пропускная способность разбора и хэширования документов в зависимости от числа процессов.
+
+python -m benchmarks.document_parsing --documents 20000 --body-kb 64 --processes 1,2,4,8,16
+
+Этап разбора (parse_documents) замеряется отдельно от записи в БД;
+последней строкой - полная загрузка import_document_batch с наибольшим
+числом процессов.
+"""
+import argparse
+import os
+import time
+
+from benchmarks import setup_django
+from benchmarks.generators import document_xml
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--documents', type=int, default=20000)
+    parser.add_argument('--body-kb', type=int, default=64, help='Примерный размер тела документа, КБ')
+    parser.add_argument('--processes', default=f'1,2,4,{os.cpu_count()}',
+                        help='Список чисел процессов через запятую')
+    args = parser.parse_args()
+
+    setup_django()
+    from documents.batch import import_document_batch, parse_documents, reset_parse_pool
+    from document_manager.storage import BlobWriter
+    from documents.models import Document
+    from structures.models import Folder, Structure
+
+    files = [(f'{i}.xml', document_xml(f'bench-parse-{i}', 'BENCH', args.body_kb)) for i in range(args.documents)]
+    size_mb = sum(len(content) for _, content in files) / 1024 / 1024
+    counts = sorted({int(p) for p in args.processes.split(',') if p.strip()})
+    print(f'документов: {args.documents}, объем: {size_mb:.1f} МБ, ядер: {os.cpu_count()}')
+
+    def parse(files, processes):
+        for _, fields, error in parse_documents(files, processes):
+            if error is None:
+                BlobWriter(path=fields['blob_path']).discard()
+
+    baseline = None
+    for processes in counts:
+        # Запуск пула (django.setup в каждом процессе) не входит в замер
+        parse(files[:processes * 2], processes)
+        started = time.perf_counter()
+        parse(files, processes)
+        elapsed = time.perf_counter() - started
+        rate = args.documents / elapsed
+        baseline = baseline or rate
+        print(f'разбор, процессов {processes:3}: {elapsed:7.2f} с  {rate:9.0f} док/с  '
+              f'{size_mb / elapsed:7.1f} МБ/с  ускорение x{rate / baseline:.2f}')
+        reset_parse_pool()
+
+    structure = Structure.objects.create(name='benchmark parsing')
+    try:
+        Folder.objects.create(structure=structure, code='BENCH', name='Папка', materialized_path='/BENCH/')
+        started = time.perf_counter()
+        results = import_document_batch(structure.id, files, processes=counts[-1])
+        elapsed = time.perf_counter() - started
+        created = sum(1 for result in results if result['status'] == 'created')
+        print(f'загрузка с записью в БД, процессов {counts[-1]}: {elapsed:7.2f} с  '
+              f'{created / elapsed:9.0f} док/с  создано {created}')
+    finally:
+        reset_parse_pool()
+        Document.objects.filter(code__startswith='bench-parse-').delete()
+        structure.delete()
+
+
+if __name__ == '__main__':
+    main()
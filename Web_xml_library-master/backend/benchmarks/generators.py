@@ -0,0 +1,159 @@
+"""
+Синтетические XML для замеров: структуры папок и документы.
+
+python -m benchmarks.generators structure --folders 10000 --depth 4 --fanout 10 -o structure.xml
+python -m benchmarks.generators documents --count 1000 --folders 10000 --depth 4 --fanout 10 -o documents.zip
+
+Формат тот же, что у tests/test1.xml и документов (<header>/<metadata>);
+документы раскладываются по папкам структуры с теми же --folders/--depth/--fanout.
+При одинаковых параметрах и --seed результат побайтно совпадает.
+"""
+import argparse
+import io
+import random
+import zipfile
+from xml.sax.saxutils import escape, quoteattr
+
+NAMES = [
+    'Договоры', 'Отчеты', 'Проекты', 'Архив', 'Переписка', 'Сметы', 'Приказы', 'Кадры',
+    'Бухгалтерия', 'Закупки', 'Чертежи', 'Спецификации', 'Акты', 'Счета', 'Протоколы',
+]
+ATTRIBUTES = [
+    ('type', ['основные', 'дополнительные', 'служебные']),
+    ('статус', ['активный', 'архив', 'на согласовании']),
+    ('ответственный', ['Анна', 'Борис', 'Виктор', 'Галина', 'Дмитрий']),
+    ('периодичность', ['ежемесячный', 'квартальный', 'годовой']),
+    ('сумма', ['1 250 000', '980 000', '45 300', '12 000 000']),
+    ('файл', ['report.pdf', 'scan.tiff', 'plan.dwg']),
+]
+
+
+def folder_codes(folders, depth, fanout):
+    """Коды папок в порядке обхода дерева (те же, что в structure_xml)"""
+    return [code for code, _ in _folder_levels(folders, depth, fanout)]
+
+
+def _folder_levels(folders, depth, fanout):
+    """
+    (код, уровень) в порядке обхода в глубину.
+
+    Уровни заполняются по очереди сверху вниз: у каждой папки до fanout детей,
+    не глубже depth уровней; корней столько, чтобы вместить folders папок.
+    """
+    subtree = sum(fanout ** level for level in range(depth))
+    roots = [f'F{n + 1}' for n in range(min(folders, max(1, -(-folders // subtree))))]
+    children = {}
+    created = len(roots)
+    level = roots
+    for _ in range(depth - 1):
+        next_level = []
+        for parent in level:
+            for n in range(min(fanout, folders - created)):
+                code = f'{parent}-{n + 1}'
+                next_level.append(code)
+                children.setdefault(parent, []).append(code)
+                created += 1
+        level = next_level
+
+    result = []
+    stack = [(code, 0) for code in reversed(roots)]
+    while stack:
+        code, code_level = stack.pop()
+        result.append((code, code_level))
+        stack.extend((child, code_level + 1) for child in reversed(children.get(code, [])))
+    return result
+
+
+def structure_xml(folders=1000, depth=4, fanout=10, attributes=2, name='Синтетическая структура', seed=1):
+    """
+    XML структуры: <organization><structure><folder>... в UTF-8.
+
+    attributes - число дополнительных атрибутов у папки (кириллические имена
+    и значения, как в тестовом файле), не больше len(ATTRIBUTES).
+    """
+    rnd = random.Random(seed)
+    out = io.StringIO()
+    out.write('<?xml version="1.0" encoding="UTF-8"?>\n<organization>\n')
+    out.write(f'  <structure name={quoteattr(name)} code="SYNTH">\n')
+
+    open_levels = 0
+    for code, level in _folder_levels(folders, depth, fanout):
+        while open_levels > level:
+            open_levels -= 1
+            out.write('  ' * (open_levels + 2) + '</folder>\n')
+        attrs = ''.join(
+            f' {key}={quoteattr(rnd.choice(values))}'
+            for key, values in rnd.sample(ATTRIBUTES, min(attributes, len(ATTRIBUTES)))
+        )
+        title = f'{rnd.choice(NAMES)} {code}'
+        out.write('  ' * (level + 2) + f'<folder name={quoteattr(title)} code="{code}"{attrs}>\n')
+        open_levels = level + 1
+    while open_levels:
+        open_levels -= 1
+        out.write('  ' * (open_levels + 2) + '</folder>\n')
+
+    out.write('  </structure>\n</organization>\n')
+    return out.getvalue().encode('utf-8')
+
+
+def document_xml(code, folder_code, body_kb=1, metadata=3, seed=1):
+    """XML документа с <header>, <metadata> (folder_code, date и еще metadata полей) и телом ~body_kb КБ"""
+    rnd = random.Random(f'{seed}-{code}')
+    fields = ''.join(
+        f'<{key}>{escape(rnd.choice(values))}</{key}>'
+        for key, values in rnd.sample(ATTRIBUTES, min(metadata, len(ATTRIBUTES)))
+    )
+    body = ''.join(f'<p n="{n}">Текст документа {code}, абзац {n}</p>' for n in range(body_kb * 24))
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<document><header><doc_number>{escape(code)}</doc_number>'
+        f'<title>Документ {escape(code)}</title></header><metadata><folder_code>{escape(folder_code)}</folder_code>'
+        f'<date>2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}</date>{fields}</metadata>'
+        f'<body>{body}</body></document>'
+    ).encode('utf-8')
+
+
+def documents(count, folder_codes, prefix='synthetic', body_kb=1, metadata=3, seed=1):
+    """[(имя файла, XML)] документов, разложенных по папкам folder_codes по кругу"""
+    return [
+        (f'{prefix}-{i}.xml',
+         document_xml(f'{prefix}-{i}', folder_codes[i % len(folder_codes)], body_kb, metadata, seed))
+        for i in range(count)
+    ]
+
+
+def documents_zip(files):
+    """ZIP архив из [(имя, содержимое)] - формат пакетной загрузки"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, content in files:
+            archive.writestr(name, content)
+    return buffer.getvalue()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('kind', choices=['structure', 'documents'])
+    parser.add_argument('-o', '--output', required=True, help='Файл .xml (структура) или .zip (документы)')
+    parser.add_argument('--folders', type=int, default=1000)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--fanout', type=int, default=10)
+    parser.add_argument('--attributes', type=int, default=2, help='Атрибутов у папки')
+    parser.add_argument('--count', type=int, default=100, help='Число документов')
+    parser.add_argument('--body-kb', type=int, default=1)
+    parser.add_argument('--metadata', type=int, default=3, help='Полей <metadata> кроме folder_code и date')
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.kind == 'structure':
+        content = structure_xml(args.folders, args.depth, args.fanout, args.attributes, seed=args.seed)
+    else:
+        codes = folder_codes(args.folders, args.depth, args.fanout)
+        content = documents_zip(documents(args.count, codes, body_kb=args.body_kb, metadata=args.metadata,
+                                          seed=args.seed))
+    with open(args.output, 'wb') as f:
+        f.write(content)
+    print(f'{args.output}: {len(content) / 1024:.1f} КБ')
+
+
+if __name__ == '__main__':
+    main()
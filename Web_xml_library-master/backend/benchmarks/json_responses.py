@@ -0,0 +1,132 @@
+"""
+Пиковая память и время ответа: сборка списка + JsonResponse против потоковой отдачи.
+
+python -m benchmarks.json_responses --folders 100000 --documents 50000
+"""
+import argparse
+import time
+import tracemalloc
+
+from benchmarks import setup_django
+
+
+def run(title, func):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = func()
+    elapsed = (time.perf_counter() - started) * 1000
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f'{title:40} {elapsed:9.1f} мс  пик {peak / 1024 / 1024:8.1f} МБ  ответ {size / 1024 / 1024:7.1f} МБ')
+
+
+def build_full_tree(structure_id):
+    """Прежняя сборка всего дерева в памяти (узлы связываются по parent_id) - база для сравнения"""
+    from structures.models import Folder
+    from structures.tree import TREE_FIELDS, _make_node, _sort_by_code
+
+    rows = list(Folder.objects.filter(structure_id=structure_id).order_by('materialized_path').values(*TREE_FIELDS))
+    nodes = {row['id']: _make_node(row) for row in rows}
+    roots = []
+    for row in rows:
+        node = nodes[row['id']]
+        if row['parent_id'] is None:
+            roots.append(node)
+            continue
+        parent_node = nodes.get(row['parent_id'])
+        if parent_node is not None:
+            parent_node['children'].append(node)
+            parent_node['has_children'] = True
+    return _sort_by_code(roots)
+
+
+def consume(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--folders', type=int, default=100000)
+    parser.add_argument('--documents', type=int, default=50000)
+    args = parser.parse_args()
+
+    setup_django()
+    from django.http import JsonResponse
+    from document_manager import responses
+    from document_manager.responses import StreamingJsonResponse
+    from documents.models import Document, FolderDocument
+    from structures.counters import recalculate_structure_counters
+    from structures.models import Folder, Structure
+    from structures.tree import iter_tree_json
+
+    structure = Structure.objects.create(name='benchmark json')
+    try:
+        # Дерево: 10 корней, у каждой папки по 10 детей; вставка по уровням
+        level = [None]
+        created = 0
+        while created < args.folders:
+            next_level = []
+            for parent in level:
+                for _ in range(10):
+                    if created == args.folders:
+                        break
+                    code = f'F{created}'
+                    path = f'{parent.materialized_path}{code}/' if parent else f'/{code}/'
+                    next_level.append(Folder(structure=structure, code=code, name=f'Папка {created}', parent=parent,
+                                             materialized_path=path, attributes={'type': 'folder'}))
+                    created += 1
+            Folder.objects.bulk_create(next_level, batch_size=5000)
+            level = next_level
+
+        folder = Folder.objects.filter(structure=structure).first()
+        documents = Document.objects.bulk_create(
+            [Document(code=f'bench-json-{i}', name=f'Документ {i}', file_path='x', metadata={'n': str(i)})
+             for i in range(args.documents)],
+            batch_size=5000
+        )
+        FolderDocument.objects.bulk_create(
+            [FolderDocument(folder=folder, document=document) for document in documents], batch_size=5000
+        )
+        recalculate_structure_counters(structure.id)
+
+        def tree_before():
+            return consume(JsonResponse({'tree': build_full_tree(structure.id)}))
+
+        def tree_after():
+            return consume(StreamingJsonResponse({}, 'tree', array_chunks=iter_tree_json(structure.id)))
+
+        def documents_before():
+            items = []
+            for link in FolderDocument.objects.filter(folder=folder).select_related('document'):
+                items.append({
+                    'id': link.document.id,
+                    'code': link.document.code,
+                    'name': link.document.name,
+                    'created_at': link.document.created_at.isoformat(),
+                })
+            return consume(JsonResponse({'documents': items}))
+
+        def documents_after():
+            rows = FolderDocument.objects.filter(folder=folder).values(
+                'document_id', 'document__code', 'document__name', 'document__created_at'
+            ).iterator(chunk_size=responses.ITERATOR_CHUNK_SIZE)
+            return consume(StreamingJsonResponse({}, 'documents', rows))
+
+        print(f'папок: {args.folders}, документов в папке: {args.documents}, orjson: {responses.orjson is not None}')
+        run('дерево: список + JsonResponse', tree_before)
+        run('дерево: поток', tree_after)
+        run('документы папки: список + JsonResponse', documents_before)
+        run('документы папки: поток', documents_after)
+        if responses.orjson is not None:
+            responses.orjson = None
+            run('дерево: поток без orjson', tree_after)
+            run('документы папки: поток без orjson', documents_after)
+    finally:
+        Document.objects.filter(code__startswith='bench-json-').delete()
+        structure.delete()
+
+
+if __name__ == '__main__':
+    main()
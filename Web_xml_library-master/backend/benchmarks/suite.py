@@ -0,0 +1,321 @@
+"""
+Набор воспроизводимых замеров API с проверкой регрессий против базовых результатов.
+
+python -m benchmarks.suite
+python -m benchmarks.suite --scenarios tree_full,document_search --output results.json
+python -m benchmarks.suite --update-baseline
+DB_ENGINE=sqlite python -m benchmarks.suite
+
+Сценарии обращаются к эндпоинтам через тестовый клиент Django (URL, middleware,
+представления) на данных из benchmarks.generators; данные создаются в БД из
+настроек и удаляются после замера, файлы пишутся во временный каталог.
+Время - медиана --repeat прогонов. Число запросов к БД и пик памяти (tracemalloc)
+снимаются отдельным прогоном: tracemalloc замедляет код. Кэш на время замера
+отключен (DummyCache), чтобы мерить работу с БД, --cache оставляет кэш из настроек.
+
+Результат сравнивается с benchmarks/baselines/<postgresql|sqlite>.json.
+Регрессия - больше запросов к БД, время или пик памяти выше базовых больше чем
+на --threshold (и больше чем на --min-ms / --min-kb); сценарий, медленнее базового
+по времени, перед выводом замеряется повторно. При регрессии код выхода 1.
+Базовые результаты снимаются на одной машине и перезаписываются --update-baseline.
+"""
+import argparse
+import gc
+import json
+import os
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from benchmarks import generators, setup_django
+
+BASELINES_DIR = os.path.join(os.path.dirname(__file__), 'baselines')
+PREFIX = 'bench-suite'
+
+
+class Fixture:
+    """Общие данные сценариев: импортированная структура с документами"""
+
+    def __init__(self, client, args):
+        from documents.models import Document
+        from structures.models import Folder
+
+        self.client = client
+        self.args = args
+        self.folder_codes = generators.folder_codes(args.folders, args.depth, args.fanout)
+        self.structure_id = self.import_structure(seed=0)
+
+        files = generators.documents(args.documents, self.folder_codes, prefix=f'{PREFIX}-doc')
+        check(client.post('/api/documents/upload-batch/', {
+            'structure_id': self.structure_id,
+            'files': upload(f'{PREFIX}-documents.zip', generators.documents_zip(files)),
+        }))
+        self.folder_id = Folder.objects.get(structure_id=self.structure_id, code=self.folder_codes[0]).id
+        self.document_id = Document.objects.filter(code=f'{PREFIX}-doc-0').values_list('id', flat=True).get()
+
+    def import_structure(self, seed):
+        content = generators.structure_xml(
+            self.args.folders, self.args.depth, self.args.fanout, self.args.attributes,
+            name=f'{PREFIX} {seed}', seed=seed
+        )
+        response = check(self.client.post('/api/structures/upload/', {
+            'file': upload(f'{PREFIX}-{seed}.xml', content)
+        }))
+        return response.json()['structure_id']
+
+
+def upload(name, content):
+    from django.core.files.uploadedfile import SimpleUploadedFile
+    return SimpleUploadedFile(name, content, content_type='application/octet-stream')
+
+
+def check(response):
+    """Ответ эндпоинта целиком; ошибка API делает замер бессмысленным"""
+    if response.streaming:
+        b''.join(response.streaming_content)
+    if response.status_code >= 400:
+        raise SystemExit(f'{response.status_code}: {response.content[:500]!r}')
+    return response
+
+
+def cleanup():
+    from documents.models import Document
+    from import_logs.models import ImportLog
+    from structures.models import Structure
+
+    Document.objects.filter(code__startswith=PREFIX).delete()
+    Structure.objects.filter(name__startswith=PREFIX).delete()
+    ImportLog.objects.filter(filename__startswith=PREFIX).delete()
+
+
+def scenarios(fixture):
+    """
+    Сценарии: имя -> (run, after). run - замеряемый вызов, after - уборка
+    после каждого прогона (не входит в замер) или None.
+    """
+    from documents.models import Document
+    from structures.models import Structure
+
+    client = fixture.client
+    structure_id = fixture.structure_id
+    counter = iter(range(1, sys.maxsize))
+    state = {}
+
+    def structure_import():
+        state['structure_id'] = fixture.import_structure(seed=next(counter))
+
+    def structure_import_after():
+        Structure.objects.filter(id=state.pop('structure_id')).delete()
+
+    def document_upload():
+        n = next(counter)
+        code = f'{PREFIX}-single-{n}'
+        folder_code = fixture.folder_codes[n % len(fixture.folder_codes)]
+        check(client.post('/api/documents/upload-single/', {
+            'structure_id': structure_id,
+            'file': upload(f'{code}.xml', generators.document_xml(code, folder_code)),
+        }))
+
+    def document_batch_upload():
+        n = next(counter)
+        files = generators.documents(fixture.args.batch, fixture.folder_codes, prefix=f'{PREFIX}-batch-{n}')
+        check(client.post('/api/documents/upload-batch/', {
+            'structure_id': structure_id,
+            'files': upload(f'{PREFIX}-batch-{n}.zip', generators.documents_zip(files)),
+        }))
+
+    def documents_after():
+        Document.objects.filter(code__startswith=f'{PREFIX}-single').delete()
+        Document.objects.filter(code__startswith=f'{PREFIX}-batch').delete()
+
+    def get(path):
+        return lambda: check(client.get(path))
+
+    return {
+        'structure_import': (structure_import, structure_import_after),
+        'document_upload': (document_upload, documents_after),
+        'document_batch_upload': (document_batch_upload, documents_after),
+        'tree_full': (get(f'/api/structures/{structure_id}/folders/'), None),
+        'tree_depth': (get(f'/api/structures/{structure_id}/folders/?depth=2'), None),
+        'structure_details': (get(f'/api/structures/{structure_id}/'), None),
+        'structure_search': (get('/api/structures/search/?q=Договоры'), None),
+        'document_search': (get(f'/api/documents/search/?structure_id={structure_id}&q=Документ&limit=50'), None),
+        'documents_by_folder': (get(f'/api/documents/folder/{fixture.folder_id}/?limit=50'), None),
+        'document_details': (get(f'/api/documents/{fixture.document_id}/'), None),
+        'consistency_check': (get(f'/api/structures/{structure_id}/consistency-check/'), None),
+    }
+
+
+def run_scenario(run, after, repeat):
+    """Медиана и p95 времени, число запросов и пик памяти одного сценария"""
+    from django.db import connection
+    from django.test.utils import CaptureQueriesContext
+
+    # Прогрев: импорт модулей, первые соединения и компиляция запросов
+    run()
+    if after:
+        after()
+
+    # Сборка мусора отключена на время прогона (как в timeit): иначе паузы GC
+    # попадают в случайные прогоны и делают время двугорбым
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        gc.disable()
+        try:
+            started = time.perf_counter()
+            run()
+            timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            gc.enable()
+        if after:
+            after()
+
+    tracemalloc.start()
+    with CaptureQueriesContext(connection) as queries:
+        run()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    if after:
+        after()
+
+    timings.sort()
+    return {
+        'time_ms': round(statistics.median(timings), 2),
+        'time_p95_ms': round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 2),
+        'queries': len(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def slower(current, base, threshold, min_ms):
+    return current['time_ms'] > base['time_ms'] * (1 + threshold) and current['time_ms'] - base['time_ms'] > min_ms
+
+
+def compare(results, baseline, threshold, min_ms, min_kb):
+    """Строки отчета и список регрессий"""
+    regressions = []
+    lines = []
+    for name, current in results['scenarios'].items():
+        base = baseline['scenarios'].get(name)
+        if base is None:
+            lines.append(f'{name:24} нет в базовых')
+            continue
+        problems = []
+        if current['queries'] > base['queries']:
+            problems.append(f"запросов {base['queries']} -> {current['queries']}")
+        if slower(current, base, threshold, min_ms):
+            problems.append(f"время {base['time_ms']} -> {current['time_ms']} мс")
+        if current['peak_kb'] > base['peak_kb'] * (1 + threshold) and current['peak_kb'] - base['peak_kb'] > min_kb:
+            problems.append(f"память {base['peak_kb']} -> {current['peak_kb']} КБ")
+        change = (current['time_ms'] / base['time_ms'] - 1) * 100 if base['time_ms'] else 0
+        lines.append(f'{name:24} время {change:+6.1f}%  ' + ('РЕГРЕССИЯ: ' + ', '.join(problems) if problems else 'ok'))
+        regressions.extend(f'{name}: {problem}' for problem in problems)
+    return lines, regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scenarios', help='Имена сценариев через запятую (по умолчанию все)')
+    parser.add_argument('--repeat', type=int, default=10)
+    parser.add_argument('--folders', type=int, default=2000)
+    parser.add_argument('--depth', type=int, default=4)
+    parser.add_argument('--fanout', type=int, default=8)
+    parser.add_argument('--attributes', type=int, default=2, help='Атрибутов у папки')
+    parser.add_argument('--documents', type=int, default=500, help='Документов в общей структуре')
+    parser.add_argument('--batch', type=int, default=100, help='Документов в сценарии пакетной загрузки')
+    parser.add_argument('--cache', action='store_true', help='Не отключать кэш')
+    parser.add_argument('--output', help='Записать результат в JSON файл')
+    parser.add_argument('--baseline', help='Файл базовых результатов (по умолчанию baselines/<БД>.json)')
+    parser.add_argument('--update-baseline', action='store_true', help='Записать результат как базовый')
+    parser.add_argument('--threshold', type=float, default=0.25, help='Допустимый рост времени и памяти, доля')
+    parser.add_argument('--min-ms', type=float, default=5.0, help='Рост времени меньше этого не считается')
+    parser.add_argument('--min-kb', type=float, default=256.0, help='Рост памяти меньше этого не считается')
+    args = parser.parse_args()
+
+    if not args.cache:
+        os.environ['CACHE_BACKEND'] = 'django.core.cache.backends.dummy.DummyCache'
+    blob_root = tempfile.mkdtemp(prefix='bench-suite-')
+    os.environ['BLOB_STORAGE_ROOT'] = blob_root
+    setup_django()
+
+    import django
+    from django.db import connection
+    from django.test import Client
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment(debug=False)
+    params = {name: getattr(args, name) for name in ('repeat', 'folders', 'depth', 'fanout', 'attributes',
+                                                     'documents', 'batch', 'cache')}
+    results = {
+        'database': connection.vendor,
+        'python': platform.python_version(),
+        'django': django.get_version(),
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'params': params,
+        'scenarios': {},
+    }
+    print(f'БД: {connection.vendor}, папок: {args.folders}, документов: {args.documents}, повторов: {args.repeat}')
+
+    baseline_path = args.baseline or os.path.join(BASELINES_DIR, f'{connection.vendor}.json')
+    baseline = None
+    if not args.update_baseline and os.path.exists(baseline_path):
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    try:
+        cleanup()
+        fixture = Fixture(Client(), args)
+        available = scenarios(fixture)
+        names = args.scenarios.split(',') if args.scenarios else list(available)
+        unknown = set(names) - set(available)
+        if unknown:
+            raise SystemExit(f'Неизвестные сценарии: {", ".join(sorted(unknown))}. Есть: {", ".join(available)}')
+
+        for name in names:
+            result = run_scenario(*available[name], args.repeat)
+            base = baseline and baseline['scenarios'].get(name)
+            if base and slower(result, base, args.threshold, args.min_ms):
+                # Повторный замер отсекает разовые всплески фоновой нагрузки
+                retry = run_scenario(*available[name], args.repeat)
+                result = min(result, retry, key=lambda r: r['time_ms'])
+            results['scenarios'][name] = result
+            print(f"{name:24} {result['time_ms']:9.2f} мс  p95 {result['time_p95_ms']:9.2f} мс  "
+                  f"запросов {result['queries']:5}  пик {result['peak_kb']:9.1f} КБ")
+    finally:
+        cleanup()
+        shutil.rmtree(blob_root, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    if args.update_baseline:
+        os.makedirs(os.path.dirname(baseline_path), exist_ok=True)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f'Базовые результаты записаны: {baseline_path}')
+        return
+
+    if baseline is None:
+        print(f'Нет базовых результатов {baseline_path} - запустите с --update-baseline')
+        return
+
+    print(f'\nСравнение с {baseline_path} ({baseline["created_at"]}):')
+    if baseline['params'] != params:
+        print(f'  параметры отличаются от базовых ({baseline["params"]}) - сравнение неточно')
+    lines, regressions = compare(results, baseline, args.threshold, args.min_ms, args.min_kb)
+    for line in lines:
+        print(f'  {line}')
+    if regressions:
+        print(f'Регрессий: {len(regressions)}')
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -12,5 +12,8 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'document_manager.settings')
+# Под ASGI эндпоинты чтения обслуживаются async представлениями (structures/async_views.py,
+# documents/async_views.py); ASYNC_READ_VIEWS=false возвращает синхронные
+os.environ.setdefault('ASYNC_READ_VIEWS', 'true')
 
 application = get_asgi_application()
@@ -0,0 +1,129 @@
+"""
+Метрики запросов в формате Prometheus (эндпоинт /metrics).
+
+Гистограммы и счетчики хранятся в памяти процесса: под gunicorn каждый
+воркер отдает свои значения, суммирование - на стороне Prometheus
+(например, по метке instance при сборе с каждого воркера).
+Доступ - по METRICS_TOKEN или METRICS_ALLOWED_IPS.
+"""
+import hmac
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.http import Http404, HttpResponse, JsonResponse
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+_lock = threading.Lock()
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = buckets
+        # метки -> [счетчики по корзинам + Inf, сумма]
+        self.series = {}
+
+    def observe(self, labels, value):
+        with _lock:
+            series = self.series.get(labels)
+            if series is None:
+                series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0]
+            series[0][bisect_left(self.buckets, value)] += 1
+            series[1] += value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        with _lock:
+            series = [(labels, list(counts), total) for labels, (counts, total) in self.series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_labels(labels, le=bound)} {cumulative}')
+            lines.append(f'{self.name}_sum{_labels(labels)} {round(total, 6)}')
+            lines.append(f'{self.name}_count{_labels(labels)} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help_text):
+        self.name = name
+        self.help_text = help_text
+        self.series = {}
+
+    def inc(self, labels, value=1):
+        with _lock:
+            self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} counter']
+        with _lock:
+            series = sorted(self.series.items())
+        lines.extend(f'{self.name}{_labels(labels)} {value}' for labels, value in series)
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(labels, **extra):
+    """labels - кортеж пар (имя, значение)"""
+    pairs = [*labels, *extra.items()]
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+REQUEST_DURATION = Histogram(
+    'http_request_duration_seconds', 'Время обработки запроса (потоковых - до конца отдачи)', DURATION_BUCKETS
+)
+REQUEST_DB_DURATION = Histogram(
+    'http_request_db_duration_seconds', 'Суммарное время запросов к БД за запрос', DURATION_BUCKETS
+)
+REQUEST_DB_QUERIES = Histogram('http_request_db_queries', 'Число запросов к БД за запрос', QUERY_BUCKETS)
+N_PLUS_ONE = Counter('http_request_n_plus_one_total', 'Запросы с повторяющимся шаблоном SQL (N+1)')
+
+METRICS = [REQUEST_DURATION, REQUEST_DB_DURATION, REQUEST_DB_QUERIES, N_PLUS_ONE]
+
+
+def observe_request(method, route, status, duration, db_duration, queries, n_plus_one):
+    """Учесть запрос; route - шаблон URL (api/structures/<int:structure_id>/), а не путь"""
+    labels = (('method', method), ('route', route))
+    REQUEST_DURATION.observe((*labels, ('status', str(status))), duration)
+    REQUEST_DB_DURATION.observe(labels, db_duration)
+    REQUEST_DB_QUERIES.observe(labels, queries)
+    if n_plus_one:
+        N_PLUS_ONE.inc(labels)
+
+
+def render_metrics():
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_allowed(request):
+    """Токен из METRICS_TOKEN или адрес клиента из METRICS_ALLOWED_IPS"""
+    token = settings.METRICS_TOKEN
+    if token:
+        authorization = request.headers.get('Authorization', '')
+        if hmac.compare_digest(authorization.encode(), f'Bearer {token}'.encode()):
+            return True
+    return request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS
+
+
+def metrics_view(request):
+    """Метрики запросов в текстовом формате Prometheus"""
+    if not settings.REQUEST_METRICS_ENABLED:
+        raise Http404
+    if not metrics_allowed(request):
+        return JsonResponse({'error': 'Доступ запрещен'}, status=403)
+    return HttpResponse(render_metrics(), content_type=CONTENT_TYPE)
@@ -0,0 +1,161 @@
+"""
+Инструментирование запросов: число и суммарное время SQL, самые медленные
+запросы и время обработки.
+
+Результат - заголовки Server-Timing и X-Query-Count, метрики /metrics
+(document_manager.metrics) и предупреждение в лог document_manager.sql,
+если один шаблон SQL повторился за запрос больше N_PLUS_ONE_THRESHOLD раз.
+У потоковых ответов запросы выполняются при отдаче тела, уже после
+заголовков, поэтому заголовков у них нет - SQL учитывается в /metrics
+и проверке N+1 при закрытии ответа.
+
+SQL учитывается обертками выполнения (connection.execute_wrappers), которые
+ставятся на каждое новое соединение; текущий запрос берется из contextvar,
+поэтому учитываются и запросы из потоков sync_to_async под ASGI. Вне запроса
+(команды, воркер импорта) обертка сразу вызывает execute.
+"""
+import contextvars
+import heapq
+import logging
+import re
+import time
+from collections import Counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+from .metrics import observe_request
+
+logger = logging.getLogger('document_manager.sql')
+
+_current = contextvars.ContextVar('request_query_stats', default=None)
+
+# IN (%s, %s, ...) разной длины - один шаблон
+_IN_LIST = re.compile(r'\((?:%s, )+%s\)')
+# Многострочный INSERT (bulk_create пачками) - не N+1
+_MULTI_ROW_INSERT = re.compile(r'^INSERT .* VALUES \([^)]*\), \(', re.DOTALL)
+
+
+class QueryStats:
+    """SQL одного HTTP запроса"""
+
+    def __init__(self, slow_limit):
+        self.started = time.perf_counter()
+        self.count = 0
+        self.duration = 0.0
+        self.slow_limit = slow_limit
+        self.slowest = []
+        self.templates = Counter()
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.duration += duration
+        if not _MULTI_ROW_INSERT.match(sql):
+            self.templates[_IN_LIST.sub('(%s, ...)', sql)] += 1
+        if len(self.slowest) < self.slow_limit:
+            heapq.heappush(self.slowest, (duration, sql))
+        elif self.slow_limit:
+            heapq.heappushpop(self.slowest, (duration, sql))
+
+    def repeated_template(self, threshold):
+        """(шаблон, число выполнений), если шаблон повторился больше threshold раз"""
+        if not threshold or not self.templates:
+            return None
+        template, count = self.templates.most_common(1)[0]
+        return (template, count) if count > threshold else None
+
+
+def record_query(execute, sql, params, many, context):
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.add(sql, time.perf_counter() - started)
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+def _header_text(value, limit=100):
+    """Значение для desc в Server-Timing: ASCII, без кавычек и переводов строк"""
+    value = ' '.join(value.split())[:limit]
+    return value.encode('ascii', 'replace').decode().replace('\\', '/').replace('"', "'")
+
+
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.REQUEST_METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+        connection_created.connect(install_query_recorder, dispatch_uid='request_query_recorder')
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        stats = QueryStats(settings.REQUEST_SLOW_QUERIES)
+        token = _current.set(stats)
+        response = self.get_response(request)
+        return self.finish(request, response, stats, token)
+
+    async def __acall__(self, request):
+        stats = QueryStats(settings.REQUEST_SLOW_QUERIES)
+        token = _current.set(stats)
+        response = await self.get_response(request)
+        return self.finish(request, response, stats, token)
+
+    def finish(self, request, response, stats, token):
+        if response.streaming:
+            # Тело потокового ответа читает БД уже после возврата из middleware:
+            # SQL учитывается до закрытия ответа, метрики записываются при закрытии
+            def close():
+                _current.set(None)
+                self.record(request, response, stats, time.perf_counter() - stats.started)
+            response._resource_closers.append(close)
+        else:
+            _current.reset(token)
+            elapsed = time.perf_counter() - stats.started
+            self.add_headers(response, stats, elapsed)
+            self.record(request, response, stats, elapsed)
+        return response
+
+    def add_headers(self, response, stats, elapsed):
+        response['X-Query-Count'] = str(stats.count)
+        timings = [
+            f'db;dur={stats.duration * 1000:.1f};desc="{stats.count} queries"',
+            f'app;dur={elapsed * 1000:.1f}',
+        ]
+        for n, (duration, sql) in enumerate(sorted(stats.slowest, reverse=True), 1):
+            # Текст SQL в заголовке - только при DEBUG
+            desc = f';desc="{_header_text(sql)}"' if settings.DEBUG else ''
+            timings.append(f'sql-{n};dur={duration * 1000:.1f}{desc}')
+        response['Server-Timing'] = ', '.join(timings)
+
+    def record(self, request, response, stats, elapsed):
+        match = request.resolver_match
+        route = match.route if match else 'unmatched'
+
+        repeated = stats.repeated_template(settings.N_PLUS_ONE_THRESHOLD)
+        if repeated:
+            template, count = repeated
+            logger.warning('Возможен N+1: %s %s - один шаблон SQL выполнен %d раз из %d: %s',
+                           request.method, request.path, count, stats.count, template[:500])
+
+        observe_request(request.method, route, response.status_code, elapsed, stats.duration, stats.count,
+                        bool(repeated))
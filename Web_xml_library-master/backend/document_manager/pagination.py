@@ -0,0 +1,188 @@
+"""
+Курсорная (keyset) пагинация списков.
+
+Вместо OFFSET следующая страница выбирается условием по ключу сортировки
+последней записи ((created_at, id) и т.п.), поэтому запрос любой страницы
+идет по индексу и стоит одинаково. Курсор для клиента непрозрачен.
+"""
+import base64
+import binascii
+import datetime
+import decimal
+import json
+import uuid
+from functools import reduce
+from operator import or_
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError
+from django.db.models import Q
+
+from .responses import ITERATOR_CHUNK_SIZE
+
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class PaginationError(ValueError):
+    pass
+
+
+def _json_default(value):
+    # Полная точность (DjangoJSONEncoder обрезает микросекунды)
+    if isinstance(value, (datetime.datetime, datetime.date)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'Значение {value!r} нельзя поместить в курсор')
+
+
+def encode_cursor(order, values):
+    payload = json.dumps({'o': order, 'v': values}, default=_json_default, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, order, model, fields):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        cursor_order, raw_values = payload['o'], list(payload['v'])
+    except (ValueError, KeyError, TypeError, binascii.Error):
+        raise PaginationError('Некорректный курсор')
+
+    if cursor_order != order or len(raw_values) != len(fields):
+        raise PaginationError('Курсор не соответствует сортировке')
+    try:
+        return [_to_python(model, field.lstrip('-'), value) for field, value in zip(fields, raw_values)]
+    except ValidationError:
+        raise PaginationError('Некорректный курсор')
+
+
+def _to_python(model, name, value):
+    """Значение из курсора в тип поля (для аннотаций - как есть)"""
+    field = None
+    for part in name.split('__'):
+        try:
+            field = model._meta.get_field(part)
+        except FieldDoesNotExist:
+            return value
+        model = field.related_model
+    if field.is_relation:
+        field = field.target_field
+    return field.to_python(value)
+
+
+def _row_value(row, name):
+    if isinstance(row, dict):
+        return row[name]
+    for part in name.split('__'):
+        row = getattr(row, part)
+    return row
+
+
+def _keyset_filter(fields, values):
+    """Записи строго после (values) в порядке fields"""
+    conditions = []
+    for i, field in enumerate(fields):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') else 'gt'
+        condition = {f.lstrip('-'): value for f, value in zip(fields[:i], values[:i])}
+        condition[f'{name}__{lookup}'] = values[i]
+        conditions.append(Q(**condition))
+
+    # Нестрогая граница по первому полю дает индексу диапазон сканирования
+    first = fields[0]
+    bound = Q(**{f"{first.lstrip('-')}__{'lte' if first.startswith('-') else 'gte'}": values[0]})
+    return bound & reduce(or_, conditions)
+
+
+def parse_page_size(request, default=DEFAULT_PAGE_SIZE):
+    try:
+        limit = int(request.GET.get('limit', default))
+    except ValueError:
+        raise PaginationError('Некорректный limit')
+    if limit < 1:
+        raise PaginationError('Некорректный limit')
+    return min(limit, MAX_PAGE_SIZE)
+
+
+def _page_query(qs, request, orderings, default_order):
+    """Запрос страницы (limit + 1 запись) без обращения к БД: (rows, order, fields, limit)"""
+    order = request.GET.get('order') or default_order or next(iter(orderings))
+    if order not in orderings:
+        raise PaginationError(f'Неизвестная сортировка: {order}')
+    fields = orderings[order]
+    limit = parse_page_size(request)
+
+    cursor = request.GET.get('cursor')
+    if cursor:
+        values = decode_cursor(cursor, order, qs.model, fields)
+        qs = qs.filter(_keyset_filter(fields, values))
+
+    # Одна лишняя запись показывает, есть ли следующая страница
+    return qs.order_by(*fields)[:limit + 1], order, fields, limit
+
+
+def paginate(qs, request, orderings, default_order=None, stream=False):
+    """
+    Страница queryset по параметрам запроса: order, cursor, limit, count=true.
+
+    orderings - {имя: (поля сортировки)}, последнее поле должно быть уникальным (id).
+    Возвращает (записи страницы, {'next_cursor', 'has_more', 'total' - только при count=true}).
+    При stream=True записи - итератор по курсору БД, а has_more и next_cursor
+    заполняются в том же словаре, когда итератор дочитан.
+    """
+    rows, order, fields, limit = _page_query(qs, request, orderings, default_order)
+
+    page_info = {}
+    if request.GET.get('count') == 'true':
+        page_info['total'] = qs.count()
+    page_info.update({'has_more': False, 'next_cursor': None})
+
+    if stream:
+        return _iter_page(rows.iterator(chunk_size=ITERATOR_CHUNK_SIZE), limit, order, fields, page_info), page_info
+
+    rows = list(rows)
+    return list(_iter_page(rows, limit, order, fields, page_info)), page_info
+
+
+async def apaginate(qs, request, orderings, default_order=None, stream=False):
+    """paginate для async представлений: при stream=True записи - асинхронный итератор"""
+    rows, order, fields, limit = _page_query(qs, request, orderings, default_order)
+
+    page_info = {}
+    if request.GET.get('count') == 'true':
+        page_info['total'] = await qs.acount()
+    page_info.update({'has_more': False, 'next_cursor': None})
+
+    page = _aiter_page(rows.aiterator(chunk_size=ITERATOR_CHUNK_SIZE), limit, order, fields, page_info)
+    if stream:
+        return page, page_info
+    return [row async for row in page], page_info
+
+
+def _next_cursor(page_info, order, fields, last):
+    page_info['has_more'] = True
+    page_info['next_cursor'] = encode_cursor(order, [_row_value(last, field.lstrip('-')) for field in fields])
+
+
+def _iter_page(rows, limit, order, fields, page_info):
+    last = None
+    for count, row in enumerate(rows):
+        if count == limit:
+            _next_cursor(page_info, order, fields, last)
+            break
+        last = row
+        yield row
+
+
+async def _aiter_page(rows, limit, order, fields, page_info):
+    last = None
+    count = 0
+    async for row in rows:
+        if count == limit:
+            _next_cursor(page_info, order, fields, last)
+            break
+        last = row
+        count += 1
+        yield row
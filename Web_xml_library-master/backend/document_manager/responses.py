@@ -0,0 +1,124 @@
+"""
+JSON ответы для больших списков.
+
+dumps() кодирует через orjson, если он установлен, иначе через json;
+формат одинаковый (даты - isoformat). StreamingJsonResponse отдает объект
+с массивом по кускам: строки читаются из БД итератором и кодируются по
+одной, поэтому весь ответ в памяти не собирается.
+
+Ответ уже начат, когда читаются строки, поэтому все проверки параметров
+должны быть выполнены до его создания.
+
+Для async представлений (ASGI) items и array_chunks могут быть асинхронными
+итераторами (QuerySet.aiterator()) - тогда и ответ асинхронный.
+"""
+import datetime
+import decimal
+import json
+import uuid
+
+from django.http import StreamingHttpResponse
+
+try:
+    import orjson
+except ImportError:  # необязательная зависимость
+    orjson = None
+
+
+# Строк за одно чтение из БД (.iterator(chunk_size=...))
+ITERATOR_CHUNK_SIZE = 2000
+# Размер куска ответа, отдаваемого серверу
+STREAM_BUFFER_SIZE = 64 * 1024
+
+
+def _default(value):
+    if isinstance(value, (datetime.datetime, datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, (decimal.Decimal, uuid.UUID)):
+        return str(value)
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def dumps(value):
+    """JSON в bytes (UTF-8)"""
+    if orjson is not None:
+        return orjson.dumps(value, default=_default)
+    return json.dumps(value, default=_default, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def encode_array_items(items):
+    """Содержимое JSON массива (без скобок) кусками примерно по STREAM_BUFFER_SIZE"""
+    buffer = bytearray()
+    separator = b''
+    for item in items:
+        buffer += separator
+        buffer += dumps(item)
+        separator = b','
+        if len(buffer) >= STREAM_BUFFER_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+async def aencode_array_items(items):
+    """encode_array_items для асинхронного итератора"""
+    buffer = bytearray()
+    separator = b''
+    async for item in items:
+        buffer += separator
+        buffer += dumps(item)
+        separator = b','
+        if len(buffer) >= STREAM_BUFFER_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def _json_object_head(fields, array_key):
+    head = dumps(fields)
+    return head[:-1] + (b',' if fields else b'') + dumps(array_key) + b':['
+
+
+def _json_object_tail(tail):
+    extra = tail() if tail is not None else None
+    return b']' + (b',' + dumps(extra)[1:] if extra else b'}')
+
+
+def iter_json_object(fields, array_key, array_chunks, tail=None):
+    """
+    Куски JSON объекта {**fields, array_key: [...], **tail()}.
+
+    tail вызывается после массива - в нем можно вернуть значения,
+    известные только после чтения всех строк (курсор следующей страницы).
+    """
+    yield _json_object_head(fields, array_key)
+    yield from array_chunks
+    yield _json_object_tail(tail)
+
+
+async def aiter_json_object(fields, array_key, array_chunks, tail=None):
+    """iter_json_object для асинхронного итератора кусков"""
+    yield _json_object_head(fields, array_key)
+    async for chunk in array_chunks:
+        yield chunk
+    yield _json_object_tail(tail)
+
+
+class StreamingJsonResponse(StreamingHttpResponse):
+    """Потоковый ответ {**fields, array_key: [items...], **tail()}"""
+
+    def __init__(self, fields, array_key, items=(), tail=None, array_chunks=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        if array_chunks is None:
+            is_async = hasattr(items, '__aiter__')
+            array_chunks = aencode_array_items(items) if is_async else encode_array_items(items)
+        else:
+            is_async = hasattr(array_chunks, '__aiter__')
+        if is_async:
+            content = aiter_json_object(fields, array_key, array_chunks, tail)
+        else:
+            content = iter_json_object(fields, array_key, array_chunks, tail)
+        super().__init__(content, **kwargs)
+
@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Первым: время и SQL всего запроса, включая остальные middleware
+    'document_manager.middleware.RequestMetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -65,9 +67,14 @@ CORS_ALLOWED_ORIGINS = [
 ]
 
 CORS_ALLOW_CREDENTIALS = True
+# Заголовки инструментирования доступны фронтенду
+CORS_EXPOSE_HEADERS = ['Server-Timing', 'X-Query-Count']
 
 CSRF_TRUSTED_ORIGINS = CORS_ALLOWED_ORIGINS
 
+# Пакетная загрузка документов присылает много файлов в одном запросе
+DATA_UPLOAD_MAX_NUMBER_FILES = int(os.getenv('DATA_UPLOAD_MAX_NUMBER_FILES', 1000))
+
 # REST Framework настройки
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
@@ -112,9 +119,55 @@ DATABASES = {
         'PASSWORD': os.getenv('DB_PASSWORD', 'IGgRMJimfykfrqudmdNdrZvyEdPYXvat'),
         'HOST': os.getenv('DB_HOST', 'mainline.proxy.rlwy.net'),
         'PORT': os.getenv('DB_PORT', '31435'),
+        # Постоянные соединения: живут DB_CONN_MAX_AGE секунд (0 - новое на каждый запрос),
+        # перед повторным использованием проверяются (CONN_HEALTH_CHECKS)
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'connect_timeout': int(os.getenv('DB_CONNECT_TIMEOUT', 5)),
+        },
+    }
+}
+
+# DB_POOL=true - пул соединений psycopg 3 в процессе (psycopg[pool]) вместо постоянных соединений.
+# Нужен под ASGI: там соединение не переживает запрос и без пула открывается заново каждый раз
+if os.getenv('DB_POOL', 'false').lower() in ('1', 'true', 'yes'):
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': int(os.getenv('DB_POOL_MIN_SIZE', 2)),
+        'max_size': int(os.getenv('DB_POOL_MAX_SIZE', 10)),
+        'timeout': int(os.getenv('DB_POOL_TIMEOUT', 10)),
+        # Соединения пула пересоздаются через max_lifetime; проверку перед выдачей
+        # Django включает сам по CONN_HEALTH_CHECKS
+        'max_lifetime': int(os.getenv('DB_POOL_MAX_LIFETIME', 30 * 60)),
+    }
+
+# DB_ENGINE=sqlite - локальная SQLite вместо PostgreSQL (разработка, python -m benchmarks.suite)
+if os.getenv('DB_ENGINE') == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.getenv('DB_SQLITE_PATH', str(BASE_DIR / 'db.sqlite3')),
+        }
+    }
+
+
+# Кэш (деревья папок и детали структур). Воркеры gunicorn и run_import_worker - разные
+# процессы, поэтому в продакшене нужен общий бэкенд: CACHE_BACKEND=django.core.cache.backends.
+# redis.RedisCache и CACHE_LOCATION=redis://host:6379/0 (пакет redis) или Memcached
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv('CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.getenv('CACHE_LOCATION', 'document-manager'),
     }
 }
 
+# Кэш ответов структур и ETag; с LocMemCache (по умолчанию) не включается (structures.caching.cache_enabled)
+STRUCTURE_CACHE_ENABLED = os.getenv('STRUCTURE_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+STRUCTURE_CACHE_TIMEOUT = int(os.getenv('STRUCTURE_CACHE_TIMEOUT', 60 * 60))
+# Потоковые ответы больше этого размера (байт) не кэшируются и не копятся в памяти
+STRUCTURE_CACHE_STREAM_MAX_BYTES = int(os.getenv('STRUCTURE_CACHE_STREAM_MAX_BYTES', 1024 * 1024))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -159,6 +212,75 @@ STATICFILES_DIRS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Хранилище загруженных XML по хэшу содержимого
+BLOB_STORAGE_ROOT = os.getenv('BLOB_STORAGE_ROOT', MEDIA_ROOT / 'blobs')
+# Префикс internal location nginx для отдачи файлов через X-Accel-Redirect (пусто - отдает Django)
+BLOB_X_ACCEL_REDIRECT = os.getenv('BLOB_X_ACCEL_REDIRECT', '')
+
+# Ключи Document.metadata с отдельными индексами-выражениями (manage.py sync_metadata_indexes)
+DOCUMENT_METADATA_INDEXED_KEYS = [
+    key.strip() for key in os.getenv('DOCUMENT_METADATA_INDEXED_KEYS', 'folder_code').split(',') if key.strip()
+]
+
+# Фоновые импорты (manage.py run_import_worker): процессов на обработчик,
+# одновременно выполняемых задач на все обработчики, таймаут зависшей задачи в секундах
+IMPORT_WORKER_PROCESSES = int(os.getenv('IMPORT_WORKER_PROCESSES', 2))
+IMPORT_JOB_MAX_RUNNING = int(os.getenv('IMPORT_JOB_MAX_RUNNING', 2))
+IMPORT_JOB_TIMEOUT = int(os.getenv('IMPORT_JOB_TIMEOUT', 6 * 60 * 60))
+
+# Процессов для разбора и хэширования XML при пакетной загрузке документов (0/1 - без пула)
+DOCUMENT_PARSE_PROCESSES = int(os.getenv('DOCUMENT_PARSE_PROCESSES', 0))
+# Ограничения ZIP архивов пакетной загрузки (защита от zip-бомб): XML файлов в архиве,
+# размер одного файла и всех файлов после распаковки (байт), степень сжатия файла
+DOCUMENT_ZIP_MAX_FILES = int(os.getenv('DOCUMENT_ZIP_MAX_FILES', 10000))
+DOCUMENT_ZIP_MAX_FILE_SIZE = int(os.getenv('DOCUMENT_ZIP_MAX_FILE_SIZE', 100 * 1024 * 1024))
+DOCUMENT_ZIP_MAX_TOTAL_SIZE = int(os.getenv('DOCUMENT_ZIP_MAX_TOTAL_SIZE', 2 * 1024 * 1024 * 1024))
+DOCUMENT_ZIP_MAX_RATIO = int(os.getenv('DOCUMENT_ZIP_MAX_RATIO', 200))
+
+# Async представления чтения (дерево, списки, поиск, карточки) вместо синхронных.
+# Включается в asgi.py: под WSGI async представления выполнялись бы в отдельном цикле на каждый запрос
+ASYNC_READ_VIEWS = os.getenv('ASYNC_READ_VIEWS', 'false').lower() in ('1', 'true', 'yes')
+
+# Инструментирование запросов (document_manager.middleware): заголовки Server-Timing
+# и X-Query-Count, метрики Prometheus на /metrics
+REQUEST_METRICS_ENABLED = os.getenv('REQUEST_METRICS_ENABLED', 'true').lower() in ('1', 'true', 'yes')
+# Доступ к /metrics: заголовок Authorization: Bearer <METRICS_TOKEN> или адрес клиента
+# из METRICS_ALLOWED_IPS (через запятую, REMOTE_ADDR). Без них /metrics закрыт (403)
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+METRICS_ALLOWED_IPS = [
+    ip.strip() for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip.strip()
+]
+# Самых медленных SQL запросов в Server-Timing (текст запроса - только при DEBUG)
+REQUEST_SLOW_QUERIES = int(os.getenv('REQUEST_SLOW_QUERIES', 3))
+# Предупреждение о N+1: один шаблон SQL выполнен за запрос больше N раз (0 - не проверять)
+N_PLUS_ONE_THRESHOLD = int(os.getenv('N_PLUS_ONE_THRESHOLD', 10))
+
+# Трассировка этапов импорта (document_manager.tracing): off; stages - тайминги этапов
+# в ImportLog.stage_timings; debug - еще и строка в лог на каждый этап
+IMPORT_TRACE_LEVEL = os.getenv('IMPORT_TRACE_LEVEL', 'stages')
+# Доля трассируемых импортов (0..1)
+IMPORT_TRACE_SAMPLE_RATE = float(os.getenv('IMPORT_TRACE_SAMPLE_RATE', 1))
+
+# Логи приложения в stdout
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'formatters': {
+        'simple': {'format': '%(asctime)s %(levelname)s %(name)s: %(message)s'},
+    },
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler', 'formatter': 'simple'},
+    },
+    'loggers': {
+        name: {
+            'handlers': ['console'],
+            'level': os.getenv('LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        }
+        for name in ('document_manager', 'structures', 'documents', 'import_logs')
+    },
+}
+
 LOGIN_URL = '/login/'
 LOGIN_REDIRECT_URL = '/'
 LOGOUT_REDIRECT_URL = '/'
@@ -0,0 +1,202 @@
+"""
+Контентно-адресуемое хранилище загруженных XML файлов.
+
+Файл хранится по своему SHA-256 хэшу в шардированных каталогах
+(ab/cd/abcd...), поэтому одинаковое содержимое хранится один раз.
+Запись идет во временный файл и атомарно переименовывается.
+Файлы, ожидающие фоновой обработки, лежат отдельно в uploads/.
+"""
+import hashlib
+import os
+import re
+import tempfile
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+
+
+BLOB_ROOT = str(getattr(settings, 'BLOB_STORAGE_ROOT', os.path.join(settings.MEDIA_ROOT, 'blobs')))
+CHUNK_SIZE = 64 * 1024
+
+_RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def blob_relative_path(file_hash):
+    return os.path.join(file_hash[:2], file_hash[2:4], file_hash)
+
+
+def blob_path(file_hash):
+    return os.path.join(BLOB_ROOT, blob_relative_path(file_hash))
+
+
+def blob_exists(file_hash):
+    return bool(file_hash) and os.path.exists(blob_path(file_hash))
+
+
+class BlobWriter:
+    """
+    Запись файла во временный файл хранилища.
+
+    commit(file_hash) атомарно переносит его на место по хэшу (если такого
+    содержимого еще нет), без commit временный файл удаляется при выходе
+    из контекста. path - уже записанный временный файл (например, другим
+    процессом), для него доступны только commit и discard.
+    """
+
+    def __init__(self, path=None):
+        if path is None:
+            tmp_dir = os.path.join(BLOB_ROOT, 'tmp')
+            os.makedirs(tmp_dir, exist_ok=True)
+            self.file = tempfile.NamedTemporaryFile(dir=tmp_dir, delete=False)
+            path = self.file.name
+        else:
+            self.file = None
+        self.path = path
+        self.committed = False
+
+    def write(self, chunk):
+        self.file.write(chunk)
+
+    def tee(self, chunks):
+        """Пропустить куски файла дальше, попутно записывая их"""
+        for chunk in chunks:
+            self.file.write(chunk)
+            yield chunk
+
+    def close(self):
+        """Завершить запись (файл остается во временном каталоге до commit)"""
+        if self.file is not None and not self.file.closed:
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            self.file.close()
+
+    def commit(self, file_hash):
+        self.close()
+
+        target = blob_path(file_hash)
+        if os.path.exists(target):
+            # Такое содержимое уже хранится
+            os.remove(self.path)
+        else:
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            os.replace(self.path, target)
+        self.committed = True
+        return blob_relative_path(file_hash)
+
+    def discard(self):
+        if not self.committed:
+            if self.file is not None:
+                self.file.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.discard()
+
+
+def store_blob(file_content, file_hash):
+    """Сохранить содержимое целиком (без записи, если оно уже есть)"""
+    if blob_exists(file_hash):
+        return blob_relative_path(file_hash)
+    with BlobWriter() as writer:
+        writer.write(file_content)
+        return writer.commit(file_hash)
+
+
+def save_upload(uploaded_file):
+    """
+    Сохранить загруженный файл для фоновой задачи (import_logs.jobs).
+
+    Возвращает (путь относительно хранилища, SHA-256 содержимого).
+    """
+    upload_dir = os.path.join(BLOB_ROOT, 'uploads')
+    os.makedirs(upload_dir, exist_ok=True)
+    hasher = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=upload_dir, delete=False) as f:
+        for chunk in uploaded_file.chunks(CHUNK_SIZE):
+            hasher.update(chunk)
+            f.write(chunk)
+    return os.path.relpath(f.name, BLOB_ROOT), hasher.hexdigest()
+
+
+def upload_path(relative_path):
+    return os.path.join(BLOB_ROOT, relative_path)
+
+
+def commit_upload(relative_path, file_hash):
+    """Перенести обработанный файл из uploads/ в хранилище по хэшу"""
+    target = blob_path(file_hash)
+    if os.path.exists(target):
+        delete_upload(relative_path)
+    else:
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        os.replace(upload_path(relative_path), target)
+    return blob_relative_path(file_hash)
+
+
+def delete_upload(relative_path):
+    try:
+        os.remove(upload_path(relative_path))
+    except FileNotFoundError:
+        pass
+
+
+def _iter_file_range(path, start, length):
+    with open(path, 'rb') as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def blob_response(request, file_hash, filename, content_type='application/xml'):
+    """
+    Отдача файла из хранилища без загрузки в память.
+
+    Поддерживает If-None-Match (ETag - хэш файла) и один диапазон Range.
+    Если задан BLOB_X_ACCEL_REDIRECT, файл отдает nginx (sendfile).
+    """
+    etag = f'"{file_hash}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+
+    path = blob_path(file_hash)
+    accel_prefix = getattr(settings, 'BLOB_X_ACCEL_REDIRECT', '')
+    if accel_prefix:
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{blob_relative_path(file_hash)}"
+    else:
+        size = os.path.getsize(path)
+        match = _RANGE_RE.match(request.headers.get('Range', ''))
+        if match and any(match.groups()):
+            start, end = match.groups()
+            if start:
+                start, end = int(start), min(int(end), size - 1) if end else size - 1
+            else:
+                # bytes=-N: последние N байт
+                start, end = max(size - int(end), 0), size - 1
+            if start > end or start >= size:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{size}'
+                return response
+            response = StreamingHttpResponse(
+                _iter_file_range(path, start, end - start + 1), status=206, content_type=content_type
+            )
+            response['Content-Range'] = f'bytes {start}-{end}/{size}'
+            response['Content-Length'] = str(end - start + 1)
+        else:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+
+    response['Accept-Ranges'] = 'bytes'
+    response['ETag'] = etag
+    response['Content-Disposition'] = content_disposition_header(as_attachment=True, filename=filename)
+    return response
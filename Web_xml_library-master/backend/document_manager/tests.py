@@ -0,0 +1,205 @@
+import os
+import runpy
+import xml.etree.ElementTree as ET
+from unittest import mock
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from structures.importer import import_folder_tree
+from structures.models import Folder, Structure
+from .metrics import N_PLUS_ONE, REQUEST_DB_QUERIES
+from .middleware import QueryStats, RequestMetricsMiddleware
+from .tracing import NO_TRACE, ImportTrace, start_trace
+
+
+STRUCTURE_XML = """
+<structure name="Метрики">
+  <folder code="A" name="A"><folder code="A1" name="A1"/></folder>
+  <folder code="B" name="B"/>
+</structure>
+"""
+
+
+def db_queries_series(route):
+    """(число запросов, сумма SQL) гистограммы http_request_db_queries по маршруту"""
+    counts, total = REQUEST_DB_QUERIES.series.get((('method', 'GET'), ('route', route)), ([], 0))
+    return sum(counts), total
+
+
+class RequestMetricsMiddlewareTest(TestCase):
+    def setUp(self):
+        self.structure = Structure.objects.create(name='Метрики')
+        import_folder_tree(self.structure, ET.fromstring(STRUCTURE_XML))
+
+    def test_headers(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(f'/api/structures/{self.structure.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Query-Count'], str(len(queries)))
+        timing = response['Server-Timing']
+        self.assertIn('db;dur=', timing)
+        self.assertIn(f'desc="{len(queries)} queries"', timing)
+        self.assertIn('app;dur=', timing)
+        self.assertIn('sql-1;dur=', timing)
+        # Текст SQL - только при DEBUG
+        self.assertNotIn('SELECT', timing)
+
+    @override_settings(DEBUG=True)
+    def test_sql_text_in_debug(self):
+        response = self.client.get(f'/api/structures/{self.structure.id}/')
+        self.assertIn('desc="SELECT', response['Server-Timing'])
+        self.assertTrue(response['Server-Timing'].isascii())
+
+    def test_streaming_response(self):
+        route = 'api/structures/<int:structure_id>/folders/'
+        before = db_queries_series(route)
+        response = self.client.get(f'/api/structures/{self.structure.id}/folders/')
+        self.assertTrue(response.streaming)
+        self.assertFalse(response.has_header('X-Query-Count'))
+        self.assertFalse(response.has_header('Server-Timing'))
+
+        with CaptureQueriesContext(connection) as queries:
+            b''.join(response.streaming_content)
+        response.close()
+        count, total = db_queries_series(route)
+        self.assertEqual(count, before[0] + 1)
+        # SQL тела ответа учтен в метриках запроса
+        self.assertGreaterEqual(total - before[1], len(queries))
+        self.assertGreater(len(queries), 0)
+
+    @override_settings(N_PLUS_ONE_THRESHOLD=2)
+    def test_n_plus_one(self):
+        def view(request):
+            for folder in Folder.objects.filter(structure=self.structure):
+                Folder.objects.filter(parent_id=folder.id).count()
+            return HttpResponse()
+
+        middleware = RequestMetricsMiddleware(view)
+        labels = (('method', 'GET'), ('route', 'unmatched'))
+        before = N_PLUS_ONE.series.get(labels, 0)
+        with self.assertLogs('document_manager.sql', 'WARNING') as logs:
+            response = middleware(RequestFactory().get('/n-plus-one/'))
+        self.assertEqual(response['X-Query-Count'], '4')
+        self.assertIn('N+1', logs.output[0])
+        self.assertIn('3 раз из 4', logs.output[0])
+        self.assertEqual(N_PLUS_ONE.series[labels], before + 1)
+
+
+class QueryStatsTest(SimpleTestCase):
+    def test_templates(self):
+        stats = QueryStats(slow_limit=2)
+        for sql in ('SELECT 1 WHERE id IN (%s, %s)', 'SELECT 1 WHERE id IN (%s, %s, %s)'):
+            stats.add(sql, 0.001)
+        # Многострочный INSERT пачки - не N+1
+        for _ in range(5):
+            stats.add('INSERT INTO t (a) VALUES (%s), (%s)', 0.002)
+        stats.add('SELECT 2', 0.5)
+
+        self.assertEqual(stats.count, 8)
+        self.assertEqual(stats.repeated_template(1), ('SELECT 1 WHERE id IN (%s, ...)', 2))
+        self.assertIsNone(stats.repeated_template(2))
+        self.assertIsNone(stats.repeated_template(0))
+        self.assertEqual([sql for _, sql in sorted(stats.slowest, reverse=True)],
+                         ['SELECT 2', 'INSERT INTO t (a) VALUES (%s), (%s)'])
+
+
+class ImportTraceTest(SimpleTestCase):
+    def test_stages(self):
+        trace = ImportTrace('DOCUMENT_IMPORT', 'd.xml')
+        with trace.span('parse'):
+            pass
+        trace.add('db_write', 1.5)
+        trace.add('db_write', 2.25)
+        trace.merge({'parse_ms': 10, 'levels': 3}, {'parse_ms': 'folder_resolution', 'insert_ms': 'db_write'})
+
+        timings = trace.finish()
+        self.assertEqual(set(timings), {'parse_ms', 'db_write_ms', 'folder_resolution_ms', 'total_ms'})
+        # Этапы с одним именем суммируются
+        self.assertEqual(timings['db_write_ms'], 3.75)
+        self.assertEqual(timings['folder_resolution_ms'], 10)
+        self.assertGreaterEqual(timings['parse_ms'], 0)
+        self.assertGreaterEqual(timings['total_ms'], 0)
+
+    def test_span_on_error(self):
+        trace = ImportTrace('DOCUMENT_IMPORT', 'd.xml')
+        with self.assertRaises(ValueError):
+            with trace.span('parse'):
+                raise ValueError
+        self.assertIn('parse_ms', trace.finish())
+
+    @override_settings(IMPORT_TRACE_LEVEL='off')
+    def test_off(self):
+        trace = start_trace('DOCUMENT_IMPORT', 'd.xml')
+        self.assertIs(trace, NO_TRACE)
+        with trace.span('parse'):
+            trace.add('db_write', 1)
+        self.assertEqual(trace.finish(), {})
+
+    def test_sample_rate(self):
+        with override_settings(IMPORT_TRACE_SAMPLE_RATE=0.25), mock.patch('random.random', return_value=0.5):
+            self.assertIs(start_trace('DOCUMENT_IMPORT', 'd.xml'), NO_TRACE)
+        with override_settings(IMPORT_TRACE_SAMPLE_RATE=0.75), mock.patch('random.random', return_value=0.5):
+            self.assertIsInstance(start_trace('DOCUMENT_IMPORT', 'd.xml'), ImportTrace)
+        with override_settings(IMPORT_TRACE_SAMPLE_RATE=0):
+            self.assertIs(start_trace('DOCUMENT_IMPORT', 'd.xml'), NO_TRACE)
+
+    @override_settings(IMPORT_TRACE_LEVEL='debug')
+    def test_debug_logs_stages(self):
+        trace = start_trace('STRUCTURE_IMPORT', 's.xml')
+        with self.assertLogs('document_manager.imports', 'INFO') as logs:
+            trace.add('parse', 2)
+            trace.finish()
+        self.assertEqual(len(logs.output), 2)
+        self.assertIn('STRUCTURE_IMPORT s.xml: parse 2.00 мс', logs.output[0])
+        self.assertIn('всего', logs.output[1])
+
+    @override_settings(IMPORT_TRACE_LEVEL='stages')
+    def test_stages_level_does_not_log(self):
+        trace = start_trace('STRUCTURE_IMPORT', 's.xml')
+        with self.assertNoLogs('document_manager.imports'):
+            trace.add('parse', 2)
+            trace.finish()
+
+
+class MetricsAccessTest(TestCase):
+    def get(self, **kwargs):
+        return self.client.get('/metrics', **kwargs)
+
+    def test_closed_by_default(self):
+        self.assertEqual(self.get().status_code, 403)
+        self.assertEqual(self.get(headers={'Authorization': 'Bearer '}).status_code, 403)
+
+    @override_settings(METRICS_TOKEN='секрет-token')
+    def test_token(self):
+        response = self.get(headers={'Authorization': 'Bearer секрет-token'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'# TYPE', response.content)
+        for authorization in ('Bearer other', 'секрет-token', ''):
+            self.assertEqual(self.get(headers={'Authorization': authorization}).status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['10.0.0.5'])
+    def test_allowed_ips(self):
+        self.assertEqual(self.get(REMOTE_ADDR='10.0.0.5').status_code, 200)
+        self.assertEqual(self.get(REMOTE_ADDR='10.0.0.6').status_code, 403)
+
+    @override_settings(REQUEST_METRICS_ENABLED=False, METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_disabled(self):
+        self.assertEqual(self.get().status_code, 404)
+
+
+class GunicornConfigTest(SimpleTestCase):
+    def workers(self, **env):
+        env = {key: value for key, value in os.environ.items() if key not in ('CACHE_BACKEND', 'WEB_WORKERS')} | env
+        with mock.patch.dict(os.environ, env, clear=True), mock.patch('multiprocessing.cpu_count', return_value=4):
+            return runpy.run_path(str(settings.BASE_DIR / 'gunicorn.conf.py'))['workers']
+
+    def test_workers(self):
+        # С LocMemCache кэш не общий - по умолчанию один воркер
+        self.assertEqual(self.workers(), 1)
+        self.assertEqual(self.workers(CACHE_BACKEND='django.core.cache.backends.locmem.LocMemCache'), 1)
+        self.assertEqual(self.workers(CACHE_BACKEND='django.core.cache.backends.redis.RedisCache'), 9)
+        self.assertEqual(self.workers(WEB_WORKERS='3'), 3)
@@ -0,0 +1,89 @@
+"""
+Трассировка этапов импорта: время каждого этапа одного импорта в мс.
+
+    trace = start_trace('STRUCTURE_IMPORT', uploaded_file.name)
+    with trace.span('decode'):
+        ...
+    ImportLog.objects.create(..., stage_timings=trace.finish())
+
+Этапы с одним именем суммируются. IMPORT_TRACE_LEVEL: off - трассировка
+выключена (span - общий пустой контекст, finish - {}), stages - тайминги
+сохраняются в ImportLog.stage_timings, debug - еще и строка в лог
+document_manager.imports на каждый этап. IMPORT_TRACE_SAMPLE_RATE - доля
+трассируемых импортов.
+"""
+import logging
+import random
+import time
+from contextlib import contextmanager, nullcontext
+
+from django.conf import settings
+
+logger = logging.getLogger('document_manager.imports')
+
+_NO_SPAN = nullcontext()
+
+
+class ImportTrace:
+    def __init__(self, operation, name, log_stages=False):
+        self.operation = operation
+        self.name = name
+        self.log_stages = log_stages
+        self.started = time.perf_counter()
+        self.timings = {}
+
+    @contextmanager
+    def span(self, stage):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, (time.perf_counter() - started) * 1000)
+
+    def add(self, stage, ms):
+        key = f'{stage}_ms'
+        self.timings[key] = round(self.timings.get(key, 0) + ms, 2)
+        if self.log_stages:
+            logger.info('%s %s: %s %.2f мс', self.operation, self.name, stage, ms)
+
+    def merge(self, timings, stages):
+        """Тайминги, уже замеренные внутри функции импорта: stages - {ключ в timings: этап}"""
+        for key, stage in stages.items():
+            if key in timings:
+                self.add(stage, timings[key])
+
+    def finish(self):
+        """Тайминги этапов и общее время (для ImportLog.stage_timings)"""
+        total_ms = round((time.perf_counter() - self.started) * 1000, 2)
+        if self.log_stages:
+            logger.info('%s %s: всего %.2f мс', self.operation, self.name, total_ms)
+        return {**self.timings, 'total_ms': total_ms}
+
+
+class _NoTrace:
+    """Трассировка выключена или импорт не попал в выборку"""
+
+    def span(self, stage):
+        return _NO_SPAN
+
+    def add(self, stage, ms):
+        pass
+
+    def merge(self, timings, stages):
+        pass
+
+    def finish(self):
+        return {}
+
+
+NO_TRACE = _NoTrace()
+
+
+def start_trace(operation, name):
+    level = settings.IMPORT_TRACE_LEVEL
+    if level == 'off':
+        return NO_TRACE
+    rate = settings.IMPORT_TRACE_SAMPLE_RATE
+    if rate < 1 and random.random() >= rate:
+        return NO_TRACE
+    return ImportTrace(operation, name, log_stages=level == 'debug')
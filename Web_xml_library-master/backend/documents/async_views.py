@@ -0,0 +1,80 @@
+"""
+Async версии представлений чтения документов (ASGI, settings.ASYNC_READ_VIEWS).
+
+Формат ответов тот же, что в views.py; списки отдаются потоком
+из QuerySet.aiterator().
+"""
+from django.http import JsonResponse
+
+from .models import Document, FolderDocument
+from .views import (
+    FOLDER_DOCUMENT_FIELDS, FOLDER_DOCUMENT_ORDERINGS, DocumentSearchError, document_details,
+    document_search_queryset, folder_document_item, folder_header, parse_document_search, subtree_folder_query
+)
+from document_manager.pagination import PaginationError, apaginate
+from document_manager.responses import StreamingJsonResponse
+from structures.models import Folder
+
+
+async def get_document_details(request, document_id):
+    """Получить детальную информацию о документе"""
+    try:
+        document = await Document.objects.aget(id=document_id)
+    except Document.DoesNotExist:
+        return JsonResponse({'error': 'Документ не найден'}, status=404)
+
+    links = FolderDocument.objects.filter(document=document).select_related('folder__structure')
+    return JsonResponse(document_details(document, [link async for link in links]))
+
+
+async def get_documents_by_folder(request, folder_id):
+    """Получить все документы в папке"""
+    try:
+        folder = await Folder.objects.select_related('structure').aget(id=folder_id)
+    except Folder.DoesNotExist:
+        return JsonResponse({'error': 'Папка не найден'}, status=404)
+
+    folder_docs = FolderDocument.objects.filter(folder=folder).values(*FOLDER_DOCUMENT_FIELDS)
+    try:
+        rows, page_info = await apaginate(folder_docs, request, FOLDER_DOCUMENT_ORDERINGS, stream=True)
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    counts = {'documents_count': 0}
+
+    async def documents():
+        async for row in rows:
+            counts['documents_count'] += 1
+            yield folder_document_item(row)
+
+    return StreamingJsonResponse(
+        folder_header(folder), 'documents', documents(),
+        tail=lambda: {**counts, **page_info}
+    )
+
+
+async def search_documents(request):
+    """Поиск документов по различным критериям"""
+    try:
+        search = parse_document_search(request)
+    except DocumentSearchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    subtree_folder = None
+    if search['subtree_folder_id']:
+        subtree_folder = await subtree_folder_query(search['subtree_folder_id']).afirst()
+    documents_qs, orderings = document_search_queryset(search, subtree_folder)
+
+    try:
+        rows, page_info = await apaginate(documents_qs, request, orderings, stream=True)
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    counts = {'count': 0}
+
+    async def documents():
+        async for row in rows:
+            counts['count'] += 1
+            yield row
+
+    return StreamingJsonResponse({}, 'documents', documents(), tail=lambda: {**counts, **page_info})
@@ -0,0 +1,364 @@
+import multiprocessing
+import os
+import threading
+import zipfile
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Document, FolderDocument
+from .parsing import DocumentParseError, parse_document_stream
+from structures.counters import adjust_document_counters
+from structures.models import Folder
+from document_manager.storage import CHUNK_SIZE, BlobWriter
+from document_manager.tracing import NO_TRACE
+
+
+# Размер пачки для bulk_create
+BULK_BATCH_SIZE = 1000
+# Файлов в работе на один процесс пула разбора
+PARSE_QUEUE_PER_PROCESS = 8
+
+_parse_pool = None
+_parse_pool_lock = threading.Lock()
+
+
+class ArchiveLimitError(Exception):
+    """ZIP архив превышает ограничения DOCUMENT_ZIP_* (сообщение отдается клиенту)"""
+
+
+class StoredSource:
+    """Файл, уже скопированный во временный файл хранилища (источник для parse_and_store_document)"""
+
+    def __init__(self, path):
+        self.path = path
+
+    def discard(self):
+        BlobWriter(path=self.path).discard()
+
+
+def _store_chunks(chunks):
+    blob = BlobWriter()
+    try:
+        for chunk in chunks:
+            blob.write(chunk)
+        blob.close()
+    except BaseException:
+        blob.discard()
+        raise
+    return StoredSource(blob.path)
+
+
+def _archive_xml_members(archive):
+    """
+    XML файлы архива. Защита от zip-бомб: число файлов, размер каждого и всех
+    вместе после распаковки и степень сжатия проверяются по заголовкам до
+    распаковки (ArchiveLimitError).
+    """
+    members = [
+        info for info in archive.infolist()
+        if not info.is_dir() and info.filename.lower().endswith('.xml')
+    ]
+    if len(members) > settings.DOCUMENT_ZIP_MAX_FILES:
+        raise ArchiveLimitError(f'В архиве больше {settings.DOCUMENT_ZIP_MAX_FILES} XML файлов')
+
+    total_size = 0
+    for info in members:
+        if info.file_size > settings.DOCUMENT_ZIP_MAX_FILE_SIZE:
+            raise ArchiveLimitError(
+                f'Файл {info.filename} в архиве больше {settings.DOCUMENT_ZIP_MAX_FILE_SIZE} байт'
+            )
+        if info.file_size > max(info.compress_size, 1) * settings.DOCUMENT_ZIP_MAX_RATIO:
+            raise ArchiveLimitError(f'Файл {info.filename} в архиве сжат подозрительно сильно')
+        total_size += info.file_size
+    if total_size > settings.DOCUMENT_ZIP_MAX_TOTAL_SIZE:
+        raise ArchiveLimitError(
+            f'Файлы архива после распаковки больше {settings.DOCUMENT_ZIP_MAX_TOTAL_SIZE} байт'
+        )
+    return members
+
+
+def _read_member(member, info, limit):
+    """Куски члена архива; распаковка прерывается, как только прочитано больше limit байт"""
+    read = 0
+    for chunk in iter(lambda: member.read(CHUNK_SIZE), b''):
+        read += len(chunk)
+        if read > limit:
+            raise ArchiveLimitError(f'Файл {info.filename} в архиве больше заявленного размера')
+        yield chunk
+
+
+def iter_uploaded_xml_files(uploaded_files):
+    """
+    Пары (имя, StoredSource) из загруженных XML файлов и ZIP архивов.
+
+    Файлы и члены архивов копируются во временные файлы хранилища кусками,
+    в память целиком не читаются; временный файл затем становится файлом
+    документа (или удаляется). Архив за пределами DOCUMENT_ZIP_* -
+    ArchiveLimitError до распаковки.
+    """
+    for uploaded_file in uploaded_files:
+        if uploaded_file.name.lower().endswith('.zip'):
+            with zipfile.ZipFile(uploaded_file) as archive:
+                remaining = settings.DOCUMENT_ZIP_MAX_TOTAL_SIZE
+                for info in _archive_xml_members(archive):
+                    limit = min(info.file_size, remaining)
+                    with archive.open(info) as member:
+                        source = _store_chunks(_read_member(member, info, limit))
+                    remaining -= os.path.getsize(source.path)
+                    yield os.path.basename(info.filename), source
+        else:
+            yield uploaded_file.name, _store_chunks(uploaded_file.chunks(CHUNK_SIZE))
+
+
+def _duplicate_result(result, reason, **extra):
+    result.update({'status': 'duplicate', 'reason': reason, **extra})
+
+
+def parse_and_store_document(item):
+    """
+    Разбор, хэш и запись во временный файл хранилища одного документа.
+
+    item - (имя, источник): StoredSource, путь к файлу на диске или содержимое в bytes.
+    Выполняется в процессе пула, поэтому возвращает компактный кортеж
+    (имя, поля документа с blob_path или None, текст ошибки или None).
+    """
+    filename, source = item
+    if isinstance(source, StoredSource):
+        # Файл уже во временном файле хранилища: разбор потоком, без копии
+        try:
+            with open(source.path, 'rb') as f:
+                fields = parse_document_stream(iter(lambda: f.read(CHUNK_SIZE), b''))
+        except (DocumentParseError, UnicodeDecodeError) as e:
+            source.discard()
+            return filename, None, str(e)
+        except BaseException:
+            source.discard()
+            raise
+        fields['blob_path'] = source.path
+        return filename, fields, None
+
+    # Файл с диска или содержимое в памяти: разбор и запись во временный файл одним проходом
+    blob = BlobWriter()
+    try:
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                fields = parse_document_stream(blob.tee(iter(lambda: f.read(CHUNK_SIZE), b'')))
+        else:
+            fields = parse_document_stream(blob.tee([source]))
+        blob.close()
+    except (DocumentParseError, UnicodeDecodeError) as e:
+        blob.discard()
+        return filename, None, str(e)
+    except BaseException:
+        blob.discard()
+        raise
+    fields['blob_path'] = blob.path
+    return filename, fields, None
+
+
+def _create_pool(processes):
+    # spawn - дочерние процессы не наследуют соединения с БД и потоки веб-сервера
+    return ProcessPoolExecutor(
+        max_workers=processes,
+        mp_context=multiprocessing.get_context('spawn'),
+        initializer=django.setup
+    )
+
+
+def get_parse_pool(processes):
+    """Пул процессов разбора, один на процесс приложения (создается при первом вызове)"""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is not None and _parse_pool[0] != processes:
+            reset_parse_pool()
+        if _parse_pool is None:
+            _parse_pool = (processes, _create_pool(processes))
+        return _parse_pool[1]
+
+
+def reset_parse_pool():
+    """Остановить пул (после аварийного завершения процесса пула пересоздается)"""
+    global _parse_pool
+    if _parse_pool is not None:
+        _parse_pool[1].shutdown(wait=False, cancel_futures=True)
+        _parse_pool = None
+
+
+def parse_documents(files, processes=None):
+    """
+    Результаты parse_and_store_document по файлам, в исходном порядке.
+
+    processes (по умолчанию DOCUMENT_PARSE_PROCESSES) > 1 - разбор и хэширование
+    в пуле процессов, иначе в текущем процессе. В работе одновременно не больше
+    PARSE_QUEUE_PER_PROCESS файлов на процесс, поэтому ленивый источник
+    (ZIP архив) не читается в память целиком.
+    """
+    if processes is None:
+        processes = settings.DOCUMENT_PARSE_PROCESSES
+    if processes <= 1:
+        yield from map(parse_and_store_document, files)
+        return
+
+    pool = get_parse_pool(processes)
+    pending = deque()
+    try:
+        for item in files:
+            pending.append((item, pool.submit(parse_and_store_document, item)))
+            if len(pending) >= processes * PARSE_QUEUE_PER_PROCESS:
+                yield pending.popleft()[1].result()
+        while pending:
+            yield pending.popleft()[1].result()
+    except BrokenProcessPool:
+        with _parse_pool_lock:
+            reset_parse_pool()
+        raise
+    finally:
+        # Прерванный разбор: временные файлы уже разобранных и еще не разобранных документов не нужны
+        for (_, source), future in pending:
+            if future.cancel() or future.exception() is not None:
+                if isinstance(source, StoredSource):
+                    source.discard()
+                continue
+            _, fields, _ = future.result()
+            if fields is not None:
+                BlobWriter(path=fields['blob_path']).discard()
+
+
+def import_document_batch(structure_id, files, processes=None, trace=NO_TRACE):
+    """
+    Пакетная загрузка документов в структуру.
+
+    files - пары (имя файла, источник - см. parse_and_store_document).
+    Разбор и хэширование идут в пуле из processes процессов (parse_documents), запись в БД - здесь же
+    одним этапом: дубликаты кодов и хэшей, папки и вставка проверяются
+    и выполняются одним запросом на весь пакет.
+    trace - трассировка импорта (document_manager.tracing), этапы пакета
+    суммируются в ней.
+    Возвращает список результатов по файлам (created / duplicate / error).
+    """
+    results = []
+    parsed = []
+
+    # Временные файлы разобранных документов удаляются при любой ошибке
+    # (перенесенные в хранилище commit уже не трогает)
+    try:
+        # Разбор (в пуле процессов) и проверка дубликатов внутри пакета
+        seen_codes = set()
+        seen_hashes = set()
+        # parse - разбор, хэш и запись во временный файл одним проходом
+        with trace.span('parse'):
+            for filename, fields, error in parse_documents(files, processes):
+                result = {'filename': filename}
+                results.append(result)
+                if error is not None:
+                    result.update({'status': 'error', 'error': error})
+                    continue
+
+                blob = BlobWriter(path=fields.pop('blob_path'))
+                result['code'] = fields['code']
+                if fields['code'] in seen_codes or fields['file_hash'] in seen_hashes:
+                    blob.discard()
+                    _duplicate_result(result, 'batch')
+                    continue
+                seen_codes.add(fields['code'])
+                seen_hashes.add(fields['file_hash'])
+                fields['blob'] = blob
+                parsed.append((result, fields))
+
+        # Дубликаты среди уже загруженных документов - один запрос
+        with trace.span('duplicate_check'):
+            existing = Document.objects.filter(
+                Q(code__in=[fields['code'] for _, fields in parsed]) |
+                Q(file_hash__in=[fields['file_hash'] for _, fields in parsed])
+            ).values_list('id', 'code', 'file_hash')
+            existing_by_code = {}
+            existing_by_hash = {}
+            for doc_id, code, file_hash in existing:
+                existing_by_code[code] = doc_id
+                if file_hash:
+                    existing_by_hash[file_hash] = doc_id
+
+        # Папки структуры - один запрос
+        with trace.span('folder_resolution'):
+            folder_ids = dict(
+                Folder.objects.filter(
+                    structure_id=structure_id,
+                    code__in={fields['folder_code'] for _, fields in parsed}
+                ).values_list('code', 'id')
+            )
+
+        to_create = []
+        for result, fields in parsed:
+            if fields['code'] in existing_by_code:
+                _duplicate_result(result, 'code', document_id=existing_by_code[fields['code']])
+            elif fields['file_hash'] in existing_by_hash:
+                _duplicate_result(result, 'hash', document_id=existing_by_hash[fields['file_hash']])
+            elif fields['folder_code'] not in folder_ids:
+                result.update({
+                    'status': 'error',
+                    'error': f'Папка с кодом "{fields["folder_code"]}" не найдена в указанной структуре'
+                })
+            else:
+                to_create.append((result, fields))
+
+        with transaction.atomic():
+            documents = _create_documents(to_create, folder_ids, trace)
+    finally:
+        for _, fields in parsed:
+            fields['blob'].discard()
+
+    for (result, fields), document in zip(to_create, documents):
+        result.update({
+            'status': 'created',
+            'document_id': document.pk,
+            'folder_id': folder_ids[fields['folder_code']]
+        })
+
+    return results
+
+
+def _create_documents(to_create, folder_ids, trace=NO_TRACE):
+    """bulk_create документов и их связей с папками, файлы переносятся в хранилище"""
+    with trace.span('file_persist'):
+        file_paths = [fields['blob'].commit(fields['file_hash']) for _, fields in to_create]
+
+    with trace.span('db_write'):
+        documents = [
+            Document(
+                code=fields['code'],
+                name=fields['name'],
+                metadata=fields['metadata'],
+                xml_filename=result['filename'],
+                file_path=file_path,
+                file_size=fields['file_size'],
+                file_hash=fields['file_hash']
+            )
+            for (result, fields), file_path in zip(to_create, file_paths)
+        ]
+        Document.objects.bulk_create(documents, batch_size=BULK_BATCH_SIZE)
+
+        if documents and documents[0].pk is None:
+            # БД не вернула id после вставки - дочитываем их одним запросом
+            ids_by_code = dict(
+                Document.objects.filter(code__in=[doc.code for doc in documents]).values_list('code', 'id')
+            )
+            for document in documents:
+                document.pk = ids_by_code[document.code]
+
+        links = FolderDocument.objects.bulk_create(
+            [
+                FolderDocument(folder_id=folder_ids[fields['folder_code']], document_id=document.pk)
+                for (result, fields), document in zip(to_create, documents)
+            ],
+            batch_size=BULK_BATCH_SIZE
+        )
+        # bulk_create не шлет сигналы - счетчики папок обновляются одним проходом
+        adjust_document_counters([link.folder_id for link in links])
+
+    return documents
@@ -0,0 +1,83 @@
+import itertools
+import os
+
+from django.conf import settings
+from django.core.files import File
+from django.core.management.base import BaseCommand, CommandError
+
+from document_manager.tracing import start_trace
+from documents.batch import ArchiveLimitError, StoredSource, import_document_batch, iter_uploaded_xml_files
+from import_logs.models import ImportLog
+from structures.models import Structure
+
+
+def iter_document_sources(paths):
+    """
+    Пары (имя, источник) для import_document_batch из файлов и каталогов на диске.
+
+    XML файлы передаются путем - их читает процесс пула разбора,
+    ZIP архивы читаются здесь.
+    """
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, filenames in os.walk(path):
+                for filename in sorted(filenames):
+                    if filename.lower().endswith(('.xml', '.zip')):
+                        yield from iter_document_sources([os.path.join(directory, filename)])
+        elif path.lower().endswith('.zip'):
+            with File(open(path, 'rb'), name=os.path.basename(path)) as archive:
+                yield from iter_uploaded_xml_files([archive])
+        else:
+            yield os.path.basename(path), path
+
+
+class Command(BaseCommand):
+    help = 'Загрузка документов в структуру из XML файлов, каталогов и ZIP архивов на диске'
+
+    def add_arguments(self, parser):
+        parser.add_argument('structure_id', type=int)
+        parser.add_argument('paths', nargs='+', help='XML файлы, ZIP архивы или каталоги')
+        parser.add_argument('--processes', type=int,
+                            default=settings.DOCUMENT_PARSE_PROCESSES or os.cpu_count(),
+                            help='Процессов для разбора и хэширования (по умолчанию - число ядер)')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Файлов в одной записи в БД')
+
+    def handle(self, *args, **options):
+        if not Structure.objects.filter(id=options['structure_id']).exists():
+            raise CommandError(f'Структура {options["structure_id"]} не найдена')
+        for path in options['paths']:
+            if not os.path.exists(path):
+                raise CommandError(f'Путь не найден: {path}')
+
+        sources = iter_document_sources(options['paths'])
+        trace = start_trace('DOCUMENT_IMPORT', ', '.join(options['paths']))
+        summary = {'created': 0, 'duplicate': 0, 'error': 0}
+        while True:
+            batch = []
+            try:
+                batch.extend(itertools.islice(sources, options['batch_size']))
+            except ArchiveLimitError as e:
+                # Уже распакованные файлы пакета не понадобятся
+                for _, source in batch:
+                    if isinstance(source, StoredSource):
+                        source.discard()
+                raise CommandError(str(e))
+            if not batch:
+                break
+            results = import_document_batch(options['structure_id'], batch, processes=options['processes'],
+                                            trace=trace)
+            for result in results:
+                summary[result['status']] += 1
+                if result['status'] == 'error':
+                    self.stderr.write(f"{result['filename']}: {result['error']}")
+            self.stdout.write(f'Обработано файлов: {sum(summary.values())}')
+
+        ImportLog.objects.create(
+            operation_type='DOCUMENT_IMPORT',
+            filename=', '.join(options['paths'])[:500],
+            message=f'Загрузка документов с диска: {summary}',
+            items_processed=summary['created'],
+            stage_timings=trace.finish()
+        )
+        self.stdout.write(f'Готово: {summary}')
@@ -0,0 +1,45 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from documents.metadata import metadata_index_name
+
+
+class Command(BaseCommand):
+    help = 'Создание индексов-выражений (metadata ->> ключ) для ключей из DOCUMENT_METADATA_INDEXED_KEYS'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--drop-stale', action='store_true',
+                            help='Удалить индексы ключей, которых больше нет в настройке')
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'postgresql':
+            raise CommandError('Индексы по ключам metadata поддерживаются только для PostgreSQL')
+
+        keys = settings.DOCUMENT_METADATA_INDEXED_KEYS
+        wanted = {metadata_index_name(key): key for key in keys}
+
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT indexname FROM pg_indexes WHERE tablename = 'documents_document' AND indexname LIKE %s",
+                ['documents\\_meta\\_%']
+            )
+            existing = {row[0] for row in cursor.fetchall()}
+
+            for name, key in wanted.items():
+                if name in existing:
+                    continue
+                # CONCURRENTLY - без блокировки записи в таблицу на время построения
+                cursor.execute(
+                    f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {connection.ops.quote_name(name)} '
+                    f'ON documents_document ((metadata ->> %s))',
+                    [key]
+                )
+                self.stdout.write(f'Создан индекс {name} для ключа "{key}"')
+
+            if options['drop_stale']:
+                for name in existing - wanted.keys():
+                    cursor.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {connection.ops.quote_name(name)}')
+                    self.stdout.write(f'Удален индекс {name}')
+
+        self.stdout.write(self.style.SUCCESS(f'Индексированных ключей metadata: {len(wanted)}'))
@@ -0,0 +1,91 @@
+"""
+Фильтры по ключам Document.metadata из параметров запроса.
+
+?meta.folder_code=X&meta.date__gte=2024-01-01
+
+Точные совпадения на PostgreSQL собираются в одно условие metadata @> {...}
+(GIN индекс jsonb_path_ops), диапазоны - сравнение metadata ->> 'ключ'
+как текста (индексы-выражения для ключей из DOCUMENT_METADATA_INDEXED_KEYS).
+Значения в metadata - строки, поэтому даты сравниваются в формате ISO.
+"""
+import hashlib
+import re
+
+from django.db import connection
+from django.db.models import Q, TextField
+from django.db.models.functions import Cast
+from django.db.models.fields.json import KeyTextTransform, KeyTransform
+
+
+METADATA_PARAM_PREFIX = 'meta.'
+RANGE_LOOKUPS = {'gt', 'gte', 'lt', 'lte'}
+LOOKUPS = RANGE_LOOKUPS | {'exact', 'in'}
+
+_KEY_RE = re.compile(r'^[\w-]+$')
+
+
+class MetadataFilterError(ValueError):
+    pass
+
+
+def parse_metadata_filters(params):
+    """Список (ключ, lookup, значение) из параметров вида meta.<ключ>[__lookup]"""
+    filters = []
+    for param in params:
+        if not param.startswith(METADATA_PARAM_PREFIX):
+            continue
+        key = param[len(METADATA_PARAM_PREFIX):]
+        lookup = 'exact'
+        if '__' in key:
+            head, tail = key.rsplit('__', 1)
+            if tail in LOOKUPS:
+                key, lookup = head, tail
+        if not _KEY_RE.match(key):
+            raise MetadataFilterError(f'Некорректный ключ метаданных: {key}')
+        for value in params.getlist(param):
+            filters.append((key, lookup, value))
+    return filters
+
+
+def metadata_index_name(key):
+    """Имя индекса-выражения для ключа (ASCII, не длиннее 63 символов)"""
+    slug = re.sub(r'[^a-z0-9_]', '', key.lower())[:30]
+    digest = hashlib.md5(key.encode('utf-8')).hexdigest()[:8]
+    return f'documents_meta_{slug}_{digest}'
+
+
+def apply_metadata_filters(documents_qs, filters):
+    if not filters:
+        return documents_qs
+
+    postgres = connection.vendor == 'postgresql'
+    contains = {}
+    for i, (key, lookup, value) in enumerate(filters):
+        alias = f'meta_{i}'
+        if lookup in RANGE_LOOKUPS:
+            # Диапазон - сравнение текста metadata ->> 'ключ' (без Cast на PostgreSQL,
+            # чтобы выражение совпало с индексом; на других БД Cast убирает числовое сравнение JSON)
+            expression = KeyTextTransform(key, 'metadata')
+            if not postgres:
+                expression = Cast(expression, TextField())
+            documents_qs = documents_qs.alias(**{alias: expression}).filter(
+                **{f'{alias}__{lookup}': value}
+            )
+        elif postgres:
+            values = value.split(',') if lookup == 'in' else [value]
+            if len(values) == 1 and key not in contains:
+                contains[key] = values[0]
+            else:
+                condition = Q()
+                for v in values:
+                    condition |= Q(metadata__contains={key: v})
+                documents_qs = documents_qs.filter(condition)
+        else:
+            values = value.split(',') if lookup == 'in' else value
+            documents_qs = documents_qs.alias(**{alias: KeyTransform(key, 'metadata')}).filter(
+                **{f'{alias}__{lookup}': values}
+            )
+
+    if contains:
+        documents_qs = documents_qs.filter(metadata__contains=contains)
+    return documents_qs
@@ -0,0 +1,85 @@
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    """
+    ALTER TABLE documents_document ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('simple', coalesce(code, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(name, '')), 'B') ||
+        setweight(to_tsvector('simple', coalesce(name, '')), 'B') ||
+        setweight(jsonb_to_tsvector('russian', coalesce(metadata, '{}'::jsonb), '["string"]'), 'C') ||
+        setweight(jsonb_to_tsvector('simple', coalesce(metadata, '{}'::jsonb), '["string"]'), 'C')
+    ) STORED
+    """,
+    "CREATE INDEX documents_document_search_idx ON documents_document USING gin (search_vector)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS documents_document_search_idx",
+    "ALTER TABLE documents_document DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE documents_document_fts USING fts5(
+        code, name, metadata, tokenize = 'unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER documents_document_fts_insert AFTER INSERT ON documents_document BEGIN
+        INSERT INTO documents_document_fts (rowid, code, name, metadata)
+        VALUES (new.id, new.code, new.name, (SELECT group_concat(value, ' ') FROM json_each(new.metadata)));
+    END
+    """,
+    """
+    CREATE TRIGGER documents_document_fts_update AFTER UPDATE ON documents_document BEGIN
+        DELETE FROM documents_document_fts WHERE rowid = old.id;
+        INSERT INTO documents_document_fts (rowid, code, name, metadata)
+        VALUES (new.id, new.code, new.name, (SELECT group_concat(value, ' ') FROM json_each(new.metadata)));
+    END
+    """,
+    """
+    CREATE TRIGGER documents_document_fts_delete AFTER DELETE ON documents_document BEGIN
+        DELETE FROM documents_document_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    INSERT INTO documents_document_fts (rowid, code, name, metadata)
+    SELECT id, code, name, (SELECT group_concat(value, ' ') FROM json_each(metadata)) FROM documents_document
+    """,
+]
+
+SQLITE_BACKWARD = [
+    "DROP TRIGGER IF EXISTS documents_document_fts_insert",
+    "DROP TRIGGER IF EXISTS documents_document_fts_update",
+    "DROP TRIGGER IF EXISTS documents_document_fts_delete",
+    "DROP TABLE IF EXISTS documents_document_fts",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """
+    Полнотекстовый поиск по документам.
+
+    PostgreSQL: хранимый tsvector (код, название, значения metadata; словари
+    russian и simple) с GIN индексом, обновляется самой БД при записи.
+    SQLite: таблица FTS5, которую поддерживают триггеры.
+    """
+
+    dependencies = [
+        ('documents', '0003_document_file_hash_document_updated_at_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': POSTGRES_BACKWARD, 'sqlite': SQLITE_BACKWARD}),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('documents', '0005_document_trigram_indexes'),
+        ('structures', '0003_folder_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='folderdocument',
+            index=models.Index(fields=['folder', 'created_at', 'id'], name='documents_f_folder__e44806_idx'),
+        ),
+    ]
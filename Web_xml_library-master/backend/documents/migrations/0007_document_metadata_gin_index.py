@@ -0,0 +1,30 @@
+from django.db import migrations
+
+
+POSTGRES_FORWARD = [
+    "CREATE INDEX documents_document_metadata_gin ON documents_document USING gin (metadata jsonb_path_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS documents_document_metadata_gin",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """GIN индекс jsonb_path_ops для фильтров metadata @> {...}"""
+
+    dependencies = [
+        ('documents', '0006_folderdocument_folder_created_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(POSTGRES_FORWARD), _run(POSTGRES_BACKWARD)),
+    ]
@@ -1,9 +1,19 @@
 # documents/models.py
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
+from structures.counters import deferred_document_counters
 from structures.models import Folder
 import hashlib
 
+
+class DocumentLinksQuerySet(models.QuerySet):
+    """Удаление с привязками к папкам: счетчики папок обновляются один раз на операцию"""
+
+    def delete(self):
+        with transaction.atomic(using=self.db), deferred_document_counters():
+            return super().delete()
+
+
 class Document(models.Model):
     code = models.CharField(max_length=255, unique=True, verbose_name="Код")
     name = models.CharField(max_length=500, verbose_name="Название")
@@ -15,6 +25,8 @@ class Document(models.Model):
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
 
+    objects = DocumentLinksQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Документ"
         verbose_name_plural = "Документы"
@@ -27,6 +39,10 @@ class Document(models.Model):
     def __str__(self):
         return f"{self.code} - {self.name}"
 
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(), deferred_document_counters():
+            return super().delete(*args, **kwargs)
+
     def calculate_hash(self, file_content):
         """Вычисление SHA256 хэша файла"""
         sha256_hash = hashlib.sha256()
@@ -40,12 +56,15 @@ class FolderDocument(models.Model):
     document = models.ForeignKey(Document, on_delete=models.CASCADE, verbose_name="Документ")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Дата привязки")
 
+    objects = DocumentLinksQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Привязка документа к папке"
         verbose_name_plural = "Привязки документов к папкам"
         unique_together = [['folder', 'document']]
         indexes = [
             models.Index(fields=['folder', 'document']),
+            models.Index(fields=['folder', 'created_at', 'id']),
         ]
 
     def __str__(self):
@@ -0,0 +1,118 @@
+import hashlib
+import xml.etree.ElementTree as ET
+
+from structures.streaming import XmlChunkDecoder
+
+
+class DocumentParseError(Exception):
+    """Ошибка в содержимом XML документа (сообщение отдается клиенту)"""
+
+
+def _required_text(parent, tag, parent_tag):
+    elem = parent.find(tag)
+    if elem is None:
+        raise DocumentParseError(f'Нет <{tag}> в <{parent_tag}>')
+    if elem.text is None:
+        raise DocumentParseError(f'Элемент <{tag}> не содержит текста')
+    text = elem.text.strip()
+    if not text:
+        raise DocumentParseError(f'Элемент <{tag}> содержит только пробелы или пуст')
+    return text
+
+
+def extract_document_fields(header, metadata):
+    """
+    Поля документа из <header> и <metadata>.
+
+    Возвращает словарь code, name, folder_code, metadata.
+    """
+    if not header:
+        raise DocumentParseError('Нет элемента <header>')
+
+    doc_code = _required_text(header, 'doc_number', 'header')
+    doc_name = _required_text(header, 'title', 'header')
+
+    if not metadata:
+        raise DocumentParseError('Нет элемента <metadata>')
+
+    folder_code = _required_text(metadata, 'folder_code', 'metadata')
+
+    all_metadata = {}
+    for elem in metadata:
+        if elem.text:
+            all_metadata[elem.tag] = elem.text.strip()
+
+    return {
+        'code': doc_code,
+        'name': doc_name,
+        'folder_code': folder_code,
+        'metadata': all_metadata
+    }
+
+
+class _HeaderTarget:
+    """
+    Цель XMLParser: элементы строятся только для <header> и <metadata>
+    (прямых потомков корня), остальной документ лишь проверяется парсером.
+    """
+
+    def __init__(self):
+        self.depth = 0
+        self.builder = None
+        self.found = {}
+
+    def start(self, tag, attrib):
+        self.depth += 1
+        if self.builder is None and self.depth == 2 and tag in ('header', 'metadata') and tag not in self.found:
+            self.builder = ET.TreeBuilder()
+        if self.builder is not None:
+            self.builder.start(tag, attrib)
+
+    def end(self, tag):
+        if self.builder is not None:
+            self.builder.end(tag)
+            if self.depth == 2:
+                self.found[tag] = self.builder.close()
+                self.builder = None
+        self.depth -= 1
+
+    def data(self, data):
+        if self.builder is not None:
+            self.builder.data(data)
+
+    def close(self):
+        return self.found
+
+
+def parse_document_stream(chunks):
+    """
+    Потоковый разбор документа: хэш и поля <header>/<metadata> за один проход.
+
+    Куски файла одновременно идут в sha256 и в XMLParser. Файл разбирается
+    до конца, чтобы проверить синтаксис XML целиком, но элементы строятся
+    только для <header> и <metadata>, поэтому память на загрузку постоянна.
+    """
+    hasher = hashlib.sha256()
+    file_size = 0
+    parser = ET.XMLParser(target=_HeaderTarget())
+    decoder = XmlChunkDecoder()
+
+    try:
+        for chunk in chunks:
+            hasher.update(chunk)
+            file_size += len(chunk)
+            parser.feed(decoder.decode(chunk))
+        parser.feed(decoder.close())
+        found = parser.close()
+    except ET.ParseError as e:
+        raise DocumentParseError(f'Ошибка в XML: {str(e)}')
+
+    fields = extract_document_fields(found.get('header'), found.get('metadata'))
+    fields['file_hash'] = hasher.hexdigest()
+    fields['file_size'] = file_size
+    return fields
+
+
+def parse_document_content(file_content):
+    """Разбор XML документа из байтов: поля документа, хэш и размер"""
+    return parse_document_stream([file_content])
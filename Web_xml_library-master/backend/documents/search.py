@@ -0,0 +1,54 @@
+import re
+
+from django.db import connection
+from django.db.models import BooleanField, FloatField, Q, Value
+from django.db.models.expressions import RawSQL
+
+
+# Запрос строится и по русскому словарю (морфология), и по simple (коды, числа)
+_PG_TSQUERY = "(websearch_to_tsquery('russian', %s) || websearch_to_tsquery('simple', %s))"
+
+_SQLITE_RANK = (
+    "SELECT -bm25(documents_document_fts) FROM documents_document_fts "
+    "WHERE documents_document_fts MATCH %s AND rowid = documents_document.id"
+)
+
+
+def _fts5_query(query):
+    """Запрос FTS5 из пользовательской строки: все слова, каждое в кавычках"""
+    return ' '.join(f'"{token}"' for token in re.findall(r'\w+', query))
+
+
+def full_text_search(documents_qs, query):
+    """
+    Полнотекстовый поиск с ранжированием (аннотация rank, больше - лучше).
+
+    PostgreSQL: хранимый search_vector с GIN индексом и ts_rank.
+    SQLite: таблица FTS5 и bm25. Для остальных БД - icontains без ранжирования.
+    """
+    if connection.vendor == 'postgresql':
+        return documents_qs.filter(
+            RawSQL(f'"documents_document"."search_vector" @@ {_PG_TSQUERY}', (query, query),
+                   output_field=BooleanField())
+        ).annotate(
+            rank=RawSQL(f'ts_rank("documents_document"."search_vector", {_PG_TSQUERY})', (query, query),
+                        output_field=FloatField())
+        ).order_by('-rank', 'id')
+
+    if connection.vendor == 'sqlite':
+        fts_query = _fts5_query(query)
+        if not fts_query:
+            return documents_qs.none().annotate(rank=Value(0.0, output_field=FloatField()))
+        return documents_qs.filter(
+            id__in=RawSQL(
+                'SELECT rowid FROM documents_document_fts WHERE documents_document_fts MATCH %s', (fts_query,)
+            )
+        ).annotate(
+            rank=RawSQL(_SQLITE_RANK, (fts_query,), output_field=FloatField())
+        ).order_by('-rank', 'id')
+
+    return documents_qs.filter(
+        Q(code__icontains=query) |
+        Q(name__icontains=query) |
+        Q(metadata__icontains=query)
+    ).annotate(rank=Value(0.0, output_field=FloatField()))
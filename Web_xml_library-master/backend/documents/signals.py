@@ -0,0 +1,24 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import FolderDocument
+from structures.counters import adjust_document_counters, document_link_removed
+from structures.models import Folder, Structure
+
+
+@receiver(post_save, sender=FolderDocument)
+def folder_document_created(sender, instance, created, raw=False, **kwargs):
+    """Новая привязка документа - счетчики папки, предков и структуры"""
+    if created and not raw:
+        adjust_document_counters([instance.folder_id])
+
+
+@receiver(post_delete, sender=FolderDocument)
+def folder_document_deleted(sender, instance, origin=None, **kwargs):
+    """Удаление привязки (в т.ч. каскадом от документа) уменьшает счетчики"""
+    # Привязки удаляются вместе с папками: счетчики удаляемых папок не нужны,
+    # а предков пересчитывает код, удаляющий папки
+    origin_model = origin if isinstance(origin, type) else getattr(origin, 'model', type(origin))
+    if origin_model in (Folder, Structure):
+        return
+    document_link_removed(instance.folder_id)
@@ -1,3 +1,546 @@
-from django.test import TestCase
+import datetime
+import hashlib
+import io
+import json
+import os
+import tempfile
+import xml.etree.ElementTree as ET
+import zipfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import RequestFactory, TestCase, override_settings
+from django.utils import timezone
+
+from document_manager.pagination import PaginationError, decode_cursor, encode_cursor, paginate
+from import_logs.models import ImportLog
+from structures.importer import import_folder_tree
+from structures.models import Folder, Structure
+from .batch import import_document_batch, parse_and_store_document
+from .models import Document, FolderDocument
+from .parsing import DocumentParseError, parse_document_content, parse_document_stream
+from .views import DOCUMENT_ORDERINGS
+
+
+STRUCTURE_XML = """
+<structure name="Документы">
+  <folder code="A" name="Договоры">
+    <folder code="A1" name="2024"/>
+  </folder>
+  <folder code="B" name="Отчеты"/>
+</structure>
+"""
+
+
+def document_xml(code, folder_code='A1', title=None, content='', **metadata):
+    extra = ''.join(f'<{key}>{value}</{key}>' for key, value in metadata.items())
+    return (
+        f'<?xml version="1.0" encoding="UTF-8"?>\n<document>'
+        f'<header><doc_number>{code}</doc_number><title>{title or "Документ " + code}</title></header>'
+        f'<metadata><folder_code>{folder_code}</folder_code>{extra}</metadata>'
+        f'<content>{content}</content></document>'
+    ).encode()
+
+
+def xml_file(name, content):
+    return SimpleUploadedFile(name, content, content_type='application/xml')
+
+
+def zip_file(name, members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for member_name, content in members.items():
+            archive.writestr(member_name, content)
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='application/zip')
+
+
+class BlobStorageTestCase(TestCase):
+    """Структура A/A1, B и хранилище файлов во временном каталоге"""
+
+    def setUp(self):
+        blob_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(blob_dir.cleanup)
+        self.blob_root = blob_dir.name
+        patcher = mock.patch('document_manager.storage.BLOB_ROOT', self.blob_root)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.structure = Structure.objects.create(name='Документы')
+        import_folder_tree(self.structure, ET.fromstring(STRUCTURE_XML))
+        self.folders = {folder.code: folder for folder in Folder.objects.filter(structure=self.structure)}
+
+    def temp_files(self):
+        tmp_dir = os.path.join(self.blob_root, 'tmp')
+        return os.listdir(tmp_dir) if os.path.isdir(tmp_dir) else []
+
+    def upload_batch(self, *files, **data):
+        return self.client.post('/api/documents/upload-batch/', {
+            'files': list(files), 'structure_id': self.structure.id, **data
+        })
+
+
+class BatchUploadTest(BlobStorageTestCase):
+    def test_results(self):
+        response = self.upload_batch(
+            xml_file('d1.xml', document_xml('D1')),
+            xml_file('d1-copy.xml', document_xml('D1', title='Другое название')),
+            zip_file('archive.zip', {
+                'docs/d2.xml': document_xml('D2', folder_code='B'),
+                'docs/readme.txt': b'not xml',
+                'd3.xml': document_xml('D3', folder_code='NOPE'),
+            }),
+            xml_file('broken.xml', b'<document><header>'),
+        )
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual(data['summary'], {'created': 2, 'duplicate': 1, 'error': 2})
+        results = {result['filename']: result for result in data['results']}
+        self.assertEqual(results['d1-copy.xml']['reason'], 'batch')
+        self.assertEqual(results['d2.xml']['folder_id'], self.folders['B'].id)
+        self.assertIn('NOPE', results['d3.xml']['error'])
+        self.assertEqual(results['broken.xml']['status'], 'error')
+
+        self.assertEqual(set(Document.objects.values_list('code', flat=True)), {'D1', 'D2'})
+        self.assertEqual(FolderDocument.objects.get(document__code='D1').folder_id, self.folders['A1'].id)
+        self.assertEqual(Folder.objects.get(id=self.folders['A'].id).subtree_documents_count, 1)
+        document = Document.objects.get(code='D2')
+        self.assertTrue(os.path.exists(os.path.join(self.blob_root, document.file_path)))
+        self.assertEqual(self.temp_files(), [])
+
+    def test_duplicates_of_existing_documents(self):
+        self.upload_batch(xml_file('d1.xml', document_xml('D1')))
+        response = self.upload_batch(
+            xml_file('same-code.xml', document_xml('D1', title='Новая версия')),
+            xml_file('same-content.xml', document_xml('D1')),
+        )
+        reasons = [result.get('reason') for result in response.json()['results']]
+        self.assertEqual(reasons, ['code', 'batch'])
+
+        existing = Document.objects.get(code='D1')
+        Document.objects.filter(id=existing.id).update(code='OTHER')
+        result = self.upload_batch(xml_file('same-content.xml', document_xml('D1'))).json()['results'][0]
+        self.assertEqual((result['reason'], result['document_id']), ('hash', existing.id))
+        self.assertEqual(Document.objects.count(), 1)
+        self.assertEqual(self.temp_files(), [])
+
+    def test_request_errors(self):
+        self.assertEqual(self.client.get('/api/documents/upload-batch/').status_code, 405)
+        self.assertEqual(self.client.post('/api/documents/upload-batch/', {}).status_code, 400)
+        files = [xml_file('d1.xml', document_xml('D1'))]
+        response = self.client.post('/api/documents/upload-batch/', {'files': files, 'structure_id': 'x'})
+        self.assertEqual(response.status_code, 400)
+        response = self.upload_batch(SimpleUploadedFile('bad.zip', b'not a zip'))
+        self.assertEqual(response.status_code, 400)
+
+
+class ImportTimingsTest(BlobStorageTestCase):
+    """Время этапов загрузки сохраняется в ImportLog.stage_timings"""
+
+    STAGES = {'parse_ms', 'duplicate_check_ms', 'folder_resolution_ms', 'file_persist_ms', 'db_write_ms', 'total_ms'}
+
+    def stage_timings(self):
+        return ImportLog.objects.filter(operation_type='DOCUMENT_IMPORT').latest('id').stage_timings
+
+    def test_single_upload(self):
+        response = self.client.post('/api/documents/upload-single/', {
+            'file': xml_file('d1.xml', document_xml('D1')), 'structure_id': self.structure.id
+        })
+        self.assertEqual(response.status_code, 200)
+        timings = self.stage_timings()
+        self.assertEqual(set(timings), self.STAGES)
+        self.assertGreaterEqual(timings['total_ms'], timings['parse_ms'])
+
+    def test_batch_upload(self):
+        response = self.upload_batch(xml_file('d1.xml', document_xml('D1')),
+                                     xml_file('d2.xml', document_xml('D2', folder_code='B')))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(self.stage_timings()), self.STAGES)
+
+    @override_settings(IMPORT_TRACE_LEVEL='off')
+    def test_trace_off(self):
+        self.assertEqual(self.upload_batch(xml_file('d1.xml', document_xml('D1'))).status_code, 200)
+        self.assertEqual(self.stage_timings(), {})
+
+
+class TempBlobTest(BlobStorageTestCase):
+    """Источники пакета пишутся во временные файлы потоком и не остаются после ошибок"""
+
+    def write_file(self, name, content):
+        path = os.path.join(self.blob_root, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_path_source_streamed(self):
+        content = document_xml('D1', content='текст ' * 1000)
+        path = self.write_file('d1.xml', content)
+        chunk_sizes = []
+
+        def parse(chunks):
+            return parse_document_stream(chunk_sizes.append(len(chunk)) or chunk for chunk in chunks)
+
+        with mock.patch('documents.batch.CHUNK_SIZE', 1024), mock.patch('documents.batch.parse_document_stream', parse):
+            filename, fields, error = parse_and_store_document(('d1.xml', path))
+        self.assertIsNone(error)
+        self.assertEqual(max(chunk_sizes), 1024)
+        self.assertEqual(sum(chunk_sizes), len(content))
+        with open(fields['blob_path'], 'rb') as f:
+            self.assertEqual(f.read(), content)
+        self.assertEqual(fields['file_hash'], hashlib.sha256(content).hexdigest())
+
+    def test_parse_errors_leave_no_temp_files(self):
+        broken = document_xml('D1', content='<p>не закрыт')
+        for source in (broken, self.write_file('broken.xml', broken), b'\xff\xfe<document/>'):
+            filename, fields, error = parse_and_store_document(('broken.xml', source))
+            self.assertIsNone(fields)
+            self.assertTrue(error)
+        self.assertEqual(self.temp_files(), [])
+
+    def test_folder_not_found_and_duplicates(self):
+        results = import_document_batch(self.structure.id, [
+            ('d1.xml', self.write_file('d1.xml', document_xml('D1', folder_code='NOPE'))),
+            ('d2.xml', document_xml('D2')),
+            ('d2-copy.xml', document_xml('D2')),
+        ], processes=1)
+        self.assertEqual([result['status'] for result in results], ['error', 'created', 'duplicate'])
+        self.assertEqual(self.temp_files(), [])
+
+    def test_error_mid_batch(self):
+        files = [('d1.xml', document_xml('D1')), ('d2.xml', self.write_file('d2.xml', document_xml('D2')))]
+        with mock.patch('documents.batch._create_documents', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                import_document_batch(self.structure.id, files, processes=1)
+        self.assertFalse(Document.objects.exists())
+        self.assertEqual(self.temp_files(), [])
+
+        def failing_files():
+            yield 'd1.xml', document_xml('D1')
+            raise RuntimeError
+
+        with self.assertRaises(RuntimeError):
+            import_document_batch(self.structure.id, failing_files(), processes=1)
+        self.assertEqual(self.temp_files(), [])
+
+
+class ArchiveLimitsTest(BlobStorageTestCase):
+    """Защита от zip-бомб: архив отклоняется целиком, временные файлы не остаются"""
+
+    def assertRejected(self, archive):
+        response = self.upload_batch(archive)
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Document.objects.exists())
+        self.assertEqual(self.temp_files(), [])
+        return response.json()['error']
+
+    @override_settings(DOCUMENT_ZIP_MAX_FILES=2)
+    def test_too_many_files(self):
+        archive = zip_file('many.zip', {f'd{i}.xml': document_xml(f'D{i}') for i in range(3)})
+        self.assertIn('больше 2 XML файлов', self.assertRejected(archive))
+
+    @override_settings(DOCUMENT_ZIP_MAX_FILE_SIZE=1000)
+    def test_file_too_large(self):
+        archive = zip_file('large.zip', {'d1.xml': document_xml('D1', content='x' * 2000)})
+        self.assertIn('d1.xml', self.assertRejected(archive))
+
+    @override_settings(DOCUMENT_ZIP_MAX_TOTAL_SIZE=3000)
+    def test_total_too_large(self):
+        archive = zip_file('total.zip', {f'd{i}.xml': document_xml(f'D{i}', content='x' * 1000) for i in range(3)})
+        self.assertIn('после распаковки', self.assertRejected(archive))
+
+    def test_compression_ratio(self):
+        archive = zip_file('bomb.zip', {'bomb.xml': document_xml('D1', content=' ' * 10 * 1024 * 1024)})
+        self.assertIn('сжат', self.assertRejected(archive))
+
+    def test_size_checked_while_unpacking(self):
+        # Заголовок занижает размер: дальше заявленного распаковка не идет
+        archive = zip_file('lie.zip', {'d1.xml': document_xml('D1', content='x' * 100000)})
+        with mock.patch('documents.batch._archive_xml_members') as members:
+            members.side_effect = lambda zf: [_with_size(info, 1000) for info in zf.infolist()]
+            self.assertRejected(archive)
+
+
+class DownloadTest(BlobStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.content = document_xml('D1', content='текст ' * 100)
+        self.upload_batch(xml_file('d1.xml', self.content))
+        self.document = Document.objects.get(code='D1')
+        self.url = f'/api/documents/{self.document.id}/download/'
+
+    def download(self, **headers):
+        response = self.client.get(self.url, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_full_file(self):
+        response, body = self.download()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.content)
+        self.assertEqual(response['ETag'], f'"{self.document.file_hash}"')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('d1.xml', response['Content-Disposition'])
+
+    def test_ranges(self):
+        size = len(self.content)
+        cases = [
+            ('bytes=0-9', 0, 9),
+            ('bytes=10-', 10, size - 1),
+            ('bytes=-20', size - 20, size - 1),
+            (f'bytes=5-{size + 100}', 5, size - 1),
+        ]
+        for header, start, end in cases:
+            with self.subTest(header):
+                response, body = self.download(Range=header)
+                self.assertEqual(response.status_code, 206)
+                self.assertEqual(body, self.content[start:end + 1])
+                self.assertEqual(response['Content-Range'], f'bytes {start}-{end}/{size}')
+                self.assertEqual(response['Content-Length'], str(end - start + 1))
+
+    def test_unsatisfiable_range(self):
+        size = len(self.content)
+        for header in (f'bytes={size}-', 'bytes=9-5'):
+            with self.subTest(header):
+                response, _ = self.download(Range=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], f'bytes */{size}')
+        # Непонятный Range игнорируется: отдается весь файл
+        response, body = self.download(Range='items=0-1')
+        self.assertEqual((response.status_code, body), (200, self.content))
+
+    def test_not_modified(self):
+        response, body = self.download(If_None_Match=f'"{self.document.file_hash}"')
+        self.assertEqual((response.status_code, body), (304, b''))
+
+    @override_settings(BLOB_X_ACCEL_REDIRECT='/protected/')
+    def test_accel_redirect(self):
+        response, body = self.download()
+        self.assertEqual(body, b'')
+        self.assertTrue(response['X-Accel-Redirect'].startswith('/protected/'))
+        self.assertTrue(response['X-Accel-Redirect'].endswith(self.document.file_hash))
+
+    def test_missing(self):
+        self.assertEqual(self.client.get('/api/documents/999999/download/').status_code, 404)
+        os.remove(os.path.join(self.blob_root, self.document.file_path))
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class DocumentSearchTestCase(BlobStorageTestCase):
+    def setUp(self):
+        super().setUp()
+        self.upload_batch(
+            xml_file('d1.xml', document_xml('DOG-1', title='Договор поставки оборудования', author='Иванов')),
+            xml_file('d2.xml', document_xml('DOG-2', folder_code='A', title='Договор аренды', author='Петров', ref='LS-77')),
+            xml_file('d3.xml', document_xml('REP-1', folder_code='B', title='Годовой отчет', author='Иванов')),
+        )
+
+    def search(self, **params):
+        response = self.client.get('/api/documents/search/', params)
+        if response.status_code != 200:
+            return response.status_code, response.json()
+        data = json.loads(b''.join(response.streaming_content))
+        return response.status_code, data
+
+    def codes(self, **params):
+        status, data = self.search(**params)
+        self.assertEqual(status, 200, data)
+        self.assertEqual(data['count'], len(data['documents']))
+        return [document['code'] for document in data['documents']]
+
+
+class FullTextSearchTest(DocumentSearchTestCase):
+    def test_substring_search(self):
+        # LIKE в SQLite не учитывает регистр только для ASCII
+        self.assertEqual(sorted(self.codes(q='оговор')), ['DOG-1', 'DOG-2'])
+        self.assertEqual(sorted(self.codes(q='dog')), ['DOG-1', 'DOG-2'])
+        self.assertEqual(self.codes(q='LS-77'), ['DOG-2'])
+        self.assertEqual(len(self.codes()), 3)
+
+    def test_full_text_search(self):
+        self.assertEqual(sorted(self.codes(q='договор', mode='fts')), ['DOG-1', 'DOG-2'])
+        self.assertEqual(self.codes(q='отчет Иванов', mode='fts'), ['REP-1'])
+        self.assertEqual(self.codes(q='REP', mode='fts'), ['REP-1'])
+        self.assertEqual(self.codes(q='Петров', mode='fts'), ['DOG-2'])
+        self.assertEqual(self.codes(q='!!!', mode='fts'), [])
+        status, data = self.search(q='договор', mode='fts')
+        ranks = [document['rank'] for document in data['documents']]
+        self.assertEqual(ranks, sorted(ranks, reverse=True))
+
+    def test_index_follows_writes(self):
+        document = Document.objects.get(code='REP-1')
+        document.name = 'Квартальная справка'
+        document.save()
+        self.assertEqual(self.codes(q='отчет', mode='fts'), [])
+        self.assertEqual(self.codes(q='справка', mode='fts'), ['REP-1'])
+        document.delete()
+        self.assertEqual(self.codes(q='справка', mode='fts'), [])
+
+    def test_filters_combine(self):
+        self.assertEqual(self.codes(q='Иванов', mode='fts', folder_id=self.folders['B'].id), ['REP-1'])
+        self.assertEqual(self.codes(q='договор', mode='fts', structure_id=self.structure.id + 1), [])
+        self.assertEqual(self.search(folder_id='x')[0], 400)
+
+
+class MetadataFilterTest(DocumentSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        for code, date in (('DOG-1', '2024-03-01'), ('DOG-2', '2023-12-31'), ('REP-1', '2024-01-01')):
+            document = Document.objects.get(code=code)
+            document.metadata['date'] = date
+            document.save()
+
+    def test_exact_and_in(self):
+        self.assertEqual(sorted(self.codes(**{'meta.author': 'Иванов'})), ['DOG-1', 'REP-1'])
+        self.assertEqual(self.codes(**{'meta.author': 'Иванов', 'meta.folder_code': 'B'}), ['REP-1'])
+        self.assertEqual(sorted(self.codes(**{'meta.folder_code__in': 'A,B'})), ['DOG-2', 'REP-1'])
+        self.assertEqual(self.codes(**{'meta.author': 'Сидоров'}), [])
+        self.assertEqual(self.codes(**{'meta.missing': 'x'}), [])
+
+    def test_ranges(self):
+        self.assertEqual(sorted(self.codes(**{'meta.date__gte': '2024-01-01'})), ['DOG-1', 'REP-1'])
+        self.assertEqual(self.codes(**{'meta.date__gt': '2024-01-01', 'meta.date__lt': '2025-01-01'}), ['DOG-1'])
+        self.assertEqual(self.codes(**{'meta.date__lte': '2023-12-31'}), ['DOG-2'])
+
+    def test_combined_with_search(self):
+        self.assertEqual(self.codes(q='DOG', **{'meta.date__gte': '2024-01-01'}), ['DOG-1'])
+        self.assertEqual(self.codes(q='договор', mode='fts', **{'meta.author': 'Петров'}), ['DOG-2'])
+
+    def test_invalid_key(self):
+        status, data = self.search(**{'meta.a b': 'x'})
+        self.assertEqual(status, 400)
+        self.assertIn('a b', data['error'])
+
+
+class SubtreeSearchTest(DocumentSearchTestCase):
+    def setUp(self):
+        super().setUp()
+        # Та же структура путей в другой структуре и папка с общим префиксом кода
+        other = Structure.objects.create(name='Другая')
+        import_folder_tree(other, ET.fromstring(STRUCTURE_XML))
+        other_a1 = Folder.objects.get(structure=other, code='A1')
+        sibling = Folder.objects.create(structure=self.structure, code='AB', name='Соседняя')
+        for code, folder in (('OTHER', other_a1), ('SIBLING', sibling)):
+            document = Document.objects.create(code=code, name=code, file_path='x')
+            FolderDocument.objects.create(folder=folder, document=document)
+
+    def test_subtree(self):
+        folder_a = self.folders['A'].id
+        self.assertEqual(self.codes(folder_id=folder_a), ['DOG-2'])
+        self.assertEqual(sorted(self.codes(folder_id=folder_a, include_descendants='true')), ['DOG-1', 'DOG-2'])
+        self.assertEqual(self.codes(folder_id=self.folders['A1'].id, include_descendants='true'), ['DOG-1'])
+        self.assertEqual(self.codes(folder_id=folder_a, include_descendants='true', q='аренды'), ['DOG-2'])
+        self.assertEqual(self.codes(folder_id=folder_a, include_descendants='true', q='DOG-1'), ['DOG-1'])
+
+    def test_structure(self):
+        self.assertEqual(
+            sorted(self.codes(structure_id=self.structure.id)), ['DOG-1', 'DOG-2', 'REP-1', 'SIBLING']
+        )
+        self.assertEqual(self.codes(folder_id=self.folders['A'].id, structure_id=self.structure.id + 1), [])
+
+    def test_missing_folder(self):
+        self.assertEqual(self.codes(folder_id=999999, include_descendants='true'), [])
+
+    def test_query_count(self):
+        # Папка поддерева читается одним запросом, документы - вторым
+        with self.assertNumQueries(2):
+            self.search(folder_id=self.folders['A'].id, include_descendants='true')
+
+
+class DocumentParsingTest(TestCase):
+    def test_fields(self):
+        content = document_xml('DOC-1', title='Договор поставки', author='Иванов')
+        fields = parse_document_content(content)
+        self.assertEqual((fields['code'], fields['name'], fields['folder_code']), ('DOC-1', 'Договор поставки', 'A1'))
+        self.assertEqual(fields['metadata'], {'folder_code': 'A1', 'author': 'Иванов'})
+        self.assertEqual(fields['file_hash'], hashlib.sha256(content).hexdigest())
+        self.assertEqual(fields['file_size'], len(content))
+
+    def test_chunks_match_whole_file(self):
+        # Куски по 7 байт режут многобайтные символы UTF-8
+        content = document_xml('DOC-1', content='<p>текст</p>' * 1000)
+        chunks = [content[i:i + 7] for i in range(0, len(content), 7)]
+        self.assertEqual(parse_document_stream(chunks), parse_document_content(content))
+
+    def test_content_not_kept(self):
+        content = document_xml('DOC-1', content='<p>текст</p>' * 1000)
+        self.assertNotIn('content', parse_document_content(content))
+
+    def test_malformed_tail(self):
+        # Заголовок уже разобран, но ошибка в конце файла все равно находится
+        with self.assertRaises(DocumentParseError):
+            parse_document_content(document_xml('DOC-1', content='<p>не закрыт'))
+
+    def test_missing_fields(self):
+        cases = [
+            (b'<document><metadata><folder_code>A1</folder_code></metadata></document>', '<header>'),
+            (document_xml('DOC-1', title=' '), 'title'),
+            (document_xml('DOC-1', folder_code=' '), 'folder_code'),
+        ]
+        for content, message in cases:
+            with self.subTest(message=message):
+                with self.assertRaisesMessage(DocumentParseError, message):
+                    parse_document_content(content)
+
+
+class CursorPaginationTest(TestCase):
+    def setUp(self):
+        # Одинаковые created_at у соседних записей: порядок держится на id
+        base = timezone.now().replace(microsecond=123456)
+        for i in range(10):
+            Document.objects.create(
+                code=f'D{i:02d}', name=f'Документ {i}', file_path='x',
+                created_at=base - datetime.timedelta(microseconds=i // 3)
+            )
+
+    def pages(self, order, limit=3):
+        factory = RequestFactory()
+        params = {'order': order, 'limit': limit}
+        seen = []
+        while True:
+            rows, page_info = paginate(Document.objects.all(), factory.get('/', params), DOCUMENT_ORDERINGS)
+            seen.extend(row.code for row in rows)
+            if not page_info['has_more']:
+                return seen
+            params['cursor'] = page_info['next_cursor']
+
+    def test_round_trip(self):
+        values = [timezone.now().replace(microsecond=654321), 42]
+        cursor = encode_cursor('created', values)
+        self.assertEqual(decode_cursor(cursor, 'created', Document, DOCUMENT_ORDERINGS['created']), values)
+
+    def test_all_pages(self):
+        expected = list(Document.objects.order_by(*DOCUMENT_ORDERINGS['created']).values_list('code', flat=True))
+        self.assertEqual(self.pages('created'), expected)
+        self.assertEqual(self.pages('code', limit=4), sorted(expected))
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(PaginationError):
+            decode_cursor('не курсор', 'created', Document, DOCUMENT_ORDERINGS['created'])
+        cursor = encode_cursor('code', ['D01', 1])
+        with self.assertRaises(PaginationError):
+            decode_cursor(cursor, 'created', Document, DOCUMENT_ORDERINGS['created'])
+
+    def test_folder_documents_view(self):
+        structure = Structure.objects.create(name='Документы')
+        import_folder_tree(structure, ET.fromstring(STRUCTURE_XML))
+        folder = Folder.objects.get(structure=structure, code='B')
+        FolderDocument.objects.bulk_create(FolderDocument(folder=folder, document=d) for d in Document.objects.all())
+
+        url = f'/api/documents/folder/{folder.id}/'
+        params = {'limit': 4}
+        seen = []
+        while True:
+            data = json.loads(b''.join(self.client.get(url, params).streaming_content))
+            seen.extend(item['code'] for item in data['documents'])
+            if not data['has_more']:
+                break
+            params['cursor'] = data['next_cursor']
+        self.assertEqual(sorted(seen), sorted(Document.objects.values_list('code', flat=True)))
+        self.assertEqual(len(seen), 10)
+
+        for params in ({'cursor': 'мусор'}, {'limit': 'x'}, {'order': 'nope'}):
+            self.assertEqual(self.client.get(url, params).status_code, 400, params)
+
+
+def _with_size(info, size):
+    info.file_size = size
+    return info
@@ -1,14 +1,20 @@
 # documents/urls.py
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Эндпоинты чтения: async представления под ASGI (settings.ASYNC_READ_VIEWS)
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
     path('upload-single/', views.upload_single_document, name='upload_single_document'),
+    path('upload-batch/', views.upload_document_batch, name='upload_document_batch'),
     path('handle-duplicate/', views.handle_duplicate_decision, name='handle_duplicate'),
     path('test/', views.api_test, name='documents_api_test'),
 
     # Дополнительные эндпоинты
-    path('<int:document_id>/', views.get_document_details, name='document_details'),
-    path('folder/<int:folder_id>/', views.get_documents_by_folder, name='documents_by_folder'),
-    path('search/', views.search_documents, name='search_documents'),
+    path('<int:document_id>/', read_views.get_document_details, name='document_details'),
+    path('<int:document_id>/download/', views.download_document, name='download_document'),
+    path('folder/<int:folder_id>/', read_views.get_documents_by_folder, name='documents_by_folder'),
+    path('search/', read_views.search_documents, name='search_documents'),
 ]
\ No newline at end of file
@@ -1,20 +1,42 @@
 # documents/views.py
 import os
 import hashlib
+import logging
 import uuid
 import re
 import json
-from django.db import transaction
-from django.db.models import Q
+import zipfile
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Q
 from django.http import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.conf import settings
 import xml.etree.ElementTree as ET
 
 from .models import Document, FolderDocument
+from .batch import ArchiveLimitError, import_document_batch, iter_uploaded_xml_files
+from .parsing import DocumentParseError, parse_document_stream
+from .metadata import MetadataFilterError, apply_metadata_filters, parse_metadata_filters
+from .search import full_text_search
+from document_manager.pagination import PaginationError, paginate
+from document_manager.responses import StreamingJsonResponse
+from document_manager.storage import BlobWriter, blob_exists, blob_response, save_upload
+from document_manager.tracing import start_trace
 from structures.models import Folder
+from import_logs.jobs import enqueue_job, job_status_url
 from import_logs.models import ImportLog
 
+logger = logging.getLogger(__name__)
+
+# Сортировки для курсорной пагинации (последнее поле уникально)
+DOCUMENT_ORDERINGS = {
+    'created': ('-created_at', '-id'),
+    'code': ('code', 'id'),
+}
+FOLDER_DOCUMENT_ORDERINGS = {
+    'attached': ('-created_at', '-id'),
+}
+
 
 @csrf_exempt
 def upload_single_document(request):
@@ -22,9 +44,6 @@ def upload_single_document(request):
     if request.method != 'POST':
         return JsonResponse({'error': 'Метод не разрешен'}, status=405)
 
-    print("=" * 60)
-    print("DEBUG: Начало загрузки документа")
-
     if not request.FILES.get('file'):
         return JsonResponse({'error': 'Файл не найден. Используйте ключ "file"'}, status=400)
 
@@ -39,104 +58,32 @@ def upload_single_document(request):
         return JsonResponse({'error': 'structure_id должен быть числом'}, status=400)
 
     uploaded_file = request.FILES['file']
-    print(f"Файл: {uploaded_file.name}, Structure ID: {structure_id}")
+    trace = start_trace('DOCUMENT_IMPORT', uploaded_file.name)
 
+    # Файл пишется во временный файл хранилища тем же проходом, что и хэш
+    blob = BlobWriter()
     try:
-        # Читаем файл
-        file_content = uploaded_file.read()
-
-        # Вычисляем хэш
-        file_hash = hashlib.sha256(file_content).hexdigest()
-        print(f"✓ Хэш файла (SHA256): {file_hash[:16]}...")
-
-        # Декодируем
+        # Читаем файл потоком: хэш и разбор <header>/<metadata> за один проход
         try:
-            xml_content = file_content.decode('utf-8')
-        except UnicodeDecodeError:
-            xml_content = file_content.decode('cp1251')
-
-        # Парсим XML
-        root = ET.fromstring(xml_content)
-
-        # Ищем header
-        header = root.find('header')
-        if not header:
-            return JsonResponse({'error': 'Нет элемента <header>'}, status=400)
-
-        # doc_code
-        doc_code_elem = header.find('doc_number')
-        if doc_code_elem is None:
-            print("✗ Элемент <doc_number> не найден в header")
-            return JsonResponse({'error': 'Нет <doc_number> в <header>'}, status=400)
-
-        doc_text = doc_code_elem.text
-        if doc_text is None:
-            print("✗ У элемента <doc_number> нет текстового содержимого")
-            return JsonResponse({'error': 'Элемент <doc_number> не содержит текста'}, status=400)
-
-        doc_code = doc_text.strip()
-        if not doc_code:
-            print(f"✗ Элемент <doc_number> содержит только пробелы")
-            return JsonResponse({'error': 'Элемент <doc_number> содержит только пробелы или пуст'}, status=400)
-
-        print(f"✓ Код документа: '{doc_code}'")
-
-        # title
-        title_elem = header.find('title')
-        if title_elem is None:
-            print("✗ Элемент <title> не найден")
-            return JsonResponse({'error': 'Нет <title> в <header>'}, status=400)
-
-        title_text = title_elem.text
-        if title_text is None:
-            print("✗ У элемента <title> нет текстового содержимого")
-            return JsonResponse({'error': 'Элемент <title> не содержит текста'}, status=400)
-
-        doc_name = title_text.strip()
-        if not doc_name:
-            print(f"✗ Элемент <title> содержит только пробелы")
-            return JsonResponse({'error': 'Элемент <title> содержит только пробелы или пуст'}, status=400)
-
-        print(f"✓ Название документа: '{doc_name}'")
-
-        # metadata
-        metadata = root.find('metadata')
-        if not metadata:
-            print("✗ Элемент <metadata> не найден")
-            return JsonResponse({'error': 'Нет элемента <metadata>'}, status=400)
-
-        # folder_code
-        folder_code_elem = metadata.find('folder_code')
-        if folder_code_elem is None:
-            print("✗ Элемент <folder_code> не найден в metadata")
-            return JsonResponse({'error': 'Нет <folder_code> в <metadata>'}, status=400)
-
-        folder_code_text = folder_code_elem.text
-        if folder_code_text is None:
-            print("✗ У элемента <folder_code> нет текстового содержимого")
-            return JsonResponse({'error': 'Элемент <folder_code> не содержит текста'}, status=400)
-
-        folder_code = folder_code_text.strip()
-        if not folder_code:
-            print(f"✗ Элемент <folder_code> содержит только пробелы")
-            return JsonResponse({'error': 'Элемент <folder_code> содержит только пробелы или пуст'}, status=400)
-
-        print(f"✓ Код папки: '{folder_code}'")
-
-        # Собираем метаданные
-        all_metadata = {}
-        print("\nВСЕ МЕТАДАННЫЕ из <metadata>:")
-        for elem in metadata:
-            if elem.text:
-                all_metadata[elem.tag] = elem.text.strip()
-                print(f"  - {elem.tag}: '{elem.text.strip()}'")
+            with trace.span('parse'):
+                fields = parse_document_stream(blob.tee(uploaded_file.chunks()))
+        except DocumentParseError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        file_hash = fields['file_hash']
+        file_size = fields['file_size']
+        doc_code = fields['code']
+        doc_name = fields['name']
+        folder_code = fields['folder_code']
+        all_metadata = fields['metadata']
 
         # ПРОВЕРКА ДУБЛИКАТОВ
-        duplicate_docs = Document.objects.filter(
-            Q(code=doc_code) | Q(file_hash=file_hash)
-        )
+        with trace.span('duplicate_check'):
+            duplicate_docs = list(Document.objects.filter(
+                Q(code=doc_code) | Q(file_hash=file_hash)
+            ))
 
-        if duplicate_docs.exists():
+        if duplicate_docs:
             duplicates_info = []
             for doc in duplicate_docs:
                 duplicates_info.append({
@@ -149,12 +96,8 @@ def upload_single_document(request):
                     'is_same_code': doc.code == doc_code,
                 })
 
-            print(f"⚠ Найдены дубликаты: {len(duplicate_docs)}")
-
             # Если запрос содержит флаг "force", перезаписываем
-            if request.POST.get('force') == 'true':
-                print("✓ Используем принудительную перезапись (force=true)")
-            else:
+            if request.POST.get('force') != 'true':
                 # Возвращаем информацию о дубликатах для принятия решения клиентом
                 return JsonResponse({
                     'duplicate_found': True,
@@ -170,12 +113,10 @@ def upload_single_document(request):
                 }, status=409)  # 409 Conflict
 
         # Ищем конкретную папку в указанной структуре
-        print(f"\nПОИСК ПАПКИ: structure_id={structure_id}, code='{folder_code}'")
         try:
-            folder = Folder.objects.get(structure_id=structure_id, code=folder_code)
-            print(f"✓ Папка найдена: ID={folder.id}, '{folder.name}'")
+            with trace.span('folder_resolution'):
+                folder = Folder.objects.select_related('structure').get(structure_id=structure_id, code=folder_code)
         except Folder.DoesNotExist:
-            print(f"✗ Папка не найдена в структуре {structure_id}")
             return JsonResponse({
                 'error': f'Папка с кодом "{folder_code}" не найдена в указанной структуре',
                 'suggestion': 'Проверьте structure_id и folder_code'
@@ -184,7 +125,8 @@ def upload_single_document(request):
         # СОХРАНЕНИЕ
         with transaction.atomic():
             # Проверяем, не был ли документ уже загружен (на случай параллельных запросов)
-            existing_doc = Document.objects.filter(code=doc_code).first()
+            with trace.span('duplicate_check'):
+                existing_doc = Document.objects.filter(code=doc_code).first()
 
             if existing_doc and request.POST.get('force') != 'true':
                 # Если force не указан и документ уже появился
@@ -198,40 +140,47 @@ def upload_single_document(request):
                     }
                 }, status=409)
 
-            # Создаем или обновляем документ
-            if existing_doc and request.POST.get('force') == 'true':
-                print(f"✓ Перезаписываем существующий документ ID={existing_doc.id}")
-                document = existing_doc
-                document.name = doc_name
-                document.metadata = all_metadata
-                document.file_hash = file_hash
-                document.file_size = len(file_content)
-                document.save()
-                created = False
-            else:
-                print(f"✓ Создаем новый документ")
-                document = Document.objects.create(
-                    code=doc_code,
-                    name=doc_name,
-                    metadata=all_metadata,
-                    xml_filename=uploaded_file.name,
-                    file_path=f"/uploads/{uploaded_file.name}",
-                    file_size=len(file_content),
-                    file_hash=file_hash
+            # Сохраняем файл в хранилище по хэшу (одинаковое содержимое хранится один раз)
+            with trace.span('file_persist'):
+                file_path = blob.commit(file_hash)
+
+            with trace.span('db_write'):
+                # Создаем или обновляем документ
+                if existing_doc and request.POST.get('force') == 'true':
+                    document = existing_doc
+                    document.name = doc_name
+                    document.metadata = all_metadata
+                    document.file_hash = file_hash
+                    document.file_size = file_size
+                    document.file_path = file_path
+                    document.save()
+                    created = False
+                else:
+                    document = Document.objects.create(
+                        code=doc_code,
+                        name=doc_name,
+                        metadata=all_metadata,
+                        xml_filename=uploaded_file.name,
+                        file_path=file_path,
+                        file_size=file_size,
+                        file_hash=file_hash
+                    )
+                    created = True
+
+                # Создаем связь с папкой
+                fd, fd_created = FolderDocument.objects.get_or_create(
+                    folder=folder,
+                    document=document
                 )
-                created = True
 
-            # Создаем связь с папкой
-            fd, fd_created = FolderDocument.objects.get_or_create(
-                folder=folder,
-                document=document
+            ImportLog.objects.create(
+                operation_type='DOCUMENT_IMPORT',
+                filename=uploaded_file.name,
+                message=f'Документ "{document.code}" {"создан" if created else "перезаписан"} в папке "{folder.code}"',
+                items_processed=1,
+                stage_timings=trace.finish()
             )
 
-            if fd_created:
-                print(f"✓ Связь создана с папкой '{folder.name}'")
-            else:
-                print(f"✓ Связь уже существует с папкой '{folder.name}'")
-
             # Ответ
             response_data = {
                 'success': True,
@@ -253,17 +202,83 @@ def upload_single_document(request):
                 'association_created': fd_created
             }
 
-            print(f"\n✓ УСПЕХ: {response_data}")
             return JsonResponse(response_data)
 
-    except ET.ParseError as e:
-        print(f"✗ Ошибка XML: {e}")
-        return JsonResponse({'error': f'Ошибка в XML: {str(e)}'}, status=400)
     except Exception as e:
-        import traceback
-        print(f"✗ Ошибка: {e}")
-        traceback.print_exc()
+        logger.exception('Ошибка загрузки документа из %s', uploaded_file.name)
         return JsonResponse({'error': f'Ошибка обработки: {str(e)}'}, status=500)
+    finally:
+        blob.discard()
+
+
+@csrf_exempt
+def upload_document_batch(request):
+    """Пакетная загрузка документов: много XML файлов и/или ZIP архивов (ключ "files")"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Метод не разрешен'}, status=405)
+
+    uploaded_files = request.FILES.getlist('files') or request.FILES.getlist('file')
+    if not uploaded_files:
+        return JsonResponse({'error': 'Файлы не найдены. Используйте ключ "files"'}, status=400)
+
+    structure_id = request.POST.get('structure_id')
+    if not structure_id:
+        return JsonResponse({'error': 'Не указан structure_id'}, status=400)
+
+    try:
+        structure_id = int(structure_id)
+    except ValueError:
+        return JsonResponse({'error': 'structure_id должен быть числом'}, status=400)
+
+    # Фоновый режим: файлы сохраняются, ответ 202 с job_id, загрузку выполняет run_import_worker
+    if (request.POST.get('mode') or request.GET.get('mode')) == 'async':
+        files = []
+        for uploaded_file in uploaded_files:
+            upload, _ = save_upload(uploaded_file)
+            files.append({'name': uploaded_file.name, 'upload': upload})
+        job = enqueue_job(
+            'DOCUMENT_IMPORT',
+            ', '.join(f.name for f in uploaded_files),
+            {'structure_id': structure_id, 'files': files}
+        )
+        return JsonResponse({
+            'success': True,
+            'structure_id': structure_id,
+            'job_id': job.id,
+            'status': job.status,
+            'status_url': job_status_url(job)
+        }, status=202)
+
+    trace = start_trace('DOCUMENT_IMPORT', ', '.join(f.name for f in uploaded_files))
+    try:
+        results = import_document_batch(structure_id, iter_uploaded_xml_files(uploaded_files), trace=trace)
+    except zipfile.BadZipFile as e:
+        return JsonResponse({'error': f'Поврежденный ZIP архив: {str(e)}'}, status=400)
+    except ArchiveLimitError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    except IntegrityError:
+        return JsonResponse({
+            'error': 'Документы с такими кодами были загружены параллельно, повторите загрузку'
+        }, status=409)
+
+    summary = {'created': 0, 'duplicate': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+
+    ImportLog.objects.create(
+        operation_type='DOCUMENT_IMPORT',
+        filename=', '.join(f.name for f in uploaded_files)[:500],
+        message=f'Пакетная загрузка документов: {summary}',
+        items_processed=summary['created'],
+        stage_timings=trace.finish()
+    )
+
+    return JsonResponse({
+        'success': True,
+        'structure_id': structure_id,
+        'summary': summary,
+        'results': results
+    })
 
 
 @csrf_exempt
@@ -327,6 +342,7 @@ def api_test(request):
         'message': 'Documents API работает!',
         'endpoints': {
             'upload': 'POST /api/documents/upload-single/',
+            'upload_batch': 'POST /api/documents/upload-batch/',
             'test': 'GET /api/documents/test/',
             'handle_duplicate': 'POST /api/documents/handle-duplicate/'
         }
@@ -335,120 +351,232 @@ def api_test(request):
 
 # documents/views.py (дополнительные функции)
 
+def document_details(document, links):
+    """Ответ карточки документа; links - привязки с select_related('folder__structure')"""
+    return {
+        'id': document.id,
+        'code': document.code,
+        'name': document.name,
+        'metadata': document.metadata,
+        'xml_filename': document.xml_filename,
+        'file_size': document.file_size,
+        'file_hash': document.file_hash,
+        'created_at': document.created_at.isoformat(),
+        'updated_at': document.updated_at.isoformat(),
+        'folders': [
+            {
+                'id': fd.folder.id,
+                'code': fd.folder.code,
+                'name': fd.folder.name,
+                'structure_id': fd.folder.structure_id,
+                'structure_name': fd.folder.structure.name
+            }
+            for fd in links
+        ]
+    }
+
+
 def get_document_details(request, document_id):
     """Получить детальную информацию о документе"""
     try:
         document = Document.objects.get(id=document_id)
-        folders = FolderDocument.objects.filter(document=document).select_related('folder')
-
-        response_data = {
-            'id': document.id,
-            'code': document.code,
-            'name': document.name,
-            'metadata': document.metadata,
-            'xml_filename': document.xml_filename,
-            'file_size': document.file_size,
-            'file_hash': document.file_hash,
-            'created_at': document.created_at.isoformat(),
-            'updated_at': document.updated_at.isoformat(),
-            'folders': [
-                {
-                    'id': fd.folder.id,
-                    'code': fd.folder.code,
-                    'name': fd.folder.name,
-                    'structure_id': fd.folder.structure_id,
-                    'structure_name': fd.folder.structure.name
-                }
-                for fd in folders
-            ]
-        }
+        folders = FolderDocument.objects.filter(document=document).select_related('folder__structure')
 
-        return JsonResponse(response_data)
+        return JsonResponse(document_details(document, folders))
 
     except Document.DoesNotExist:
         return JsonResponse({'error': 'Документ не найден'}, status=404)
 
 
+def download_document(request, document_id):
+    """Скачать исходный XML документа (поддерживаются Range запросы)"""
+    try:
+        document = Document.objects.get(id=document_id)
+    except Document.DoesNotExist:
+        return JsonResponse({'error': 'Документ не найден'}, status=404)
+
+    if not blob_exists(document.file_hash):
+        return JsonResponse({'error': 'Файл документа не найден в хранилище'}, status=404)
+
+    return blob_response(request, document.file_hash, document.xml_filename or f'{document.code}.xml')
+
+
+FOLDER_DOCUMENT_FIELDS = (
+    'id', 'created_at', 'document_id', 'document__code', 'document__name',
+    'document__file_size', 'document__file_hash', 'document__created_at'
+)
+
+
+def folder_document_item(row):
+    return {
+        'id': row['document_id'],
+        'code': row['document__code'],
+        'name': row['document__name'],
+        'file_size': row['document__file_size'],
+        'file_hash': row['document__file_hash'],
+        'created_at': row['document__created_at'],
+        'attached_at': row['created_at']
+    }
+
+
+def folder_header(folder):
+    return {
+        'folder': {
+            'id': folder.id,
+            'code': folder.code,
+            'name': folder.name,
+            'structure': folder.structure.name
+        }
+    }
+
+
 def get_documents_by_folder(request, folder_id):
     """Получить все документы в папке"""
     try:
-        folder = Folder.objects.get(id=folder_id)
-
-        # Получаем документы через связующую таблицу
-        folder_docs = FolderDocument.objects.filter(folder=folder).select_related('document')
-
-        documents = []
-        for fd in folder_docs:
-            doc = fd.document
-            documents.append({
-                'id': doc.id,
-                'code': doc.code,
-                'name': doc.name,
-                'file_size': doc.file_size,
-                'file_hash': doc.file_hash,
-                'created_at': doc.created_at.isoformat(),
-                'attached_at': fd.created_at.isoformat()
-            })
+        folder = Folder.objects.select_related('structure').get(id=folder_id)
 
-        response_data = {
-            'folder': {
-                'id': folder.id,
-                'code': folder.code,
-                'name': folder.name,
-                'structure': folder.structure.name
-            },
-            'documents_count': len(documents),
-            'documents': documents
-        }
+        # Получаем документы через связующую таблицу, постранично и потоком
+        folder_docs = FolderDocument.objects.filter(folder=folder).values(*FOLDER_DOCUMENT_FIELDS)
+        try:
+            rows, page_info = paginate(folder_docs, request, FOLDER_DOCUMENT_ORDERINGS, stream=True)
+        except PaginationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        counts = {'documents_count': 0}
 
-        return JsonResponse(response_data)
+        def documents():
+            for row in rows:
+                counts['documents_count'] += 1
+                yield folder_document_item(row)
+
+        return StreamingJsonResponse(
+            folder_header(folder), 'documents', documents(),
+            tail=lambda: {**counts, **page_info}
+        )
 
     except Folder.DoesNotExist:
         return JsonResponse({'error': 'Папка не найден'}, status=404)
 
 
-def search_documents(request):
-    """Поиск документов по различным критериям"""
-    query = request.GET.get('q', '')
-    folder_id = request.GET.get('folder_id')
-    structure_id = request.GET.get('structure_id')
-    hash_value = request.GET.get('hash')
+class DocumentSearchError(ValueError):
+    pass
+
+
+def parse_document_search(request):
+    """
+    Проверенные параметры поиска документов.
+
+    subtree_folder_id - папка, поддерево которой нужно прочитать до построения
+    запроса (include_descendants=true).
+    """
+    params = request.GET
+    search = {
+        'query': params.get('q', ''),
+        'folder_id': params.get('folder_id'),
+        'structure_id': params.get('structure_id'),
+        'hash': params.get('hash'),
+        # mode=fts - полнотекстовый поиск с ранжированием по релевантности
+        'full_text': params.get('mode') == 'fts',
+    }
+
+    # Фильтры по ключам метаданных: meta.<ключ>=..., meta.<ключ>__gte=...
+    try:
+        search['metadata_filters'] = parse_metadata_filters(params)
+    except MetadataFilterError as e:
+        raise DocumentSearchError(str(e))
+
+    for name in ('folder_id', 'structure_id'):
+        if search[name] and not search[name].isdigit():
+            raise DocumentSearchError(f'{name} должен быть числом')
+
+    descendants = params.get('include_descendants') == 'true'
+    search['subtree_folder_id'] = search['folder_id'] if descendants else None
+    return search
+
 
+def subtree_folder_query(folder_id):
+    return Folder.objects.filter(id=folder_id).values('structure_id', 'materialized_path')
+
+
+def document_search_queryset(search, subtree_folder=None):
+    """
+    (queryset values, сортировки) поиска документов.
+
+    subtree_folder - строка subtree_folder_query для include_descendants (None - папки нет).
+    """
+    query = search['query']
+    full_text = query and search['full_text']
     documents_qs = Document.objects.all()
 
-    if query:
+    if full_text:
+        documents_qs = full_text_search(documents_qs, query)
+    elif query:
         documents_qs = documents_qs.filter(
             Q(code__icontains=query) |
             Q(name__icontains=query) |
             Q(metadata__icontains=query)
         )
 
-    if hash_value:
-        documents_qs = documents_qs.filter(file_hash=hash_value)
+    if search['hash']:
+        documents_qs = documents_qs.filter(file_hash=search['hash'])
 
-    if folder_id:
-        folder_docs = FolderDocument.objects.filter(folder_id=folder_id)
-        document_ids = folder_docs.values_list('document_id', flat=True)
-        documents_qs = documents_qs.filter(id__in=document_ids)
+    documents_qs = apply_metadata_filters(documents_qs, search['metadata_filters'])
+
+    # Привязки к папкам проверяются одним полусоединением (EXISTS) с папками
+    folder_id = search['folder_id']
+    structure_id = search['structure_id']
+    folder_docs = FolderDocument.objects.filter(document_id=OuterRef('pk'))
+
+    if search['subtree_folder_id']:
+        # Все поддерево: префикс пути по индексу (structure, materialized_path varchar_pattern_ops)
+        if subtree_folder is None:
+            documents_qs = documents_qs.none()
+        else:
+            folder_docs = folder_docs.filter(
+                folder__structure_id=subtree_folder['structure_id'],
+                folder__materialized_path__startswith=subtree_folder['materialized_path']
+            )
+    elif folder_id:
+        folder_docs = folder_docs.filter(folder_id=folder_id)
 
     if structure_id:
-        folders = Folder.objects.filter(structure_id=structure_id)
-        folder_docs = FolderDocument.objects.filter(folder__in=folders)
-        document_ids = folder_docs.values_list('document_id', flat=True)
-        documents_qs = documents_qs.filter(id__in=document_ids)
-
-    documents = []
-    for doc in documents_qs[:100]:  # Ограничиваем результат
-        documents.append({
-            'id': doc.id,
-            'code': doc.code,
-            'name': doc.name,
-            'file_size': doc.file_size,
-            'file_hash': doc.file_hash,
-            'created_at': doc.created_at.isoformat(),
-        })
+        folder_docs = folder_docs.filter(folder__structure_id=structure_id)
 
-    return JsonResponse({
-        'count': len(documents),
-        'documents': documents
-    })
\ No newline at end of file
+    if folder_id or structure_id:
+        documents_qs = documents_qs.filter(Exists(folder_docs))
+
+    fields = ['id', 'code', 'name', 'file_size', 'file_hash', 'created_at']
+    if full_text:
+        fields.append('rank')
+        orderings = {'rank': ('-rank', 'id')}
+    else:
+        orderings = DOCUMENT_ORDERINGS
+
+    return documents_qs.values(*fields), orderings
+
+
+def search_documents(request):
+    """Поиск документов по различным критериям"""
+    try:
+        search = parse_document_search(request)
+    except DocumentSearchError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    subtree_folder = None
+    if search['subtree_folder_id']:
+        subtree_folder = subtree_folder_query(search['subtree_folder_id']).first()
+    documents_qs, orderings = document_search_queryset(search, subtree_folder)
+
+    try:
+        rows, page_info = paginate(documents_qs, request, orderings, stream=True)
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    counts = {'count': 0}
+
+    def documents():
+        for row in rows:
+            counts['count'] += 1
+            yield row
+
+    return StreamingJsonResponse({}, 'documents', documents(), tail=lambda: {**counts, **page_info})
@@ -0,0 +1,43 @@
+"""
+Продакшен запуск: gunicorn -c gunicorn.conf.py
+
+WEB_SERVER_MODE=wsgi (по умолчанию) - синхронные представления, воркеры gthread;
+WEB_SERVER_MODE=asgi - async представления чтения, воркеры uvicorn (uvicorn-worker).
+Приложение загружается в мастер-процессе до fork (preload_app), соединения
+с БД открываются уже в воркерах при первом запросе.
+"""
+import multiprocessing
+import os
+
+
+mode = os.getenv('WEB_SERVER_MODE', 'wsgi')
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Кэш ответов структур общий для воркеров только с Redis/Memcached (CACHE_BACKEND).
+# С LocMemCache по умолчанию - один воркер (потоки gthread); больше - явно через WEB_WORKERS,
+# кэш ответов при этом выключен (structures.caching.cache_enabled)
+shared_cache = 'locmem' not in os.getenv('CACHE_BACKEND', 'locmem').lower()
+workers = int(os.getenv('WEB_WORKERS', multiprocessing.cpu_count() * 2 + 1 if shared_cache else 1))
+preload_app = True
+
+if mode == 'asgi':
+    wsgi_app = 'document_manager.asgi:application'
+    worker_class = 'uvicorn_worker.UvicornWorker'
+    # Под ASGI постоянные соединения не переиспользуются между запросами - берём пул
+    os.environ.setdefault('DB_POOL', 'true')
+else:
+    wsgi_app = 'document_manager.wsgi:application'
+    worker_class = 'gthread'
+    threads = int(os.getenv('WEB_THREADS', 4))
+
+# Большие загрузки и потоковые ответы (дерево, экспорт) идут дольше обычных запросов
+timeout = int(os.getenv('WEB_TIMEOUT', 120))
+graceful_timeout = 30
+keepalive = 5
+# Перезапуск воркера после N запросов ограничивает рост памяти
+max_requests = int(os.getenv('WEB_MAX_REQUESTS', 2000))
+max_requests_jitter = max_requests // 10
+
+accesslog = '-'
+errorlog = '-'
+loglevel = os.getenv('WEB_LOG_LEVEL', 'info')
@@ -0,0 +1,360 @@
+"""
+Очередь фоновых импортов на таблице ImportLog.
+
+Запрос сохраняет загруженные файлы в хранилище (uploads/), ставит задачу
+со статусом QUEUED и сразу отвечает 202 с job_id; клиент опрашивает
+/api/imports/<job_id>/. Задачи выполняет manage.py run_import_worker
+в пуле процессов. Через ту же очередь идет фоновая проверка
+консистентности структуры (VALIDATE).
+
+Задача захватывается условным UPDATE ... WHERE status = 'QUEUED', поэтому
+одну задачу не возьмут два обработчика (без SELECT FOR UPDATE SKIP LOCKED,
+который есть не во всех БД). Число одновременно выполняемых задач на все
+обработчики ограничено IMPORT_JOB_MAX_RUNNING, чтобы импорты не заняли
+все соединения и запись в БД.
+"""
+import logging
+import time
+from datetime import timedelta
+import xml.etree.ElementTree as ET
+import zipfile
+
+from django.conf import settings
+from django.db import IntegrityError, connection, transaction
+from django.utils import timezone
+
+from document_manager.storage import commit_upload, delete_upload, upload_path
+from document_manager.tracing import start_trace
+from .models import ImportLog
+
+logger = logging.getLogger(__name__)
+
+# Не чаще одной записи прогресса в секунду
+PROGRESS_INTERVAL = 1.0
+# Сколько ошибок по файлам сохраняется в ImportLog.errors
+ERRORS_LIMIT = 100
+
+
+class JobError(Exception):
+    """Ожидаемая ошибка задачи: сообщение и список ошибок для клиента"""
+
+    def __init__(self, message, errors=None):
+        super().__init__(message)
+        self.errors = errors or [message]
+
+
+class JobProgress:
+    """Прогресс задачи; в БД пишется не чаще раза в PROGRESS_INTERVAL"""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.percent = 0
+        self.processed = 0
+        self.written_at = 0.0
+
+    def update(self, percent=None, processed=None, items_total=None, force=False):
+        if percent is not None:
+            # 100% ставится только при завершении задачи
+            self.percent = max(0, min(int(percent), 99))
+        if processed is not None:
+            self.processed = processed
+
+        now = time.monotonic()
+        if not force and items_total is None and now - self.written_at < PROGRESS_INTERVAL:
+            return
+        fields = {'progress': self.percent, 'items_processed': self.processed}
+        if items_total is not None:
+            fields['items_total'] = items_total
+        ImportLog.objects.filter(id=self.job_id).update(**fields)
+        self.written_at = now
+
+
+def job_status_url(job):
+    return f'/api/imports/{job.id}/'
+
+
+def enqueue_job(operation_type, filename, params, items_total=0, user=None):
+    return ImportLog.objects.create(
+        operation_type=operation_type,
+        filename=filename[:500],
+        status='QUEUED',
+        progress=0,
+        items_total=items_total,
+        params=params,
+        user=user
+    )
+
+
+def claim_next_job(worker):
+    """
+    Захват следующей задачи из очереди: id задачи или None.
+
+    Лимит IMPORT_JOB_MAX_RUNNING проверяется перед захватом, при одновременном
+    захвате несколькими обработчиками он может быть превышен на единицы.
+    Учитываются только записи с типами из JOB_HANDLERS.
+    """
+    jobs = ImportLog.objects.filter(operation_type__in=JOB_HANDLERS)
+    while True:
+        if jobs.filter(status='RUNNING').count() >= settings.IMPORT_JOB_MAX_RUNNING:
+            return None
+
+        job_id = jobs.filter(status='QUEUED').order_by('performed_at', 'id').values_list(
+            'id', flat=True
+        ).first()
+        if job_id is None:
+            return None
+
+        claimed = ImportLog.objects.filter(id=job_id, status='QUEUED').update(
+            status='RUNNING', started_at=timezone.now(), worker=worker[:100]
+        )
+        if claimed:
+            return job_id
+        # Задачу забрал другой обработчик - пробуем следующую
+
+
+def finish_job(job_id, status, message, items_processed=None, result=None, errors=None, stage_timings=None):
+    """
+    Завершение выполняющейся задачи. False - задача уже завершена
+    (например, fail_stale_jobs по таймауту), ее итог не перезаписывается.
+    """
+    fields = {
+        'status': status,
+        'message': message,
+        'finished_at': timezone.now(),
+        'errors': errors or [],
+    }
+    if status == 'SUCCEEDED':
+        fields['progress'] = 100
+    if items_processed is not None:
+        fields['items_processed'] = items_processed
+    if result is not None:
+        fields['result'] = result
+    if stage_timings:
+        fields['stage_timings'] = stage_timings
+    return ImportLog.objects.filter(id=job_id, status='RUNNING').update(**fields) > 0
+
+
+def _discard_partial_structure(job_id):
+    """Удалить неактивную структуру, которую не доимпортировала задача STRUCTURE_IMPORT"""
+    from structures.models import Structure
+
+    params = ImportLog.objects.filter(id=job_id, operation_type='STRUCTURE_IMPORT').values_list(
+        'params', flat=True
+    ).first()
+    structure_id = (params or {}).get('structure_id')
+    if structure_id:
+        Structure.objects.filter(id=structure_id, is_active=False).delete()
+
+
+def fail_job(job_id, message, errors=None):
+    """
+    Пометить задачу ошибкой извне (таймаут, падение процесса пула): ее
+    обработчик уже не уберет за собой, поэтому недоимпортированная
+    структура удаляется здесь. False - задача уже завершена.
+    """
+    if not finish_job(job_id, 'FAILED', message, errors=errors):
+        return False
+    _discard_partial_structure(job_id)
+    return True
+
+
+def fail_stale_jobs(timeout=None):
+    """Задачи, выполняющиеся дольше IMPORT_JOB_TIMEOUT (обработчик упал), помечаются ошибкой"""
+    timeout = settings.IMPORT_JOB_TIMEOUT if timeout is None else timeout
+    started_before = timezone.now() - timedelta(seconds=timeout)
+    stale = list(ImportLog.objects.filter(
+        operation_type__in=JOB_HANDLERS, status='RUNNING', started_at__lt=started_before
+    ).values_list('id', flat=True))
+    return [job_id for job_id in stale if fail_job(job_id, 'Превышено время выполнения задачи')]
+
+
+def _job_uploads(params):
+    uploads = [params['upload']] if params.get('upload') else []
+    uploads.extend(item['upload'] for item in params.get('files', []))
+    return uploads
+
+
+def _finish_run(job_id, status, message, **fields):
+    """finish_job для run_job: итоговый статус задачи в БД"""
+    if finish_job(job_id, status, message, **fields):
+        return status
+    # Задачу уже завершили извне (fail_stale_jobs) - результат обработчика не записывается
+    logger.warning('Задача %s завершена до окончания обработки, статус %s не записан', job_id, status)
+    return ImportLog.objects.filter(id=job_id).values_list('status', flat=True).first()
+
+
+def run_job(job_id):
+    """
+    Выполнение задачи (в процессе пула run_import_worker).
+
+    Загруженные файлы задачи удаляются из uploads/ в любом случае.
+    Время этапов (trace) сохраняется и для упавших задач.
+    Возвращает итоговый статус.
+    """
+    job = ImportLog.objects.get(id=job_id)
+    handler = JOB_HANDLERS.get(job.operation_type)
+    progress = JobProgress(job.id)
+    trace = start_trace(job.operation_type, job.filename)
+    try:
+        if handler is None:
+            raise JobError(f'Неизвестный тип задачи: {job.operation_type}')
+        items_processed, result, message = handler(job, progress, trace)
+    except JobError as e:
+        return _finish_run(job.id, 'FAILED', str(e), items_processed=progress.processed,
+                           errors=e.errors[:ERRORS_LIMIT], stage_timings=trace.finish())
+    except Exception as e:
+        return _finish_run(job.id, 'FAILED', f'Ошибка обработки: {str(e)}', items_processed=progress.processed,
+                           errors=[str(e)], stage_timings=trace.finish())
+    else:
+        errors = result.pop('errors', [])
+        return _finish_run(job.id, 'SUCCEEDED', message, items_processed=items_processed, result=result,
+                           errors=errors[:ERRORS_LIMIT], stage_timings=trace.finish())
+    finally:
+        for upload in _job_uploads(job.params):
+            delete_upload(upload)
+        connection.close()
+
+
+def _read_with_progress(f, size, progress, chunk_size=64 * 1024):
+    read = 0
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        read += len(chunk)
+        yield chunk
+        if size:
+            progress.update(percent=read * 100 // size)
+
+
+def import_structure_job(job, progress, trace):
+    """
+    Потоковый импорт структуры из сохраненного файла.
+
+    Папки пишутся пачками без общей транзакции, чтобы прогресс был виден
+    клиенту; до конца импорта структура неактивна (is_active=False),
+    при ошибке удаляется вместе с папками. id структуры сохраняется в
+    params задачи в той же транзакции, что и сама структура: если процесс
+    упадет, ее удалит fail_job.
+    """
+    from structures.caching import bump_structures_list_version
+    from structures.models import Structure
+    from structures.streaming import TRACE_STAGES, stream_import_structure
+
+    params = job.params
+    with trace.span('duplicate_check'):
+        existing = Structure.objects.filter(content_hash=params['file_hash']).first()
+    if existing:
+        return 0, {'duplicate': True, 'structure_id': existing.id}, \
+            f'Структура уже была загружена ранее: {existing.name}'
+
+    with trace.span('db_write'), transaction.atomic():
+        structure = Structure.objects.create(
+            name=job.filename.rsplit('.', 1)[0],
+            description=f'Импортировано из {job.filename}',
+            is_active=False
+        )
+        ImportLog.objects.filter(id=job.id).update(params={**params, 'structure_id': structure.id})
+    try:
+        with open(upload_path(params['upload']), 'rb') as f:
+            folders_processed, errors, file_hash, struct_name, timings = stream_import_structure(
+                _read_with_progress(f, params.get('file_size'), progress), structure
+            )
+        trace.merge(timings, TRACE_STAGES)
+        if errors:
+            raise JobError('Ошибки валидации папок', errors[:20])
+
+        structure.content_hash = file_hash
+        structure.is_active = True
+        if struct_name:
+            structure.name = struct_name
+        with trace.span('db_write'):
+            structure.save(update_fields=['content_hash', 'name', 'is_active', 'updated_at'])
+    except ET.ParseError as e:
+        structure.delete()
+        raise JobError(f'Неверный формат XML: {str(e)}')
+    except BaseException:
+        structure.delete()
+        raise
+
+    with trace.span('file_persist'):
+        commit_upload(params['upload'], file_hash)
+    bump_structures_list_version()
+    return folders_processed, {
+        'structure_id': structure.id,
+        'structure_name': structure.name,
+        'folders_processed': folders_processed,
+        'timings': timings
+    }, f'Структура "{structure.name}" импортирована. Папок: {folders_processed}'
+
+
+def _count_xml_files(path, name):
+    if not name.lower().endswith('.zip'):
+        return 1
+    with zipfile.ZipFile(path) as archive:
+        return sum(
+            1 for info in archive.infolist()
+            if not info.is_dir() and info.filename.lower().endswith('.xml')
+        )
+
+
+def import_documents_job(job, progress, trace):
+    """Пакетная загрузка документов из сохраненных XML файлов и ZIP архивов"""
+    from django.core.files import File
+    from documents.batch import ArchiveLimitError, import_document_batch, iter_uploaded_xml_files
+
+    uploads = job.params['files']
+    try:
+        items_total = sum(_count_xml_files(upload_path(item['upload']), item['name']) for item in uploads)
+    except zipfile.BadZipFile as e:
+        raise JobError(f'Поврежденный ZIP архив: {str(e)}')
+    progress.update(items_total=items_total)
+
+    def files():
+        processed = 0
+        for item in uploads:
+            with File(open(upload_path(item['upload']), 'rb'), name=item['name']) as f:
+                for pair in iter_uploaded_xml_files([f]):
+                    yield pair
+                    processed += 1
+                    progress.update(percent=processed * 100 // max(items_total, 1), processed=processed)
+
+    try:
+        results = import_document_batch(job.params['structure_id'], files(), trace=trace)
+    except ArchiveLimitError as e:
+        raise JobError(str(e))
+    except IntegrityError:
+        raise JobError('Документы с такими кодами были загружены параллельно, повторите загрузку')
+
+    summary = {'created': 0, 'duplicate': 0, 'error': 0}
+    for result in results:
+        summary[result['status']] += 1
+
+    return summary['created'], {
+        'structure_id': job.params['structure_id'],
+        'summary': summary,
+        'results': results,
+        'errors': [f"{result['filename']}: {result['error']}" for result in results if result['status'] == 'error'],
+    }, f'Пакетная загрузка документов: {summary}'
+
+
+def validate_structure_job(job, progress, trace):
+    """Фоновая проверка консистентности структуры (?background=true)"""
+    from structures.consistency import check_structure_consistency
+    from structures.models import Structure
+
+    try:
+        structure = Structure.objects.get(id=job.params['structure_id'])
+    except Structure.DoesNotExist:
+        raise JobError('Структура не найдена')
+    with trace.span('check'):
+        report = check_structure_consistency(structure)
+    return report['total_folders'], report, \
+        f'Проверка структуры "{structure.name}": проблем {report["issues_found"]}'
+
+
+JOB_HANDLERS = {
+    'STRUCTURE_IMPORT': import_structure_job,
+    'DOCUMENT_IMPORT': import_documents_job,
+    'VALIDATE': validate_structure_job,
+}
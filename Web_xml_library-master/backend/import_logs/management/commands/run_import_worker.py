@@ -0,0 +1,80 @@
+import multiprocessing
+import os
+import socket
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from import_logs.jobs import claim_next_job, fail_job, fail_stale_jobs, run_job
+
+
+class Command(BaseCommand):
+    help = 'Обработчик очереди фоновых импортов (ImportLog со статусом QUEUED) в пуле процессов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=settings.IMPORT_WORKER_PROCESSES,
+                            help='Число процессов (одновременных задач) этого обработчика')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Пауза между проверками очереди, секунд')
+        parser.add_argument('--once', action='store_true',
+                            help='Выполнить задачи, стоящие в очереди, и завершиться')
+
+    def handle(self, *args, **options):
+        processes = max(1, options['processes'])
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.stdout.write(f'Обработчик {worker}: процессов {processes}')
+
+        # spawn - дочерние процессы не наследуют соединение с БД родителя
+        pool = self.create_pool(processes)
+        running = {}
+        try:
+            while True:
+                fail_stale_jobs()
+                while len(running) < processes:
+                    job_id = claim_next_job(worker)
+                    if job_id is None:
+                        break
+                    running[pool.submit(run_job, job_id)] = job_id
+                    self.stdout.write(f'Задача {job_id} запущена')
+
+                if not running:
+                    if options['once']:
+                        break
+                    connection.close()
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, _ = wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    job_id = running.pop(future)
+                    try:
+                        self.stdout.write(f'Задача {job_id}: {future.result()}')
+                    except BrokenProcessPool:
+                        # Процесс пула аварийно завершился (например, нехватка памяти)
+                        fail_job(job_id, 'Процесс обработчика аварийно завершился')
+                        self.stderr.write(f'Задача {job_id}: процесс обработчика аварийно завершился')
+                    except Exception as e:
+                        fail_job(job_id, f'Ошибка обработки: {str(e)}', errors=[str(e)])
+                        self.stderr.write(f'Задача {job_id}: {str(e)}')
+
+                if getattr(pool, '_broken', False):
+                    pool.shutdown(wait=False)
+                    pool = self.create_pool(processes)
+        except KeyboardInterrupt:
+            for job_id in running.values():
+                fail_job(job_id, 'Обработчик остановлен')
+            self.stdout.write('Обработчик остановлен')
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def create_pool(self, processes):
+        return ProcessPoolExecutor(
+            max_workers=processes,
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup
+        )
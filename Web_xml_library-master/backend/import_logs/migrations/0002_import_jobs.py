@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_logs', '0001_initial'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='errors',
+            field=models.JSONField(blank=True, default=list, verbose_name='Ошибки'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Окончание выполнения'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='items_total',
+            field=models.IntegerField(default=0, verbose_name='Всего элементов'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='params',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Параметры задачи'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='progress',
+            field=models.PositiveSmallIntegerField(default=100, verbose_name='Прогресс, %'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='result',
+            field=models.JSONField(blank=True, null=True, verbose_name='Результат'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True, verbose_name='Начало выполнения'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='status',
+            field=models.CharField(choices=[('QUEUED', 'В очереди'), ('RUNNING', 'Выполняется'), ('SUCCEEDED', 'Выполнено'), ('FAILED', 'Ошибка')], default='SUCCEEDED', max_length=20, verbose_name='Статус'),
+        ),
+        migrations.AddField(
+            model_name='importlog',
+            name='worker',
+            field=models.CharField(blank=True, default='', max_length=100, verbose_name='Обработчик'),
+        ),
+        migrations.AlterField(
+            model_name='importlog',
+            name='operation_type',
+            field=models.CharField(choices=[('IMPORT', 'Импорт'), ('VALIDATE', 'Валидация'), ('UPDATE', 'Обновление'), ('DELETE', 'Удаление'), ('STRUCTURE_IMPORT', 'Импорт структуры'), ('DOCUMENT_IMPORT', 'Импорт документов')], max_length=50, verbose_name='Тип операции'),
+        ),
+        migrations.AddIndex(
+            model_name='importlog',
+            index=models.Index(fields=['status', 'performed_at'], name='import_logs_status_054a89_idx'),
+        ),
+    ]
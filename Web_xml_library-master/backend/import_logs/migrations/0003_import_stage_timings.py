@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('import_logs', '0002_import_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importlog',
+            name='stage_timings',
+            field=models.JSONField(blank=True, default=dict, verbose_name='Время этапов'),
+        ),
+    ]
@@ -9,6 +9,16 @@ class ImportLog(models.Model):
         ('VALIDATE', 'Валидация'),
         ('UPDATE', 'Обновление'),
         ('DELETE', 'Удаление'),
+        ('STRUCTURE_IMPORT', 'Импорт структуры'),
+        ('DOCUMENT_IMPORT', 'Импорт документов'),
+    ]
+
+    # Статусы фоновых задач (import_logs.jobs); синхронные операции сразу SUCCEEDED
+    STATUSES = [
+        ('QUEUED', 'В очереди'),
+        ('RUNNING', 'Выполняется'),
+        ('SUCCEEDED', 'Выполнено'),
+        ('FAILED', 'Ошибка'),
     ]
 
     operation_type = models.CharField(max_length=50, choices=OPERATION_TYPES, verbose_name="Тип операции")
@@ -17,11 +27,25 @@ class ImportLog(models.Model):
     items_processed = models.IntegerField(default=0, verbose_name="Обработано элементов")
     user = models.ForeignKey(UserProfile, on_delete=models.SET_NULL, null=True, blank=True, verbose_name="Пользователь")
     performed_at = models.DateTimeField(default=timezone.now, verbose_name="Время выполнения")
+    status = models.CharField(max_length=20, choices=STATUSES, default='SUCCEEDED', verbose_name="Статус")
+    progress = models.PositiveSmallIntegerField(default=100, verbose_name="Прогресс, %")
+    items_total = models.IntegerField(default=0, verbose_name="Всего элементов")
+    errors = models.JSONField(default=list, blank=True, verbose_name="Ошибки")
+    params = models.JSONField(default=dict, blank=True, verbose_name="Параметры задачи")
+    result = models.JSONField(null=True, blank=True, verbose_name="Результат")
+    started_at = models.DateTimeField(null=True, blank=True, verbose_name="Начало выполнения")
+    finished_at = models.DateTimeField(null=True, blank=True, verbose_name="Окончание выполнения")
+    worker = models.CharField(max_length=100, blank=True, default='', verbose_name="Обработчик")
+    # Время этапов импорта в мс (document_manager.tracing): {"parse_ms": ..., "total_ms": ...}
+    stage_timings = models.JSONField(default=dict, blank=True, verbose_name="Время этапов")
 
     class Meta:
         verbose_name = "Лог импорта"
         verbose_name_plural = "Логи импорта"
         ordering = ['-performed_at']
+        indexes = [
+            models.Index(fields=['status', 'performed_at'])
+        ]
 
     def __str__(self):
         return f"{self.operation_type} - {self.filename}"
\ No newline at end of file
@@ -1,3 +1,165 @@
-from django.test import TestCase
+import datetime
+import tempfile
+from unittest import mock
 
-# Create your tests here.
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from document_manager.storage import save_upload
+from structures.models import Folder, Structure
+from .jobs import claim_next_job, enqueue_job, fail_stale_jobs, finish_job, run_job
+from .models import ImportLog
+
+
+STRUCTURE_XML = """
+<structure name="Фон">
+  <folder code="A" name="Договоры"><folder code="A1" name="2024"/></folder>
+  <folder code="B" name="Отчеты"/>
+</structure>
+""".encode()
+
+
+def running(operation_type, started_ago=0, params=None):
+    return ImportLog.objects.create(
+        operation_type=operation_type, filename='f.xml', status='RUNNING', params=params or {},
+        started_at=timezone.now() - datetime.timedelta(seconds=started_ago)
+    )
+
+
+@override_settings(IMPORT_JOB_MAX_RUNNING=2, IMPORT_JOB_TIMEOUT=60)
+class JobQueueTest(TestCase):
+    def test_claim_in_order(self):
+        first = enqueue_job('STRUCTURE_IMPORT', 'a.xml', {})
+        second = enqueue_job('DOCUMENT_IMPORT', 'b.zip', {})
+
+        self.assertEqual(claim_next_job('w1'), first.id)
+        self.assertEqual(claim_next_job('w2'), second.id)
+        self.assertIsNone(claim_next_job('w3'))
+
+        job = ImportLog.objects.get(id=first.id)
+        self.assertEqual((job.status, job.worker), ('RUNNING', 'w1'))
+        self.assertIsNotNone(job.started_at)
+
+    def test_running_limit(self):
+        running('STRUCTURE_IMPORT')
+        running('VALIDATE')
+        enqueue_job('STRUCTURE_IMPORT', 'a.xml', {})
+        self.assertIsNone(claim_next_job('w1'))
+
+    def test_other_operations_ignored(self):
+        # Записи синхронных операций не занимают слоты и не захватываются
+        running('IMPORT')
+        running('DELETE')
+        ImportLog.objects.create(operation_type='UPDATE', filename='f.xml', status='QUEUED')
+        job = enqueue_job('STRUCTURE_IMPORT', 'a.xml', {})
+
+        self.assertEqual(claim_next_job('w1'), job.id)
+        self.assertIsNone(claim_next_job('w2'))
+
+    def test_fail_stale_jobs(self):
+        stale = running('DOCUMENT_IMPORT', started_ago=120)
+        fresh = running('DOCUMENT_IMPORT', started_ago=10)
+        other = running('IMPORT', started_ago=120)
+
+        self.assertEqual(fail_stale_jobs(), [stale.id])
+        statuses = dict(ImportLog.objects.values_list('id', 'status'))
+        self.assertEqual(statuses[stale.id], 'FAILED')
+        self.assertEqual(statuses[fresh.id], 'RUNNING')
+        self.assertEqual(statuses[other.id], 'RUNNING')
+        self.assertEqual(fail_stale_jobs(timeout=5), [fresh.id])
+
+    def test_finish_only_running(self):
+        job = running('DOCUMENT_IMPORT', started_ago=120)
+        fail_stale_jobs()
+        # Обработчик, завершившийся после таймаута, не перезаписывает итог
+        self.assertFalse(finish_job(job.id, 'SUCCEEDED', 'Готово', result={'created': 1}))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message, job.result), ('FAILED', 'Превышено время выполнения задачи', None))
+
+        queued = enqueue_job('VALIDATE', 'a.xml', {})
+        self.assertFalse(finish_job(queued.id, 'FAILED', 'Ошибка'))
+        self.assertEqual(ImportLog.objects.get(id=queued.id).status, 'QUEUED')
+
+    def test_stale_structure_import_removes_inactive_structure(self):
+        partial = Structure.objects.create(name='Недоимпортирована', is_active=False)
+        Folder.objects.create(structure=partial, code='A', name='A')
+        finished = Structure.objects.create(name='Готова')
+        stale = running('STRUCTURE_IMPORT', started_ago=120, params={'structure_id': partial.id})
+        running('STRUCTURE_IMPORT', started_ago=120, params={'structure_id': finished.id})
+        running('STRUCTURE_IMPORT', started_ago=120)
+
+        self.assertEqual(len(fail_stale_jobs()), 3)
+        self.assertFalse(Structure.objects.filter(id=partial.id).exists())
+        self.assertFalse(Folder.objects.filter(structure_id=partial.id).exists())
+        self.assertTrue(Structure.objects.filter(id=finished.id).exists())
+        self.assertEqual(ImportLog.objects.get(id=stale.id).status, 'FAILED')
+
+
+class RunJobTest(TransactionTestCase):
+    """run_job закрывает соединение, поэтому без обертки в транзакцию"""
+
+    def setUp(self):
+        blob_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(blob_dir.cleanup)
+        patcher = mock.patch('document_manager.storage.BLOB_ROOT', blob_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def enqueue_structure(self, content=STRUCTURE_XML):
+        upload, file_hash = save_upload(SimpleUploadedFile('fon.xml', content))
+        job = enqueue_job('STRUCTURE_IMPORT', 'fon.xml', {
+            'upload': upload, 'file_hash': file_hash, 'file_size': len(content)
+        })
+        self.assertEqual(claim_next_job('test'), job.id)
+        return job
+
+    def test_structure_import(self):
+        job = self.enqueue_structure()
+        self.assertEqual(run_job(job.id), 'SUCCEEDED')
+
+        job.refresh_from_db()
+        structure = Structure.objects.get(id=job.result['structure_id'])
+        self.assertEqual(job.params['structure_id'], structure.id)
+        self.assertTrue(structure.is_active)
+        self.assertEqual(Folder.objects.filter(structure=structure).count(), 3)
+        self.assertEqual(job.progress, 100)
+        self.assertTrue({'stream_ms', 'folder_resolution_ms', 'total_ms'} <= set(job.stage_timings))
+
+    @override_settings(IMPORT_TRACE_LEVEL='off')
+    def test_trace_off(self):
+        job = self.enqueue_structure()
+        self.assertEqual(run_job(job.id), 'SUCCEEDED')
+        job.refresh_from_db()
+        self.assertEqual(job.stage_timings, {})
+
+    def test_failed_import_removes_structure(self):
+        job = self.enqueue_structure(b'<structure name="X"><folder code="A" name="A">')
+        self.assertEqual(run_job(job.id), 'FAILED')
+        self.assertFalse(Structure.objects.exists())
+        # Время этапов сохраняется и для упавшей задачи
+        job.refresh_from_db()
+        self.assertIn('total_ms', job.stage_timings)
+
+    def test_timed_out_while_running(self):
+        # Обработчик завис: fail_stale_jobs помечает задачу и удаляет неактивную структуру,
+        # а закончившийся позже обработчик не меняет итог
+        job = self.enqueue_structure()
+        seen = {}
+
+        def stream_import_structure(chunks, structure):
+            seen['params'] = ImportLog.objects.get(id=job.id).params
+            seen['active'] = Structure.objects.get(id=structure.id).is_active
+            seen['stale'] = fail_stale_jobs(timeout=-1)
+            return 3, [], 'hash', 'Фон', {}
+
+        with mock.patch('structures.streaming.stream_import_structure', stream_import_structure), \
+                self.assertLogs('import_logs.jobs', 'WARNING'):
+            self.assertEqual(run_job(job.id), 'FAILED')
+
+        self.assertFalse(seen['active'])
+        self.assertEqual(seen['stale'], [job.id])
+        self.assertIn('structure_id', seen['params'])
+        self.assertFalse(Structure.objects.exists())
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.message), ('FAILED', 'Превышено время выполнения задачи'))
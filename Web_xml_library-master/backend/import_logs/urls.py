@@ -0,0 +1,7 @@
+from django.urls import path
+from . import views
+
+urlpatterns = [
+    path('', views.list_import_jobs, name='import_jobs'),
+    path('<int:job_id>/', views.get_import_job, name='import_job'),
+]
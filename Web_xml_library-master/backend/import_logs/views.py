@@ -1,3 +1,62 @@
-from django.shortcuts import render
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
 
-# Create your views here.
+from document_manager.pagination import PaginationError, paginate
+from .jobs import job_status_url
+from .models import ImportLog
+
+
+# Сортировки списка задач для курсорной пагинации
+JOB_ORDERINGS = {
+    'performed': ('-performed_at', '-id'),
+}
+
+
+def _job_payload(job):
+    return {
+        'job_id': job.id,
+        'operation_type': job.operation_type,
+        'filename': job.filename,
+        'status': job.status,
+        'progress': job.progress,
+        'items_processed': job.items_processed,
+        'items_total': job.items_total,
+        'message': job.message,
+        'errors': job.errors,
+        'result': job.result,
+        'performed_at': job.performed_at,
+        'started_at': job.started_at,
+        'finished_at': job.finished_at,
+        'status_url': job_status_url(job),
+    }
+
+
+def get_import_job(request, job_id):
+    """Состояние фоновой задачи импорта (для опроса клиентом)"""
+    job = get_object_or_404(ImportLog, id=job_id)
+    return JsonResponse({'success': True, **_job_payload(job)})
+
+
+def list_import_jobs(request):
+    """Задачи и журнал импортов: ?status=QUEUED,RUNNING&operation_type=..."""
+    jobs = ImportLog.objects.defer('params', 'result')
+
+    statuses = [s for s in request.GET.get('status', '').split(',') if s]
+    if statuses:
+        jobs = jobs.filter(status__in=statuses)
+    if request.GET.get('operation_type'):
+        jobs = jobs.filter(operation_type=request.GET['operation_type'])
+
+    try:
+        rows, page_info = paginate(jobs, request, JOB_ORDERINGS)
+    except PaginationError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    items = []
+    for job in rows:
+        payload = _job_payload(job)
+        # Полный результат - только в карточке задачи
+        del payload['result']
+        items.append(payload)
+
+    return JsonResponse({'jobs': items, **page_info})
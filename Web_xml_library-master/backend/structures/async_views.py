@@ -0,0 +1,94 @@
+"""
+Async версии представлений чтения (ASGI, settings.ASYNC_READ_VIEWS).
+
+Логика и формат ответов те же, что в views.py; запросы к БД идут через
+async ORM (aget, aiterator, async for), кэш - через async методы кэша,
+поэтому ожидание БД не занимает поток обработчика.
+"""
+from django.http import Http404, JsonResponse
+
+from .caching import acached_json_response, astructure_cache_key, astructures_list_cache_key
+from .models import Folder, Structure
+from .tree import abuild_tree_levels, aiter_tree_json
+from .views import (
+    STRUCTURE_LIST_FIELDS, STRUCTURE_ORDERINGS, parse_tree_params, search_querysets, structure_details,
+    structures_page_key, tree_header
+)
+from document_manager.pagination import PaginationError, apaginate
+from document_manager.responses import StreamingJsonResponse
+
+
+async def _aget_structure(structure_id):
+    """get_object_or_404 для async ORM"""
+    try:
+        return await Structure.objects.aget(id=structure_id)
+    except Structure.DoesNotExist:
+        raise Http404('Структура не найдена')
+
+
+async def get_structures(request):
+    """Получить все структуры"""
+    async def build_payload():
+        structures = Structure.objects.filter(is_active=True).values(*STRUCTURE_LIST_FIELDS)
+        try:
+            structures, page_info = await apaginate(structures, request, STRUCTURE_ORDERINGS)
+        except PaginationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return {'structures': structures, **page_info}
+
+    cache_key = await astructures_list_cache_key(structures_page_key(request))
+    return await acached_json_response(request, cache_key, build_payload)
+
+
+async def get_folder_tree(request, structure_id):
+    """Дерево папок структуры (параметры - как у views.get_folder_tree)"""
+    params = parse_tree_params(request)
+    if isinstance(params, JsonResponse):
+        return params
+    parent_id, depth = params
+
+    async def build_payload():
+        structure = await _aget_structure(structure_id)
+
+        parent = None
+        if parent_id:
+            try:
+                parent = await Folder.objects.aget(id=parent_id, structure_id=structure_id)
+            except Folder.DoesNotExist:
+                return JsonResponse({'error': 'Папка не найдена в структуре'}, status=404)
+
+        structure_data = tree_header(structure)
+        if depth:
+            return {**structure_data, 'tree': await abuild_tree_levels(structure_id, parent, depth)}
+
+        return StreamingJsonResponse(
+            structure_data, 'tree', array_chunks=aiter_tree_json(structure_id, parent)
+        )
+
+    cache_key = await astructure_cache_key(structure_id, 'tree', parent_id or '', depth or '')
+    return await acached_json_response(request, cache_key, build_payload)
+
+
+async def search_structure(request):
+    """Поиск по структурам и документам"""
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Пустой запрос'}, status=400)
+
+    folders, documents = search_querysets(query)
+
+    return JsonResponse({
+        'success': True,
+        'query': query,
+        'folders': [row async for row in folders],
+        'documents': [row async for row in documents]
+    })
+
+
+async def get_structure_details(request, structure_id):
+    """Получить детальную информацию о структуре"""
+    async def build_payload():
+        return structure_details(await _aget_structure(structure_id))
+
+    cache_key = await astructure_cache_key(structure_id, 'details')
+    return await acached_json_response(request, cache_key, build_payload)
@@ -0,0 +1,272 @@
+import hashlib
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified, StreamingHttpResponse
+from django.http.response import HttpResponseBase
+
+from document_manager.responses import dumps
+
+
+CACHE_TIMEOUT = getattr(settings, 'STRUCTURE_CACHE_TIMEOUT', 60 * 60)
+STREAM_MAX_BYTES = getattr(settings, 'STRUCTURE_CACHE_STREAM_MAX_BYTES', 1024 * 1024)
+
+LIST_VERSION_KEY = 'structures:list:version'
+HITS_KEY = 'structures:cache:hits'
+MISSES_KEY = 'structures:cache:misses'
+
+
+def cache_enabled():
+    """
+    Кэшировать ли ответы: STRUCTURE_CACHE_ENABLED и общий для процессов бэкенд.
+
+    Версии для сброса хранятся в самом кэше, а структуры меняют разные
+    процессы (воркеры gunicorn, run_import_worker). LocMemCache у каждого
+    процесса свой, сброс до остальных не дойдет - с ним кэш и ETag выключены.
+    """
+    return settings.STRUCTURE_CACHE_ENABLED and not isinstance(caches[DEFAULT_CACHE_ALIAS], LocMemCache)
+
+
+def _incr(key, delta=1):
+    """Атомарный счетчик в кэше (создается при первом обращении)"""
+    if cache.add(key, delta, timeout=None):
+        return delta
+    try:
+        return cache.incr(key, delta)
+    except ValueError:
+        # Ключ вытеснили между add и incr
+        cache.set(key, delta, timeout=None)
+        return delta
+
+
+async def _aincr(key, delta=1):
+    if await cache.aadd(key, delta, timeout=None):
+        return delta
+    try:
+        return await cache.aincr(key, delta)
+    except ValueError:
+        await cache.aset(key, delta, timeout=None)
+        return delta
+
+
+def _get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Начальная версия из времени: если счетчик вытеснят,
+        # новый не совпадет со старыми ключами и устаревшие данные не оживут
+        cache.add(key, time.time_ns() // 1000, timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def _aget_version(key):
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns() // 1000, timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def _structure_version_key(structure_id):
+    return f'structures:{structure_id}:version'
+
+
+def get_structure_version(structure_id):
+    return _get_version(_structure_version_key(structure_id))
+
+
+def get_structures_list_version():
+    return _get_version(LIST_VERSION_KEY)
+
+
+def _bump_versions(structure_id=None):
+    if structure_id is not None:
+        _incr(_structure_version_key(structure_id))
+    _incr(LIST_VERSION_KEY)
+
+
+def bump_structures_list_version():
+    """Сбросить кэш списка структур (после коммита транзакции)"""
+    transaction.on_commit(_bump_versions)
+
+
+def bump_structure_version(structure_id):
+    """Сбросить кэш дерева и деталей структуры, а также списка структур"""
+    transaction.on_commit(partial(_bump_versions, structure_id))
+
+
+def structure_cache_key(structure_id, *parts):
+    key = f'structures:{structure_id}:v{get_structure_version(structure_id)}'
+    return ':'.join([key, *map(str, parts)])
+
+
+def structures_list_cache_key(*parts):
+    key = f'structures:list:v{get_structures_list_version()}'
+    return ':'.join([key, *map(str, parts)])
+
+
+async def astructure_cache_key(structure_id, *parts):
+    version = await _aget_version(_structure_version_key(structure_id))
+    return ':'.join([f'structures:{structure_id}:v{version}', *map(str, parts)])
+
+
+async def astructures_list_cache_key(*parts):
+    version = await _aget_version(LIST_VERSION_KEY)
+    return ':'.join([f'structures:list:v{version}', *map(str, parts)])
+
+
+def _etag(cache_key):
+    return '"%s"' % hashlib.md5(cache_key.encode()).hexdigest()
+
+
+def _not_modified(request, etag):
+    if etag in request.headers.get('If-None-Match', ''):
+        response = HttpResponseNotModified()
+        response['ETag'] = etag
+        return response
+    return None
+
+
+def _cached_response(body, etag):
+    response = HttpResponse(body, content_type='application/json')
+    return _with_cache_headers(response, etag)
+
+
+def _uncached_response(payload):
+    if isinstance(payload, HttpResponseBase):
+        return payload
+    return HttpResponse(dumps(payload), content_type='application/json')
+
+
+def _with_cache_headers(response, etag):
+    response['ETag'] = etag
+    response['Cache-Control'] = 'no-cache'
+    return response
+
+
+def cached_json_response(request, cache_key, build_payload):
+    """
+    JSON ответ из кэша с поддержкой ETag / If-None-Match.
+
+    Ключ уже содержит версию структуры, поэтому ETag вычисляется из него
+    без обращения к БД. build_payload вызывается только при промахе;
+    если он вернул HttpResponse (например, ошибку), ответ не кэшируется,
+    StreamingHttpResponse отдается потоком и кэшируется после отдачи, если
+    не больше STRUCTURE_CACHE_STREAM_MAX_BYTES (полное дерево большой
+    структуры не копится в памяти воркера). Без cache_enabled() ответ
+    строится каждый раз и отдается без ETag.
+    """
+    if not cache_enabled():
+        return _uncached_response(build_payload())
+
+    etag = _etag(cache_key)
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    body = cache.get(cache_key)
+    if body is not None:
+        _incr(HITS_KEY)
+        return _cached_response(body, etag)
+
+    _incr(MISSES_KEY)
+    payload = build_payload()
+    if isinstance(payload, StreamingHttpResponse):
+        # Потоковый ответ кэшируется, когда отдан целиком (если не превысил лимит)
+        payload.streaming_content = _cache_streamed(cache_key, payload.streaming_content)
+        return _with_cache_headers(payload, etag)
+    if isinstance(payload, HttpResponse):
+        return payload
+
+    body = dumps(payload)
+    cache.set(cache_key, body, CACHE_TIMEOUT)
+    return _cached_response(body, etag)
+
+
+async def acached_json_response(request, cache_key, build_payload):
+    """cached_json_response для async представлений: build_payload - корутина"""
+    if not cache_enabled():
+        return _uncached_response(await build_payload())
+
+    etag = _etag(cache_key)
+    not_modified = _not_modified(request, etag)
+    if not_modified is not None:
+        return not_modified
+
+    body = await cache.aget(cache_key)
+    if body is not None:
+        await _aincr(HITS_KEY)
+        return _cached_response(body, etag)
+
+    await _aincr(MISSES_KEY)
+    payload = await build_payload()
+    if isinstance(payload, StreamingHttpResponse):
+        if payload.is_async:
+            payload.streaming_content = _acache_streamed(cache_key, payload.streaming_content)
+        else:
+            payload.streaming_content = _cache_streamed(cache_key, payload.streaming_content)
+        return _with_cache_headers(payload, etag)
+    if isinstance(payload, HttpResponse):
+        return payload
+
+    body = dumps(payload)
+    await cache.aset(cache_key, body, CACHE_TIMEOUT)
+    return _cached_response(body, etag)
+
+
+class _StreamBuffer:
+    """Копия потокового ответа для кэша; после превышения лимита не копится"""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.size = 0
+        self.parts = []
+
+    def add(self, chunk):
+        if self.parts is None:
+            return
+        self.size += len(chunk)
+        if self.size > self.limit:
+            self.parts = None
+        else:
+            self.parts.append(chunk)
+
+    def body(self):
+        return None if self.parts is None else b''.join(self.parts)
+
+
+def _cache_streamed(cache_key, chunks):
+    buffer = _StreamBuffer(STREAM_MAX_BYTES)
+    for chunk in chunks:
+        buffer.add(chunk)
+        yield chunk
+    body = buffer.body()
+    if body is not None:
+        cache.set(cache_key, body, CACHE_TIMEOUT)
+
+
+async def _acache_streamed(cache_key, chunks):
+    buffer = _StreamBuffer(STREAM_MAX_BYTES)
+    async for chunk in chunks:
+        buffer.add(chunk)
+        yield chunk
+    body = buffer.body()
+    if body is not None:
+        await cache.aset(cache_key, body, CACHE_TIMEOUT)
+
+
+def get_cache_stats():
+    hits = cache.get(HITS_KEY, 0)
+    misses = cache.get(MISSES_KEY, 0)
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_ratio': round(hits / total, 4) if total else None,
+        'timeout': CACHE_TIMEOUT,
+        'enabled': cache_enabled()
+    }
@@ -0,0 +1,86 @@
+from collections import Counter
+
+from .models import Folder
+from import_logs.jobs import enqueue_job
+from import_logs.models import ImportLog
+
+
+_VISITING = 1
+_DONE = 2
+
+
+def check_structure_consistency(structure):
+    """
+    Проверка консистентности структуры за один запрос.
+
+    Загружает (id, parent_id, code, materialized_path, name) всех папок
+    и за линейный проход в памяти ищет циклы, потерянных родителей,
+    неверные пути и дубликаты кодов.
+    """
+    rows = Folder.objects.filter(structure=structure).values_list(
+        'id', 'parent_id', 'code', 'materialized_path', 'name'
+    )
+    folders = {row[0]: row for row in rows}
+    issues = []
+
+    # Циклы: проходим по цепочкам родителей, каждая папка посещается один раз
+    state = {}
+    for folder_id in folders:
+        chain = []
+        current = folder_id
+        while current in folders and current not in state:
+            state[current] = _VISITING
+            chain.append(current)
+            current = folders[current][1]
+        if state.get(current) == _VISITING:
+            for cycle_id in chain[chain.index(current):]:
+                issues.append(f'Обнаружен цикл в папке {folders[cycle_id][4]} (ID: {cycle_id})')
+        for chain_id in chain:
+            state[chain_id] = _DONE
+
+    # Потерянные родители и проверка materialized_path
+    for folder_id, parent_id, code, materialized_path, name in folders.values():
+        if parent_id is None:
+            expected_path = f"/{code}/"
+        elif parent_id in folders:
+            expected_path = f"{folders[parent_id][3]}{code}/"
+        else:
+            issues.append(f'Папка {name} (ID: {folder_id}) ссылается на отсутствующего родителя (ID: {parent_id})')
+            continue
+
+        if materialized_path != expected_path:
+            issues.append(
+                f'Несоответствие пути для папки {name}: ожидалось {expected_path}, фактически {materialized_path}')
+
+    # Дубликаты кодов в пределах одного родителя
+    duplicate_codes = Counter((row[1], row[2]) for row in folders.values())
+    for (parent_id, code), count in duplicate_codes.items():
+        if count < 2:
+            continue
+        if parent_id:
+            parent_name = folders[parent_id][4] if parent_id in folders else parent_id
+            issues.append(f'Дубликат кода "{code}" в папке "{parent_name}"')
+        else:
+            issues.append(f'Дубликат кода "{code}" в корневом уровне')
+
+    return {
+        'success': True,
+        'structure': structure.name,
+        'total_folders': len(folders),
+        'issues_found': len(issues),
+        'issues': issues,
+        'is_consistent': len(issues) == 0
+    }
+
+
+def start_background_check(structure):
+    """
+    Постановка проверки очень большой структуры в очередь фоновых задач
+    (выполняет run_import_worker, отчет сохраняется в ImportLog.result).
+    """
+    return enqueue_job('VALIDATE', structure.name, {'structure_id': structure.id})
+
+
+def get_background_report(structure_id, report_id):
+    """Запись фоновой проверки структуры (ImportLog.DoesNotExist, если не найдена)"""
+    return ImportLog.objects.get(id=report_id, operation_type='VALIDATE', params__structure_id=structure_id)
@@ -0,0 +1,200 @@
+"""
+Денормализованные счетчики папок и документов.
+
+Folder: documents_count (документы в самой папке), subtree_documents_count
+(в папке и всех потомках), children_count (дочерние папки).
+Structure: folders_count, root_folders_count, documents_count (привязки).
+
+Привязки документов меняют счетчики приращениями (F() + n) в транзакции
+вызывающего кода, импорт и повторный импорт пересчитывают структуру целиком.
+"""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .caching import bump_structure_version
+from .models import Folder, Structure
+
+
+BULK_BATCH_SIZE = 2000
+
+# Папки удаленных привязок внутри deferred_document_counters (None - вне блока)
+_deferred_folder_ids = ContextVar('deferred_folder_ids', default=None)
+
+
+def ancestor_paths(materialized_path):
+    """Пути папки и всех ее предков: '/A/B/' -> ['/A/', '/A/B/']"""
+    codes = materialized_path.strip('/').split('/')
+    return ['/' + '/'.join(codes[:i]) + '/' for i in range(1, len(codes) + 1)]
+
+
+def _update_by_delta(queryset_for, deltas, field):
+    """Одно UPDATE на каждое различное приращение: field = field + delta"""
+    keys_by_delta = defaultdict(list)
+    for key, delta in deltas.items():
+        if delta:
+            keys_by_delta[delta].append(key)
+    for delta, keys in keys_by_delta.items():
+        queryset_for(keys).update(**{field: F(field) + delta})
+
+
+def adjust_document_counters(folder_ids, sign=1):
+    """
+    Учесть добавленные (sign=1) или удаленные (sign=-1) привязки документов.
+
+    folder_ids - id папки для каждой привязки (с повторами). Папки читаются
+    одним запросом, затем несколько UPDATE с приращениями.
+    """
+    per_folder = Counter(folder_ids)
+    if not per_folder:
+        return
+
+    per_structure = Counter()
+    per_path = defaultdict(Counter)
+    for folder_id, structure_id, path in Folder.objects.filter(id__in=list(per_folder)).values_list(
+        'id', 'structure_id', 'materialized_path'
+    ):
+        count = per_folder[folder_id] * sign
+        per_structure[structure_id] += count
+        for ancestor in ancestor_paths(path or ''):
+            per_path[structure_id][ancestor] += count
+
+    _update_by_delta(
+        lambda ids: Folder.objects.filter(id__in=ids),
+        {folder_id: count * sign for folder_id, count in per_folder.items()},
+        'documents_count'
+    )
+    for structure_id, deltas in per_path.items():
+        _update_by_delta(
+            lambda paths: Folder.objects.filter(structure_id=structure_id, materialized_path__in=paths),
+            deltas,
+            'subtree_documents_count'
+        )
+    _update_by_delta(lambda ids: Structure.objects.filter(id__in=ids), per_structure, 'documents_count')
+
+    for structure_id in per_structure:
+        bump_structure_version(structure_id)
+
+
+@contextmanager
+def deferred_document_counters():
+    """
+    Удаления привязок внутри блока уменьшают счетчики одним
+    adjust_document_counters в конце, а не запросами на каждую привязку.
+    Вызывающий код держит блок в транзакции удаления.
+    """
+    if _deferred_folder_ids.get() is not None:
+        yield
+        return
+    folder_ids = []
+    token = _deferred_folder_ids.set(folder_ids)
+    try:
+        yield
+    finally:
+        _deferred_folder_ids.reset(token)
+    adjust_document_counters(folder_ids, -1)
+
+
+def document_link_removed(folder_id):
+    """Удалена привязка документа: счетчики сразу или в конце deferred_document_counters"""
+    folder_ids = _deferred_folder_ids.get()
+    if folder_ids is None:
+        adjust_document_counters([folder_id], -1)
+    else:
+        folder_ids.append(folder_id)
+
+
+def move_subtree_counters(folder, old_path, new_path, old_parent_id, new_parent_id):
+    """Перенос поддерева: документы поддерева уходят от старых предков к новым"""
+    documents = folder.subtree_documents_count
+    folders = Folder.objects.filter(structure_id=folder.structure_id)
+    if documents:
+        folders.filter(materialized_path__in=ancestor_paths(old_path)[:-1]).update(
+            subtree_documents_count=F('subtree_documents_count') - documents
+        )
+        folders.filter(materialized_path__in=ancestor_paths(new_path)[:-1]).update(
+            subtree_documents_count=F('subtree_documents_count') + documents
+        )
+
+    if old_parent_id is not None:
+        folders.filter(id=old_parent_id).update(children_count=F('children_count') - 1)
+    if new_parent_id is not None:
+        folders.filter(id=new_parent_id).update(children_count=F('children_count') + 1)
+
+    root_delta = (new_parent_id is None) - (old_parent_id is None)
+    if root_delta:
+        Structure.objects.filter(id=folder.structure_id).update(
+            root_folders_count=F('root_folders_count') + root_delta
+        )
+
+
+def _count_subquery(queryset, field):
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')}).order_by().values(field)
+            .annotate(count=Count('*')).values('count')[:1],
+            output_field=IntegerField()
+        ),
+        Value(0)
+    )
+
+
+def update_folder_counts(structure_id):
+    """
+    Счетчики папок без учета документов (после потокового импорта новой структуры).
+
+    children_count - одним UPDATE с подзапросом по индексу (structure, parent).
+    """
+    folders = Folder.objects.filter(structure_id=structure_id)
+    folders.update(children_count=_count_subquery(Folder.objects.all(), 'parent'))
+    Structure.objects.filter(id=structure_id).update(
+        folders_count=folders.count(),
+        root_folders_count=folders.filter(parent=None).count()
+    )
+    bump_structure_version(structure_id)
+
+
+def recalculate_structure_counters(structure_id):
+    """
+    Полный пересчет счетчиков структуры (после импорта и для исправления).
+
+    documents_count и children_count - одним UPDATE с подзапросами,
+    subtree_documents_count - один проход по путям в памяти, записываются
+    только изменившиеся значения.
+    """
+    from documents.models import FolderDocument
+
+    folders = Folder.objects.filter(structure_id=structure_id)
+    folders.update(
+        documents_count=_count_subquery(FolderDocument.objects.all(), 'folder'),
+        children_count=_count_subquery(Folder.objects.all(), 'parent'),
+    )
+
+    rows = list(folders.values_list('id', 'materialized_path', 'documents_count', 'subtree_documents_count'))
+    subtree = Counter()
+    documents_total = 0
+    root_folders = 0
+    for folder_id, path, documents, _ in rows:
+        documents_total += documents
+        if path and path.count('/') == 2:
+            root_folders += 1
+        if documents and path:
+            for ancestor in ancestor_paths(path):
+                subtree[ancestor] += documents
+
+    changed = [
+        Folder(id=folder_id, subtree_documents_count=subtree[path] if path else documents)
+        for folder_id, path, documents, stored in rows
+        if (subtree[path] if path else documents) != stored
+    ]
+    Folder.objects.bulk_update(changed, ['subtree_documents_count'], batch_size=BULK_BATCH_SIZE)
+
+    Structure.objects.filter(id=structure_id).update(
+        folders_count=len(rows),
+        root_folders_count=root_folders,
+        documents_count=documents_total
+    )
+    bump_structure_version(structure_id)
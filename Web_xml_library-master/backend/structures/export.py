@@ -0,0 +1,128 @@
+import io
+import re
+from xml.sax.saxutils import XMLGenerator
+
+from document_manager.responses import ITERATOR_CHUNK_SIZE, STREAM_BUFFER_SIZE
+from .models import Folder
+from .tree import tree_order
+
+
+# Атрибуты, которые нельзя записать атрибутом элемента, пишутся <attribute name="...">
+_RESERVED_ATTRIBUTES = {'name', 'code', 'id'}
+_XML_NAME_RE = re.compile(r'^[^\W\d][\w.-]*$')
+
+
+def _folder_attributes(folder):
+    element_attributes = {'name': folder['name'], 'code': folder['code']}
+    child_attributes = []
+    for name, value in (folder['attributes'] or {}).items():
+        value = '' if value is None else str(value)
+        if name in _RESERVED_ATTRIBUTES or not _XML_NAME_RE.match(name):
+            child_attributes.append((name, value))
+        else:
+            element_attributes[name] = value
+    return element_attributes, child_attributes
+
+
+def _iter_folder_documents(structure_id):
+    """Привязки документов в том же порядке обхода, что и папки"""
+    from documents.models import FolderDocument
+
+    return FolderDocument.objects.filter(folder__structure_id=structure_id).order_by(
+        tree_order('folder__materialized_path'), 'document__code'
+    ).values_list('folder_id', 'document__code', 'document__name', 'document__file_hash').iterator(
+        chunk_size=ITERATOR_CHUNK_SIZE
+    )
+
+
+def iter_structure_xml(structure, include_documents=False):
+    """
+    Экспорт структуры в формате, который принимает загрузка XML, кусками bytes.
+
+    Папки читаются итератором в порядке обхода в глубину (как дерево в API),
+    элементы пишутся XMLGenerator'ом и отдаются, как только накопится буфер.
+    В памяти только стек открытых путей. include_documents добавляет в папки
+    элементы <document code="..." name="..." hash="..."/> (при загрузке игнорируются).
+    """
+    out = io.BytesIO()
+    xml = XMLGenerator(out, encoding='utf-8', short_empty_elements=True)
+
+    def drain(force=False):
+        if force or out.tell() >= STREAM_BUFFER_SIZE:
+            chunk = out.getvalue()
+            out.seek(0)
+            out.truncate()
+            return chunk
+        return b''
+
+    xml.startDocument()
+    xml.startElement('organization', {'name': structure.name})
+    xml.ignorableWhitespace('\n  ')
+    structure_attributes = {'name': structure.name}
+    if structure.description:
+        structure_attributes['description'] = structure.description
+    xml.startElement('structure', structure_attributes)
+
+    documents = _iter_folder_documents(structure.id) if include_documents else iter(())
+    document = next(documents, None)
+
+    folders = Folder.objects.filter(structure_id=structure.id).order_by(tree_order()).values(
+        'id', 'code', 'name', 'attributes', 'materialized_path'
+    ).iterator(chunk_size=ITERATOR_CHUNK_SIZE)
+
+    # Открытые папки: [путь, есть ли вложенные элементы]
+    open_folders = []
+
+    def close_folder():
+        _, has_content = open_folders.pop()
+        if has_content:
+            xml.ignorableWhitespace('\n' + '  ' * (len(open_folders) + 2))
+        xml.endElement('folder')
+
+    for folder in folders:
+        path = folder['materialized_path']
+        while open_folders and not path.startswith(open_folders[-1][0]):
+            close_folder()
+        if open_folders:
+            open_folders[-1][1] = True
+
+        indent = '\n' + '  ' * (len(open_folders) + 3)
+        element_attributes, child_attributes = _folder_attributes(folder)
+        xml.ignorableWhitespace(indent[:-2])
+        xml.startElement('folder', element_attributes)
+        has_content = False
+        for name, value in child_attributes:
+            xml.ignorableWhitespace(indent)
+            xml.startElement('attribute', {'name': name})
+            xml.characters(value)
+            xml.endElement('attribute')
+            has_content = True
+
+        # Привязки отсортированы так же, как папки - слияние двух потоков
+        while document is not None and document[0] == folder['id']:
+            _, code, name, file_hash = document
+            attributes = {'code': code, 'name': name}
+            if file_hash:
+                attributes['hash'] = file_hash
+            xml.ignorableWhitespace(indent)
+            xml.startElement('document', attributes)
+            xml.endElement('document')
+            has_content = True
+            document = next(documents, None)
+
+        open_folders.append([path, has_content])
+
+        chunk = drain()
+        if chunk:
+            yield chunk
+
+    while open_folders:
+        close_folder()
+
+    xml.ignorableWhitespace('\n  ')
+    xml.endElement('structure')
+    xml.ignorableWhitespace('\n')
+    xml.endElement('organization')
+    xml.ignorableWhitespace('\n')
+    xml.endDocument()
+    yield drain(force=True)
@@ -0,0 +1,311 @@
+import time
+
+from .counters import recalculate_structure_counters
+from .models import Folder, Structure
+
+
+# Размер пачки для bulk_create (ограничивает размер одного INSERT)
+BULK_BATCH_SIZE = 2000
+
+# Этапы трассировки импорта (document_manager.tracing) для таймингов import_folder_tree
+TRACE_STAGES = {'parse_ms': 'folder_resolution', 'insert_ms': 'db_write'}
+
+
+def decode_xml_content(file_content):
+    """Декодирование XML файла: UTF-8, затем однобайтовые кодировки. None - не удалось"""
+    for encoding in ['utf-8', 'cp1251', 'iso-8859-1', 'windows-1251']:
+        try:
+            return file_content.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return None
+
+
+class FolderNode:
+    """Папка, разобранная из XML, до записи в БД"""
+
+    __slots__ = ('code', 'name', 'attributes', 'parent', 'children', 'depth', 'materialized_path', 'folder_id')
+
+    def __init__(self, code, name, attributes, parent=None):
+        self.code = code
+        self.name = name
+        self.attributes = attributes
+        self.parent = parent
+        self.children = []
+        self.depth = parent.depth + 1 if parent else 0
+        self.materialized_path = f"{parent.materialized_path}{code}/" if parent else f"/{code}/"
+        self.folder_id = None
+
+
+def extract_folder_attributes(folder_elem):
+    """Извлечение атрибутов папки из XML элемента"""
+    attributes = {}
+
+    # Вариант 1: атрибуты как подэлементы
+    for attr_elem in folder_elem.findall('attribute'):
+        attr_name = attr_elem.get('name')
+        attr_value = attr_elem.text
+        if attr_name and attr_value:
+            attributes[attr_name] = attr_value
+
+    # Вариант 2: атрибуты как атрибуты элемента
+    for attr_name, attr_value in folder_elem.attrib.items():
+        if attr_name not in ['name', 'code', 'id']:
+            attributes[attr_name] = attr_value
+
+    # Вариант 3: специальный элемент <attributes> с дочерними элементами
+    attrs_elem = folder_elem.find('attributes')
+    if attrs_elem is not None:
+        for attr_elem in attrs_elem:
+            attributes[attr_elem.tag] = attr_elem.text or ''
+
+    return attributes
+
+
+def find_root_folder_elements(root):
+    """Папки верхнего уровня: в корне, в <folders> и в <structure>"""
+    folder_elements = list(root.findall('folder'))
+
+    folders_elem = root.find('folders')
+    if folders_elem is not None:
+        folder_elements.extend(folders_elem.findall('folder'))
+
+    struct_elem = root.find('structure')
+    if struct_elem is not None:
+        folder_elements.extend(struct_elem.findall('folder'))
+
+    return folder_elements
+
+
+def _child_folder_elements(folder_elem):
+    """Дочерние папки, в том числе вложенные в промежуточные теги"""
+    for child_elem in folder_elem.findall('folder'):
+        yield child_elem
+    for child_elem in folder_elem.findall('*'):
+        if child_elem.tag != 'folder' and child_elem.find('folder') is not None:
+            yield from child_elem.findall('folder')
+
+
+def parse_folder_tree(root, errors=None):
+    """
+    Разбор всего XML дерева в узлы FolderNode без обращений к БД.
+
+    Возвращает список уровней (уровень 0 - корневые папки). Папка с уже
+    встречавшимся кодом объединяется с первой: имя и атрибуты перезаписываются,
+    дети присоединяются к первой папке (как это делал get_or_create).
+    """
+    if errors is None:
+        errors = []
+
+    nodes_by_code = {}
+    levels = []
+    # Обход в ширину, чтобы уровни заполнялись в порядке документа
+    queue = [(elem, None) for elem in find_root_folder_elements(root)]
+
+    while queue:
+        next_queue = []
+        for folder_elem, parent_node in queue:
+            folder_name = folder_elem.get('name', '')
+            folder_code = folder_elem.get('code', '')
+
+            if not folder_code:
+                errors.append(f"Папка '{folder_name}' не имеет кода (атрибут 'code')")
+                continue  # Пропускаем папку без кода вместе с поддеревом
+
+            attributes = extract_folder_attributes(folder_elem)
+            node = nodes_by_code.get(folder_code)
+            if node is not None:
+                node.name = folder_name
+                node.attributes = attributes
+            else:
+                node = FolderNode(folder_code, folder_name, attributes, parent_node)
+                nodes_by_code[folder_code] = node
+                if parent_node is not None:
+                    parent_node.children.append(node)
+                while len(levels) <= node.depth:
+                    levels.append([])
+                levels[node.depth].append(node)
+
+            for child_elem in _child_folder_elements(folder_elem):
+                next_queue.append((child_elem, node))
+        queue = next_queue
+
+    return levels, errors
+
+
+def insert_folder_levels(structure, levels, batch_size=BULK_BATCH_SIZE):
+    """
+    Запись уровней папок в БД: один bulk_create на уровень.
+
+    id родителей и materialized_path берутся из памяти, поэтому число
+    запросов зависит от глубины дерева, а не от количества папок.
+    Узлы с уже известным folder_id (существующие папки) пропускаются.
+    """
+    folders_created = 0
+    for level in levels:
+        level = [node for node in level if node.folder_id is None]
+        if not level:
+            continue
+        folders = [
+            Folder(
+                structure=structure,
+                code=node.code,
+                name=node.name,
+                parent_id=node.parent.folder_id if node.parent else None,
+                materialized_path=node.materialized_path,
+                attributes=node.attributes,
+                children_count=len(node.children),
+            )
+            for node in level
+        ]
+        Folder.objects.bulk_create(folders, batch_size=batch_size)
+
+        if folders[0].pk is None:
+            # БД не вернула id после вставки - дочитываем их одним запросом
+            ids_by_code = dict(
+                Folder.objects.filter(structure=structure, code__in=[node.code for node in level])
+                .values_list('code', 'id')
+            )
+            for node in level:
+                node.folder_id = ids_by_code[node.code]
+        else:
+            for node, folder in zip(level, folders):
+                node.folder_id = folder.pk
+
+        folders_created += len(folders)
+
+    return folders_created
+
+
+def import_folder_tree(structure, root):
+    """
+    Импорт папок структуры: разбор XML в память, затем запись по уровням.
+
+    Возвращает (количество папок, ошибки, тайминги фаз в мс).
+    При наличии ошибок в БД ничего не пишется.
+    """
+    timings = {}
+
+    started = time.perf_counter()
+    levels, errors = parse_folder_tree(root)
+    timings['parse_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    if errors:
+        return 0, errors, timings
+
+    started = time.perf_counter()
+    folders_created = insert_folder_levels(structure, levels)
+    # Структура новая: счетчики папок известны из дерева, документов еще нет
+    Structure.objects.filter(id=structure.id).update(
+        folders_count=folders_created,
+        root_folders_count=len(levels[0]) if levels else 0
+    )
+    timings['insert_ms'] = round((time.perf_counter() - started) * 1000, 2)
+    timings['levels'] = len(levels)
+
+    return folders_created, errors, timings
+
+
+def diff_folder_tree(structure, levels):
+    """
+    Сравнение нового дерева с папками структуры по коду.
+
+    Существующим узлам проставляется folder_id. Возвращает словарь наборов:
+    added (узлы), removed (id папок), renamed / moved / attributes_changed (коды)
+    и changed (узлы, которые нужно обновить в БД).
+    """
+    existing = {
+        row['code']: row
+        for row in Folder.objects.filter(structure=structure).values(
+            'id', 'code', 'name', 'parent_id', 'attributes', 'materialized_path'
+        )
+    }
+    codes_by_id = {row['id']: code for code, row in existing.items()}
+
+    diff = {
+        'added': [],
+        'removed': [],
+        'renamed': [],
+        'moved': [],
+        'attributes_changed': [],
+        'changed': [],
+        'unchanged': 0
+    }
+    new_codes = set()
+
+    for level in levels:
+        for node in level:
+            new_codes.add(node.code)
+            row = existing.get(node.code)
+            if row is None:
+                diff['added'].append(node)
+                continue
+
+            node.folder_id = row['id']
+            parent_code = node.parent.code if node.parent else None
+            changed = False
+            if node.name != row['name']:
+                diff['renamed'].append(node.code)
+                changed = True
+            if parent_code != codes_by_id.get(row['parent_id']):
+                diff['moved'].append(node.code)
+                changed = True
+            if node.attributes != row['attributes']:
+                diff['attributes_changed'].append(node.code)
+                changed = True
+            if changed or node.materialized_path != row['materialized_path']:
+                diff['changed'].append(node)
+            else:
+                diff['unchanged'] += 1
+
+    diff['removed'] = [row['id'] for code, row in existing.items() if code not in new_codes]
+    return diff
+
+
+def apply_folder_diff(structure, levels, diff, batch_size=BULK_BATCH_SIZE):
+    """
+    Применение разницы: bulk_create новых, bulk_update измененных, удаление лишних.
+
+    Сначала создаются и перевешиваются папки, и только потом удаляются
+    лишние, чтобы каскад не задел перенесенные поддеревья. Связи
+    FolderDocument неизмененных папок не затрагиваются.
+    """
+    insert_folder_levels(structure, levels, batch_size)
+
+    folders = [
+        Folder(
+            id=node.folder_id,
+            name=node.name,
+            parent_id=node.parent.folder_id if node.parent else None,
+            materialized_path=node.materialized_path,
+            attributes=node.attributes,
+        )
+        for node in diff['changed']
+    ]
+    Folder.objects.bulk_update(
+        folders, ['name', 'parent_id', 'materialized_path', 'attributes'], batch_size=batch_size
+    )
+
+    if diff['removed']:
+        Folder.objects.filter(id__in=diff['removed']).delete()
+
+    # Папки перемещались и удалялись вместе с документами - пересчет целиком
+    recalculate_structure_counters(structure.id)
+
+
+def summarize_folder_diff(diff, limit=100):
+    """Сводка разницы для ответа API: количества и первые limit кодов"""
+    return {
+        'counts': {
+            'added': len(diff['added']),
+            'removed': len(diff['removed']),
+            'renamed': len(diff['renamed']),
+            'moved': len(diff['moved']),
+            'attributes_changed': len(diff['attributes_changed']),
+            'unchanged': diff['unchanged']
+        },
+        'added': [node.code for node in diff['added'][:limit]],
+        'renamed': diff['renamed'][:limit],
+        'moved': diff['moved'][:limit],
+        'attributes_changed': diff['attributes_changed'][:limit]
+    }
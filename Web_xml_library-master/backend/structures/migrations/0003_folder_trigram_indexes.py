@@ -0,0 +1,34 @@
+from django.db import migrations
+
+
+# Выражение индекса совпадает с тем, что строят icontains/istartswith на PostgreSQL
+POSTGRES_FORWARD = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX structures_folder_name_trgm_idx ON structures_folder USING gin (UPPER(name::text) gin_trgm_ops)",
+    "CREATE INDEX structures_folder_code_trgm_idx ON structures_folder USING gin (UPPER(code::text) gin_trgm_ops)",
+]
+
+POSTGRES_BACKWARD = [
+    "DROP INDEX IF EXISTS structures_folder_name_trgm_idx",
+    "DROP INDEX IF EXISTS structures_folder_code_trgm_idx",
+]
+
+
+def _run(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            for statement in statements:
+                schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """Триграммные GIN индексы (pg_trgm) для поиска папок по подстроке"""
+
+    dependencies = [
+        ('structures', '0002_alter_folder_code_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(_run(POSTGRES_FORWARD), _run(POSTGRES_BACKWARD)),
+    ]
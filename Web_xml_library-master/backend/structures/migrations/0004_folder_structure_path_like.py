@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('structures', '0003_folder_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='folder',
+            index=models.Index(fields=['structure', 'materialized_path'], name='folder_structure_path_like', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,90 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:38
+
+from collections import Counter
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_counters(apps, schema_editor):
+    """Начальные значения счетчиков по существующим папкам и привязкам"""
+    Structure = apps.get_model('structures', 'Structure')
+    Folder = apps.get_model('structures', 'Folder')
+    FolderDocument = apps.get_model('documents', 'FolderDocument')
+
+    documents = dict(
+        FolderDocument.objects.values_list('folder_id').annotate(count=Count('id')).values_list('folder_id', 'count')
+    )
+    children = dict(
+        Folder.objects.exclude(parent_id=None).values_list('parent_id').annotate(count=Count('id'))
+        .values_list('parent_id', 'count')
+    )
+
+    for structure in Structure.objects.all():
+        rows = list(Folder.objects.filter(structure=structure).values_list('id', 'parent_id', 'materialized_path'))
+        subtree = Counter()
+        for folder_id, _, path in rows:
+            if documents.get(folder_id) and path:
+                codes = path.strip('/').split('/')
+                for i in range(1, len(codes) + 1):
+                    subtree['/' + '/'.join(codes[:i]) + '/'] += documents[folder_id]
+
+        folders = [
+            Folder(
+                id=folder_id,
+                documents_count=documents.get(folder_id, 0),
+                subtree_documents_count=subtree[path] if path else documents.get(folder_id, 0),
+                children_count=children.get(folder_id, 0)
+            )
+            for folder_id, _, path in rows
+        ]
+        Folder.objects.bulk_update(
+            folders, ['documents_count', 'subtree_documents_count', 'children_count'], batch_size=2000
+        )
+
+        structure.folders_count = len(rows)
+        structure.root_folders_count = sum(1 for _, parent_id, _ in rows if parent_id is None)
+        structure.documents_count = sum(documents.get(folder_id, 0) for folder_id, _, _ in rows)
+        structure.save(update_fields=['folders_count', 'root_folders_count', 'documents_count'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('structures', '0004_folder_structure_path_like'),
+        ('documents', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='folder',
+            name='children_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Дочерних папок'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='documents_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Документов в папке'),
+        ),
+        migrations.AddField(
+            model_name='folder',
+            name='subtree_documents_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Документов в поддереве'),
+        ),
+        migrations.AddField(
+            model_name='structure',
+            name='documents_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Документов'),
+        ),
+        migrations.AddField(
+            model_name='structure',
+            name='folders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Папок'),
+        ),
+        migrations.AddField(
+            model_name='structure',
+            name='root_folders_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Корневых папок'),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+    ]
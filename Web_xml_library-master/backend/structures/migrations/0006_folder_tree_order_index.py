@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+# Выражение индекса совпадает с structures.tree.TreeSortKey (tree_order):
+# ORDER BY дерева и выборка поддерева по диапазону ключей идут по индексу
+POSTGRES_FORWARD = [
+    "CREATE INDEX structures_folder_tree_order_idx ON structures_folder "
+    "(structure_id, (REPLACE(materialized_path, '/', CHR(1)) COLLATE \"C\"))",
+]
+
+SQLITE_FORWARD = [
+    "CREATE INDEX structures_folder_tree_order_idx ON structures_folder "
+    "(structure_id, REPLACE(materialized_path, '/', CHAR(1)))",
+]
+
+BACKWARD = [
+    "DROP INDEX IF EXISTS structures_folder_tree_order_idx",
+]
+
+
+def _run(statements_by_vendor):
+    def run(apps, schema_editor):
+        for statement in statements_by_vendor.get(schema_editor.connection.vendor, []):
+            schema_editor.execute(statement)
+    return run
+
+
+class Migration(migrations.Migration):
+    """Индекс порядка обхода дерева (structure_id, путь с 0x01 вместо '/')"""
+
+    dependencies = [
+        ('structures', '0005_folder_structure_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run({'postgresql': POSTGRES_FORWARD, 'sqlite': SQLITE_FORWARD}),
+            _run({'postgresql': BACKWARD, 'sqlite': BACKWARD}),
+        ),
+    ]
@@ -8,6 +8,10 @@ class Structure(models.Model):
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
     is_active = models.BooleanField(default=True, verbose_name="Активно")
     content_hash = models.CharField(max_length=64, blank=True, null=True, verbose_name="Хэш")
+    # Счетчики поддерживаются structures.counters
+    folders_count = models.PositiveIntegerField(default=0, verbose_name="Папок")
+    root_folders_count = models.PositiveIntegerField(default=0, verbose_name="Корневых папок")
+    documents_count = models.PositiveIntegerField(default=0, verbose_name="Документов")
 
     class Meta:
         verbose_name = "Структура"
@@ -28,6 +32,10 @@ class Folder(models.Model):
                                verbose_name="Родитель")
     materialized_path = models.CharField(max_length=1000, blank=True, null=True, verbose_name="Путь")
     attributes = models.JSONField(default=dict, blank=True, verbose_name="Атрибуты")
+    # Счетчики поддерживаются structures.counters
+    documents_count = models.PositiveIntegerField(default=0, verbose_name="Документов в папке")
+    subtree_documents_count = models.PositiveIntegerField(default=0, verbose_name="Документов в поддереве")
+    children_count = models.PositiveIntegerField(default=0, verbose_name="Дочерних папок")
     created_at = models.DateTimeField(default=timezone.now, verbose_name="Дата создания")
 
     class Meta:
@@ -36,6 +44,9 @@ class Folder(models.Model):
         indexes = [
             models.Index(fields=['materialized_path']),
             models.Index(fields=['structure', 'parent']),
+            # Поиск по префиксу пути (LIKE 'prefix%') в пределах структуры
+            models.Index(fields=['structure', 'materialized_path'], name='folder_structure_path_like',
+                         opclasses=['int8_ops', 'varchar_pattern_ops']),
         ]
         constraints = [
             models.UniqueConstraint(
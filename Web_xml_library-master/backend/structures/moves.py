@@ -0,0 +1,70 @@
+from django.db import transaction
+from django.db.models import Max, Value
+from django.db.models.functions import Concat, Length, Substr
+
+from .counters import move_subtree_counters
+from .models import Folder
+
+
+class FolderMoveError(Exception):
+    """Перенос папки невозможен (сообщение отдается клиенту)"""
+
+
+def rewrite_subtree_paths(structure_id, old_prefix, new_prefix):
+    """
+    Замена префикса materialized_path у всего поддерева одним UPDATE.
+
+    Поддерево выбирается по индексу materialized_path (LIKE 'prefix%').
+    Возвращает количество обновленных папок.
+    """
+    return Folder.objects.filter(
+        structure_id=structure_id,
+        materialized_path__startswith=old_prefix
+    ).update(
+        materialized_path=Concat(Value(new_prefix), Substr('materialized_path', len(old_prefix) + 1))
+    )
+
+
+def move_folder(folder_id, new_parent_id):
+    """
+    Перенос папки со всем поддеревом под нового родителя (None - в корень).
+
+    Выполняется в транзакции: меняется parent_id папки и одним запросом
+    переписываются пути всех потомков.
+    """
+    with transaction.atomic():
+        folder = Folder.objects.select_for_update().get(id=folder_id)
+        old_prefix = folder.materialized_path
+
+        if new_parent_id is None:
+            new_parent = None
+            new_prefix = f"/{folder.code}/"
+        else:
+            try:
+                new_parent = Folder.objects.select_for_update().get(id=new_parent_id)
+            except Folder.DoesNotExist:
+                raise FolderMoveError('Новая родительская папка не найдена')
+            if new_parent.structure_id != folder.structure_id:
+                raise FolderMoveError('Нельзя перенести папку в другую структуру')
+            if new_parent.id == folder.id or new_parent.materialized_path.startswith(old_prefix):
+                raise FolderMoveError('Нельзя перенести папку внутрь ее собственного поддерева')
+            new_prefix = f"{new_parent.materialized_path}{folder.code}/"
+
+        if new_parent_id == folder.parent_id and new_prefix == old_prefix:
+            return folder, 0
+
+        longest_path = Folder.objects.filter(
+            structure_id=folder.structure_id,
+            materialized_path__startswith=old_prefix
+        ).aggregate(longest=Max(Length('materialized_path')))['longest'] or 0
+        max_length = Folder._meta.get_field('materialized_path').max_length
+        if longest_path - len(old_prefix) + len(new_prefix) > max_length:
+            raise FolderMoveError('Путь папки после переноса превысит допустимую длину')
+
+        Folder.objects.filter(id=folder.id).update(parent_id=new_parent_id)
+        moved = rewrite_subtree_paths(folder.structure_id, old_prefix, new_prefix)
+        move_subtree_counters(folder, old_prefix, new_prefix, folder.parent_id, new_parent_id)
+
+        folder.parent = new_parent
+        folder.materialized_path = new_prefix
+        return folder, moved
@@ -0,0 +1,70 @@
+from django.db import connection
+from django.db.models import BooleanField, Case, FloatField, IntegerField, Q, Value, When
+from django.db.models.expressions import RawSQL
+
+
+# Максимум подсказок автодополнения
+AUTOCOMPLETE_LIMIT = 10
+AUTOCOMPLETE_MAX_LIMIT = 20
+
+# Выражения совпадают с индексами из миграций (UPPER(col::text) gin_trgm_ops),
+# icontains/istartswith Django на PostgreSQL строит такое же выражение
+_WORD_SIMILARITY = "word_similarity(UPPER(%s), UPPER({table}.{column}::text))"
+_WORD_SIMILAR = "UPPER(%s) <%% UPPER({table}.{column}::text)"
+
+
+def _column(model, field):
+    table = connection.ops.quote_name(model._meta.db_table)
+    column = connection.ops.quote_name(model._meta.get_field(field).column)
+    return table, column
+
+
+def _similarity_sql(model, fields, template):
+    return [template.format(table=table, column=column) for table, column in (_column(model, f) for f in fields)]
+
+
+def substring_search(qs, query, fields=('name', 'code')):
+    """
+    Поиск подстроки без учета регистра по нескольким полям.
+
+    На PostgreSQL icontains использует триграммные GIN индексы pg_trgm.
+    """
+    condition = Q()
+    for field in fields:
+        condition |= Q(**{f'{field}__icontains': query})
+    return qs.filter(condition)
+
+
+def autocomplete(qs, query, limit=AUTOCOMPLETE_LIMIT, fields=('name', 'code')):
+    """
+    Подсказки для поиска по мере ввода: сначала совпадения по префиксу,
+    затем нечеткие (PostgreSQL, word_similarity по триграммам).
+
+    Возвращает queryset с аннотациями prefix_match и similarity, обрезанный до limit.
+    """
+    prefix = Q()
+    for field in fields:
+        prefix |= Q(**{f'{field}__istartswith': query})
+
+    if connection.vendor == 'postgresql':
+        model = qs.model
+        similar = RawSQL(
+            ' OR '.join(_similarity_sql(model, fields, _WORD_SIMILAR)),
+            (query,) * len(fields),
+            output_field=BooleanField()
+        )
+        similarity = RawSQL(
+            f"GREATEST({', '.join(_similarity_sql(model, fields, _WORD_SIMILARITY))})",
+            (query,) * len(fields),
+            output_field=FloatField()
+        )
+        qs = qs.filter(prefix | Q(similar))
+    else:
+        # Без pg_trgm нечеткого поиска нет - только префикс и подстрока
+        similarity = Value(0.0, output_field=FloatField())
+        qs = substring_search(qs, query, fields)
+
+    return qs.annotate(
+        prefix_match=Case(When(prefix, then=Value(1)), default=Value(0), output_field=IntegerField()),
+        similarity=similarity
+    ).order_by('-prefix_match', '-similarity', 'name', 'id')[:limit]
@@ -0,0 +1,246 @@
+import codecs
+import hashlib
+import re
+import time
+import xml.etree.ElementTree as ET
+
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Length, Substr
+
+from .counters import update_folder_counts
+from .importer import BULK_BATCH_SIZE, extract_folder_attributes
+from .models import Folder
+
+
+# Кодировка по умолчанию для файлов без объявления и не в UTF-8
+FALLBACK_ENCODING = 'windows-1251'
+
+# Этапы трассировки импорта (document_manager.tracing) для таймингов stream_import_structure;
+# stream - один проход: хэш, разбор и запись папок пачками
+TRACE_STAGES = {'stream_ms': 'stream', 'resolve_parents_ms': 'folder_resolution', 'counters_ms': 'db_write'}
+
+# Контейнеры папок верхнего уровня (как в find_root_folder_elements)
+ROOT_CONTAINERS = ('folders', 'structure')
+ROOT_SLOT = ('', '/')
+
+_XML_DECLARATION_RE = re.compile(rb'^<\?xml[^>]*\?>')
+_BOMS = (codecs.BOM_UTF8, codecs.BOM_UTF16_LE, codecs.BOM_UTF16_BE)
+
+
+class XmlChunkDecoder:
+    """
+    Подготовка кусков файла для XMLPullParser.feed.
+
+    Если кодировка задана BOM или объявлением <?xml encoding=...?>, куски
+    передаются как есть - ее определяет сам expat. Иначе файл декодируется
+    здесь: как UTF-8, а на первом невалидном байте - как FALLBACK_ENCODING
+    (так же, как decode_xml_content при обычной загрузке). Переключение
+    возможно, пока парсеру передавался только ASCII (он одинаков в обеих
+    кодировках); иначе - ET.ParseError, и импорт откатывается.
+    """
+
+    def __init__(self):
+        self.first = True
+        self.decoder = None
+        self.encoding = 'utf-8'
+        self.non_ascii_sent = False
+
+    def decode(self, chunk, final=False):
+        if self.first:
+            self.first = False
+            declaration = _XML_DECLARATION_RE.match(chunk)
+            if chunk.startswith(_BOMS) or (declaration and b'encoding' in declaration.group(0)):
+                return chunk
+            self.decoder = codecs.getincrementaldecoder('utf-8')()
+        if self.decoder is None:
+            return chunk
+
+        pending = self.decoder.getstate()[0]
+        try:
+            text = self.decoder.decode(chunk, final)
+        except UnicodeDecodeError:
+            if self.encoding != 'utf-8' or self.non_ascii_sent:
+                raise ET.ParseError(
+                    f'Кодировка не объявлена, а файл не в UTF-8 и не в {FALLBACK_ENCODING} целиком; '
+                    f'укажите encoding в <?xml ...?>'
+                )
+            self.encoding = FALLBACK_ENCODING
+            self.decoder = codecs.getincrementaldecoder(FALLBACK_ENCODING)()
+            return self.decode(pending + chunk, final)
+        if not self.non_ascii_sent and not text.isascii():
+            self.non_ascii_sent = True
+        return text
+
+    def close(self):
+        """Остаток буфера декодера (неполный символ в конце файла - ошибка)"""
+        return self.decode(b'', final=True)
+
+
+class StreamingFolderWriter:
+    """
+    Запись папок пачками по мере разбора XML.
+
+    Папки приходят в порядке закрытия тегов (дети раньше родителей), поэтому
+    вставляются без parent_id. Родители проставляются в конце одним UPDATE:
+    путь родителя - это materialized_path без последнего сегмента.
+    """
+
+    def __init__(self, structure, batch_size=BULK_BATCH_SIZE):
+        self.structure = structure
+        self.batch_size = batch_size
+        self.buffer = []
+        self.folders_written = 0
+
+    def add(self, code, name, materialized_path, attributes):
+        self.buffer.append(Folder(
+            structure=self.structure,
+            code=code,
+            name=name,
+            materialized_path=materialized_path,
+            attributes=attributes,
+        ))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            Folder.objects.bulk_create(self.buffer, batch_size=self.batch_size)
+            self.folders_written += len(self.buffer)
+            self.buffer = []
+
+    def resolve_parents(self):
+        parent_path = Substr(
+            OuterRef('materialized_path'), 1,
+            Length(OuterRef('materialized_path')) - Length(OuterRef('code')) - 1
+        )
+        parents = Folder.objects.filter(
+            structure_id=OuterRef('structure_id'),
+            materialized_path=parent_path
+        ).values('id')[:1]
+        Folder.objects.filter(structure=self.structure).update(parent_id=Subquery(parents))
+
+    def close(self):
+        self.flush()
+        self.resolve_parents()
+        return self.folders_written
+
+
+def stream_import_structure(chunks, structure, sink=None):
+    """
+    Потоковый импорт папок структуры из кусков файла.
+
+    За один проход: SHA-256 хэш, запись в sink (файл на диске) и разбор
+    XMLPullParser. Завершенные <folder> сразу передаются в StreamingFolderWriter
+    и удаляются из дерева, поэтому память не зависит от размера файла.
+
+    Папками считаются те же <folder>, что и при обычной загрузке: в корне,
+    в первых <folders> и <structure>, внутри папок и через один
+    промежуточный тег. Остальные <folder> пропускаются.
+
+    В отличие от import_folder_tree, повторяющийся код папки - ошибка:
+    обычная загрузка объединяет такие папки с первой в порядке обхода
+    в ширину, а при разборе потоком этот порядок заранее неизвестен.
+
+    Возвращает (количество папок, ошибки, хэш, имя структуры, тайминги в мс).
+    """
+    timings = {}
+    errors = []
+    hasher = hashlib.sha256()
+    parser = ET.XMLPullParser(events=('start', 'end'))
+    writer = StreamingFolderWriter(structure)
+
+    elements = []      # открытые элементы
+    # Для каждого открытого элемента: (родитель вложенных <folder> - (код, путь) или None,
+    # элемент - папка, сохранить до закрытия папки - нужен extract_folder_attributes)
+    frames = []
+    containers_seen = set()
+    seen_codes = set()
+    root_tag = None
+    struct_name = None
+
+    def start_frame(elem):
+        """Те же правила, что у find_root_folder_elements и _child_folder_elements"""
+        if not frames:
+            return ROOT_SLOT, False, False
+        parent_slot, parent_is_folder, parent_keep = frames[-1]
+
+        if elem.tag == 'folder':
+            if parent_slot is None:
+                # Папка вне контейнеров обычного импорта - как любой другой тег
+                return None, False, parent_keep
+            folder_name = elem.get('name', '')
+            folder_code = elem.get('code', '')
+            if not folder_code:
+                errors.append(f"Папка '{folder_name}' не имеет кода (атрибут 'code')")
+                return None, True, False
+            if folder_code in seen_codes:
+                errors.append(
+                    f"Повторяющийся код папки '{folder_code}' "
+                    f"(в потоковом режиме папки с одинаковым кодом не объединяются)"
+                )
+                return None, True, False
+            seen_codes.add(folder_code)
+            return (folder_code, f"{parent_slot[1]}{folder_code}/"), True, False
+
+        if len(frames) == 1 and elem.tag in ROOT_CONTAINERS and elem.tag not in containers_seen:
+            # Как root.find(): учитывается только первый <folders> и первый <structure>
+            containers_seen.add(elem.tag)
+            return ROOT_SLOT, False, False
+        if parent_is_folder and parent_slot is not None:
+            # Промежуточный тег внутри папки: его <folder> - дети этой папки
+            return parent_slot, False, elem.tag in ('attribute', 'attributes')
+        return None, False, parent_keep
+
+    def handle_events():
+        nonlocal root_tag, struct_name
+        for event, elem in parser.read_events():
+            if event == 'start':
+                if not elements:
+                    root_tag = elem.tag
+                    if root_tag != 'organization':
+                        struct_name = elem.get('name')
+                elif len(elements) == 1 and elem.tag == 'structure' and struct_name is None:
+                    struct_name = elem.get('name')
+                frames.append(start_frame(elem))
+                elements.append(elem)
+                continue
+
+            elements.pop()
+            slot, is_folder, keep = frames.pop()
+            if is_folder:
+                if slot is not None and not errors:
+                    writer.add(slot[0], elem.get('name', ''), slot[1], extract_folder_attributes(elem))
+            elif keep:
+                # Атрибуты папки нужны до ее закрытия
+                continue
+
+            # Освобождаем память: очищаем элемент и убираем его из родителя
+            elem.clear()
+            if elements and len(elements[-1]) and elements[-1][-1] is elem:
+                del elements[-1][-1]
+
+    started = time.perf_counter()
+    decoder = XmlChunkDecoder()
+    for chunk in chunks:
+        hasher.update(chunk)
+        if sink is not None:
+            sink.write(chunk)
+        parser.feed(decoder.decode(chunk))
+        handle_events()
+    parser.feed(decoder.close())
+    parser.close()
+    handle_events()
+    timings['stream_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    if errors:
+        return 0, errors, hasher.hexdigest(), struct_name, timings
+
+    started = time.perf_counter()
+    folders_written = writer.close()
+    timings['resolve_parents_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    started = time.perf_counter()
+    update_folder_counts(structure.id)
+    timings['counters_ms'] = round((time.perf_counter() - started) * 1000, 2)
+
+    return folders_written, errors, hasher.hexdigest(), struct_name, timings
@@ -1,3 +1,845 @@
-from django.test import TestCase
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from unittest import mock
+import xml.etree.ElementTree as ET
 
-# Create your tests here.
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.http import Http404
+from django.test import AsyncRequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from documents import async_views as document_async_views
+from documents.models import Document, FolderDocument
+from import_logs.jobs import claim_next_job, finish_job, run_job
+from import_logs.models import ImportLog
+from . import async_views as structure_async_views
+from .caching import cache_enabled
+from .consistency import check_structure_consistency, start_background_check
+from .counters import recalculate_structure_counters
+from .importer import (
+    apply_folder_diff, diff_folder_tree, import_folder_tree, parse_folder_tree, summarize_folder_diff
+)
+from .models import Folder, Structure
+from .moves import FolderMoveError, move_folder
+from .streaming import stream_import_structure
+from .tree import _tree_rows
+
+
+TREE_XML = """
+<organization>
+  <structure name="Тест">
+    <folder code="A" name="Договоры">
+      <folder code="A1" name="2024">
+        <folder code="A11" name="Январь"/>
+      </folder>
+      <folder code="A2" name="2023"/>
+    </folder>
+    <folder code="B" name="Отчеты" type="основные"/>
+  </structure>
+</organization>
+"""
+
+
+def import_structure(xml=TREE_XML, name='Тест'):
+    structure = Structure.objects.create(name=name)
+    _, errors, _ = import_folder_tree(structure, ET.fromstring(xml))
+    assert not errors, errors
+    recalculate_structure_counters(structure.id)
+    return structure
+
+
+def folders_by_code(structure):
+    return {folder.code: folder for folder in Folder.objects.filter(structure=structure)}
+
+
+def folder_tree(structure):
+    """Дерево структуры для сравнения: {(код, путь, код родителя): атрибуты}"""
+    return {
+        (code, path, parent_code): attributes
+        for code, path, parent_code, attributes in Folder.objects.filter(structure=structure).values_list(
+            'code', 'materialized_path', 'parent__code', 'attributes'
+        )
+    }
+
+
+class StreamingImportTest(TestCase):
+    def stream(self, content, chunk_size=64):
+        chunks = [content[i:i + chunk_size] for i in range(0, len(content), chunk_size)]
+        structure = Structure.objects.create(name='поток')
+        return structure, stream_import_structure(chunks, structure)
+
+    def assertSameAsDefaultImport(self, xml):
+        structure, (count, errors, _, _, _) = self.stream(xml.encode())
+        self.assertEqual(errors, [])
+        expected = folder_tree(import_structure(xml))
+        self.assertEqual(folder_tree(structure), expected)
+        self.assertEqual(count, len(expected))
+        return structure
+
+    def test_same_tree_as_default_import(self):
+        structure, (count, errors, _, name, _) = self.stream(TREE_XML.encode())
+        self.assertEqual((count, errors, name), (5, [], 'Тест'))
+        self.assertSameAsDefaultImport(TREE_XML)
+
+    def test_container_rules(self):
+        # Папки вне контейнеров и глубже одного промежуточного тега не импортируются
+        structure = self.assertSameAsDefaultImport("""
+        <organization>
+          <structure name="Тест">
+            <folder code="A" name="Договоры" type="основные">
+              <group>
+                <folder code="A1" name="2024"><folder code="A11" name="Январь"/></folder>
+              </group>
+              <group><wrap><folder code="X" name="Слишком глубоко"/></wrap></group>
+              <attributes><owner>Иванов</owner></attributes>
+              <attribute name="отдел">Продажи</attribute>
+            </folder>
+          </structure>
+          <folders><folder code="B" name="Отчеты"/></folders>
+          <folders><folder code="C" name="Второй контейнер"/></folders>
+          <archive><folder code="Z" name="Вне контейнера"/></archive>
+        </organization>
+        """)
+        folders = folders_by_code(structure)
+        self.assertEqual(set(folders), {'A', 'A1', 'A11', 'B'})
+        self.assertEqual(folders['A'].attributes, {'type': 'основные', 'owner': 'Иванов', 'отдел': 'Продажи'})
+
+    def test_root_folders(self):
+        self.assertSameAsDefaultImport(
+            '<structure name="S"><folder code="A" name="1"><folder code="B" name="2"/></folder></structure>'
+        )
+
+    def test_undeclared_cp1251_after_ascii_start(self):
+        content = '<structure name="S"><!--' + 'x' * 500 + '--><folder code="A" name="Папка"/></structure>'
+        structure, (count, errors, _, _, _) = self.stream(content.encode('cp1251'))
+        self.assertEqual((count, errors), (1, []))
+        self.assertEqual(Folder.objects.get(structure=structure).name, 'Папка')
+
+    def test_mixed_encodings_rejected(self):
+        content = '<structure name="Смесь"><!--'.encode() + (
+            'x' * 500 + '--><folder code="A" name="Папка"/></structure>'
+        ).encode('cp1251')
+        with self.assertRaises(ET.ParseError), transaction.atomic():
+            self.stream(content)
+
+    def test_duplicate_codes_rejected(self):
+        content = b'<structure><folder code="A" name="1"/><folder code="A" name="2"/></structure>'
+        _, (count, errors, _, _, _) = self.stream(content)
+        self.assertEqual(count, 0)
+        self.assertEqual(len(errors), 1)
+
+
+# Коды с '-' и общим префиксом: при сортировке по пути как есть '/A-B/' шел бы раньше '/A/'
+ORDER_XML = """
+<structure name="Порядок">
+  <folder code="AB" name="Без дефиса"/>
+  <folder code="A-B" name="С дефисом"><folder code="C" name="Внутри"/></folder>
+  <folder code="A" name="Корень">
+    <folder code="A2" name="Второй"/>
+    <folder code="A1" name="Первый"><folder code="A11" name="Вложенный"/></folder>
+  </folder>
+</structure>
+"""
+
+
+def response_json(response):
+    if response.streaming:
+        return json.loads(b''.join(response.streaming_content))
+    return response.json()
+
+
+def tree_codes(nodes):
+    """Дерево из ответа API как вложенные списки (код, дети)"""
+    return [(node['code'], tree_codes(node['children'])) for node in nodes]
+
+
+class FolderTreeViewTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.structure = import_structure(ORDER_XML)
+        self.folders = folders_by_code(self.structure)
+        self.url = f'/api/structures/{self.structure.id}/folders/'
+
+    def get_tree(self, **params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, 200)
+        return response_json(response)['tree']
+
+    def test_full_tree_depth_first_by_code(self):
+        self.assertEqual(tree_codes(self.get_tree()), [
+            ('A', [('A1', [('A11', [])]), ('A2', [])]),
+            ('A-B', [('C', [])]),
+            ('AB', []),
+        ])
+
+    def test_subtree(self):
+        tree = self.get_tree(parent_id=self.folders['A'].id)
+        self.assertEqual(tree_codes(tree), [('A1', [('A11', [])]), ('A2', [])])
+        self.assertEqual(self.get_tree(parent_id=self.folders['AB'].id), [])
+
+    def test_depth(self):
+        roots = self.get_tree(depth=1)
+        self.assertEqual(tree_codes(roots), [('A', []), ('A-B', []), ('AB', [])])
+        self.assertEqual([node['has_children'] for node in roots], [True, True, False])
+
+        tree = self.get_tree(parent_id=self.folders['A'].id, depth=2)
+        self.assertEqual(tree_codes(tree), [('A1', [('A11', [])]), ('A2', [])])
+
+    def test_invalid_params(self):
+        for params in ({'parent_id': 'abc'}, {'depth': 'x'}, {'depth': '0'}, {'depth': '-1'}):
+            self.assertEqual(self.client.get(self.url, params).status_code, 400, params)
+
+    def test_parent_from_other_structure(self):
+        other = import_structure(TREE_XML)
+        parent_id = Folder.objects.get(structure=other, code='A').id
+        self.assertEqual(self.client.get(self.url, {'parent_id': parent_id}).status_code, 404)
+        self.assertEqual(self.client.get('/api/structures/999999/folders/').status_code, 404)
+
+    def test_streamed_tree_matches_levels(self):
+        # Несколько уровней, коды с '-' и общими префиксами, документы в глубине
+        parents = list(self.folders.values())
+        for level in range(3):
+            created = []
+            for parent in parents:
+                for code in (f'{parent.code}-{level}', f'{parent.code}_{level}', f'{parent.code}.{level}'):
+                    created.append(Folder.objects.create(
+                        structure=self.structure, parent=parent, code=code, name=code,
+                        materialized_path=f'{parent.materialized_path}{code}/'
+                    ))
+            parents = created[::2]
+        for folder in parents[:5]:
+            attach(folder, f'doc-{folder.id}')
+        recalculate_structure_counters(self.structure.id)
+        self.assertTrue(check_structure_consistency(self.structure)['is_consistent'])
+
+        with mock.patch('structures.tree.STREAM_BUFFER_SIZE', 256):
+            response = self.client.get(self.url)
+            self.assertTrue(response.streaming)
+            streamed = response_json(response)['tree']
+            levels = self.get_tree(depth=100)
+            self.assertEqual(streamed, levels)
+            self.assertGreater(len(json.dumps(streamed)), 256 * 10)
+
+            parent_id = self.folders['A'].id
+            self.assertEqual(self.get_tree(parent_id=parent_id), self.get_tree(parent_id=parent_id, depth=100))
+
+    @unittest.skipUnless(connection.vendor == 'sqlite', 'на маленькой таблице PostgreSQL выберет Seq Scan')
+    def test_tree_order_uses_index(self):
+        for parent in (None, self.folders['A']):
+            sql, params = _tree_rows(self.structure.id, parent).query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+                plan = ' '.join(str(row) for row in cursor.fetchall())
+            self.assertIn('structures_folder_tree_order_idx', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+FILE_CACHE = 'django.core.cache.backends.filebased.FileBasedCache'
+
+# Сброс версии после коммита - как это сделал бы другой воркер или run_import_worker
+BUMP_SCRIPT = """
+import django
+django.setup()
+from structures.caching import _bump_versions
+_bump_versions({structure_id})
+"""
+
+
+class StructureCacheTest(TestCase):
+    """Кэш ответов и ETag с общим для процессов бэкендом (файловый кэш)"""
+
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_location = cache_dir.name
+        overrider = override_settings(CACHES={'default': {'BACKEND': FILE_CACHE, 'LOCATION': self.cache_location}})
+        overrider.enable()
+        self.addCleanup(overrider.disable)
+
+        self.structure = import_structure()
+        self.folders = folders_by_code(self.structure)
+        self.url = f'/api/structures/{self.structure.id}/folders/'
+
+    def get(self, url, etag=None):
+        headers = {'If-None-Match': etag} if etag else {}
+        response = self.client.get(url, headers=headers)
+        response.body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response
+
+    def bump_in_other_process(self):
+        env = {**os.environ, 'CACHE_BACKEND': FILE_CACHE, 'CACHE_LOCATION': self.cache_location}
+        subprocess.run(
+            [sys.executable, '-c', BUMP_SCRIPT.format(structure_id=self.structure.id)],
+            env=env, cwd=settings.BASE_DIR, check=True
+        )
+
+    def test_etag(self):
+        self.assertTrue(cache_enabled())
+        response = self.get(self.url)
+        etag = response['ETag']
+        self.assertTrue(etag)
+
+        self.assertEqual(self.get(self.url, etag).status_code, 304)
+        cached = self.get(self.url)
+        self.assertEqual(cached['ETag'], etag)
+        self.assertEqual(json.loads(cached.body), json.loads(response.body))
+
+    def test_async_views_share_cache(self):
+        # Async представление отдает закэшированный синхронным ответ с тем же ETag
+        etag = self.get(self.url)['ETag']
+        request = AsyncRequestFactory().get(self.url, headers={'If-None-Match': etag})
+        response = async_to_sync(structure_async_views.get_folder_tree)(request, structure_id=self.structure.id)
+        self.assertEqual(response.status_code, 304)
+
+        status, data = async_to_sync(async_response_json)(
+            structure_async_views.get_folder_tree, self.url, structure_id=self.structure.id
+        )
+        self.assertEqual((status, data), (200, json.loads(self.get(self.url).body)))
+
+    def test_move_invalidates_tree_and_etag(self):
+        etag = self.get(self.url)['ETag']
+        details_etag = self.get(f'/api/structures/{self.structure.id}/')['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(
+                f"/api/structures/folders/{self.folders['A1'].id}/move/",
+                {'parent_id': self.folders['B'].id}, content_type='application/json'
+            )
+        self.assertEqual(response.status_code, 200)
+
+        response = self.get(self.url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(tree_codes(json.loads(response.body)['tree']), [
+            ('A', [('A2', [])]),
+            ('B', [('A1', [('A11', [])])]),
+        ])
+        self.assertEqual(self.get(f'/api/structures/{self.structure.id}/', details_etag).status_code, 200)
+
+    def test_delete_invalidates_details(self):
+        url = f'/api/structures/{self.structure.id}/'
+        self.assertEqual(self.get(url).status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.client.delete(f'{url}delete/').status_code, 200)
+        self.assertEqual(self.get(url).status_code, 404)
+        self.assertEqual(self.get(self.url).status_code, 404)
+
+    def test_bump_from_other_process(self):
+        etag = self.get(self.url)['ETag']
+        # Изменение без сброса версии: ответ остается из кэша
+        Folder.objects.filter(id=self.folders['B'].id).update(name='Переименована')
+        response = self.get(self.url, etag)
+        self.assertEqual(response.status_code, 304)
+
+        self.bump_in_other_process()
+        response = self.get(self.url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        names = {node['code']: node['name'] for node in json.loads(response.body)['tree']}
+        self.assertEqual(names['B'], 'Переименована')
+
+
+class LocalCacheTest(TestCase):
+    """С LocMemCache (у каждого процесса свой) ответы не кэшируются"""
+
+    def test_locmem_disables_response_cache(self):
+        self.assertFalse(cache_enabled())
+        structure = import_structure()
+        url = f'/api/structures/{structure.id}/'
+
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('ETag', response)
+
+        Structure.objects.filter(id=structure.id).update(name='Переименована')
+        self.assertEqual(self.client.get(url).json()['structure']['name'], 'Переименована')
+
+
+class ConsistencyCheckTest(TestCase):
+    def test_consistent(self):
+        report = check_structure_consistency(import_structure())
+        self.assertEqual((report['total_folders'], report['issues_found']), (5, 0))
+        self.assertTrue(report['is_consistent'])
+
+    def test_issues(self):
+        structure = import_structure()
+        folders = folders_by_code(structure)
+        Folder.objects.filter(id=folders['A2'].id).update(materialized_path='/B/A2/')
+        # Цикл A -> A11 -> A1 -> A и родитель из другой структуры
+        Folder.objects.filter(id=folders['A'].id).update(parent_id=folders['A11'].id)
+        other = Folder.objects.get(structure=import_structure(name='Другая'), code='B')
+        Folder.objects.filter(id=folders['B'].id).update(parent_id=other.id)
+
+        issues = self.client.get(f'/api/structures/{structure.id}/consistency-check/').json()['issues']
+        self.assertEqual(len([issue for issue in issues if 'цикл' in issue]), 3)
+        self.assertTrue(any('отсутствующего родителя' in issue for issue in issues))
+        self.assertTrue(any('ожидалось /A/A2/, фактически /B/A2/' in issue for issue in issues))
+
+
+class ConsistencyReportTest(TransactionTestCase):
+    """run_job закрывает соединение, поэтому без обертки в транзакцию"""
+
+    def test_background_check_through_job_queue(self):
+        structure = import_structure()
+        response = self.client.get(f'/api/structures/{structure.id}/consistency-check/?background=true')
+        self.assertEqual(response.status_code, 202)
+        report_url = response.json()['report_url']
+
+        self.assertEqual(self.client.get(report_url).status_code, 202)
+        self.assertEqual(run_job(claim_next_job('test')), 'SUCCEEDED')
+
+        report = self.client.get(report_url).json()
+        self.assertTrue(report['is_consistent'])
+        self.assertEqual(report['total_folders'], 5)
+
+    def test_failed_check_report(self):
+        structure = import_structure()
+        log = start_background_check(structure)
+        self.assertEqual(claim_next_job('test'), log.id)
+        self.assertTrue(finish_job(log.id, 'FAILED', 'Превышено время выполнения задачи'))
+
+        response = self.client.get(f'/api/structures/{structure.id}/consistency-check/{log.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['status'], 'FAILED')
+        self.assertEqual(response.json()['error'], 'Превышено время выполнения задачи')
+
+    def test_report_of_other_structure(self):
+        log = start_background_check(import_structure())
+        other = import_structure(name='Другая')
+        response = self.client.get(f'/api/structures/{other.id}/consistency-check/{log.id}/')
+        self.assertEqual(response.status_code, 404)
+
+
+REIMPORT_XML = """
+<organization>
+  <structure name="Тест">
+    <folder code="A" name="Договоры">
+      <folder code="A2" name="2023 (архив)"/>
+    </folder>
+    <folder code="B" name="Отчеты" type="служебные">
+      <folder code="A1" name="2024">
+        <folder code="A11" name="Январь"/>
+      </folder>
+    </folder>
+    <folder code="C" name="Новая"/>
+  </structure>
+</organization>
+"""
+
+
+def attach(folder, code):
+    document = Document.objects.create(code=code, name=code, file_path='x')
+    FolderDocument.objects.create(folder=folder, document=document)
+    return document
+
+
+class CountersTest(TestCase):
+    """Счетчики, поддерживаемые приращениями, совпадают с полным пересчетом"""
+
+    def setUp(self):
+        self.structure = import_structure()
+
+    def counters(self):
+        structure = Structure.objects.get(id=self.structure.id)
+        folders = {
+            code: (folder.documents_count, folder.subtree_documents_count, folder.children_count)
+            for code, folder in folders_by_code(self.structure).items()
+        }
+        return folders, (structure.folders_count, structure.root_folders_count, structure.documents_count)
+
+    def assertMatchesRecalculation(self):
+        incremental = self.counters()
+        recalculate_structure_counters(self.structure.id)
+        self.assertEqual(incremental, self.counters())
+
+    def test_import(self):
+        folders, structure = self.counters()
+        self.assertEqual(structure, (5, 2, 0))
+        self.assertEqual(folders['A'], (0, 0, 2))
+        self.assertEqual(folders['A1'], (0, 0, 1))
+
+    def test_upload(self):
+        folders = folders_by_code(self.structure)
+        attach(folders['A11'], 'D1')
+        attach(folders['A11'], 'D2')
+        attach(folders['A2'], 'D3')
+
+        folders, structure = self.counters()
+        self.assertEqual(folders['A11'], (2, 2, 0))
+        self.assertEqual(folders['A1'], (0, 2, 1))
+        self.assertEqual(folders['A'], (0, 3, 2))
+        self.assertEqual(folders['B'], (0, 0, 0))
+        self.assertEqual(structure[2], 3)
+        self.assertMatchesRecalculation()
+
+    def test_move(self):
+        folders = folders_by_code(self.structure)
+        attach(folders['A11'], 'D1')
+        attach(folders['A1'], 'D2')
+
+        folder, moved = move_folder(folders['A1'].id, folders['B'].id)
+        self.assertEqual(moved, 2)
+        self.assertEqual(folder.materialized_path, '/B/A1/')
+        self.assertEqual(Folder.objects.get(id=folders['A11'].id).materialized_path, '/B/A1/A11/')
+
+        counters, _ = self.counters()
+        self.assertEqual(counters['A'], (0, 0, 1))
+        self.assertEqual(counters['B'], (0, 2, 1))
+        self.assertMatchesRecalculation()
+
+        move_folder(folders['A11'].id, None)
+        counters, structure = self.counters()
+        self.assertEqual(counters['B'], (0, 1, 1))
+        self.assertEqual(structure[1], 3)
+        self.assertMatchesRecalculation()
+
+    def test_move_into_own_subtree(self):
+        folders = folders_by_code(self.structure)
+        with self.assertRaises(FolderMoveError):
+            move_folder(folders['A'].id, folders['A11'].id)
+
+    def test_delete(self):
+        folders = folders_by_code(self.structure)
+        document = attach(folders['A11'], 'D1')
+        attach(folders['A2'], 'D2')
+        attach(folders['B'], 'D3')
+
+        document.delete()
+        FolderDocument.objects.filter(folder=folders['B']).delete()
+
+        counters, structure = self.counters()
+        self.assertEqual(counters['A'], (0, 1, 2))
+        self.assertEqual(counters['A11'], (0, 0, 0))
+        self.assertEqual(counters['B'], (0, 0, 0))
+        self.assertEqual(structure[2], 1)
+        self.assertMatchesRecalculation()
+
+    def test_delete_adjusts_once(self):
+        # Документ в нескольких папках и удаление набором: одно чтение папок на операцию
+        folders = folders_by_code(self.structure)
+        document = attach(folders['A11'], 'D1')
+        for code in ('A2', 'B'):
+            FolderDocument.objects.create(folder=folders[code], document=document)
+        for code in ('A1', 'B'):
+            attach(folders[code], f'{code}-doc')
+
+        for delete in (document.delete, Document.objects.filter(code__endswith='-doc').delete):
+            with CaptureQueriesContext(connection) as queries:
+                delete()
+            folder_reads = [
+                query['sql'] for query in queries
+                if query['sql'].startswith('SELECT') and 'FROM "structures_folder"' in query['sql']
+            ]
+            self.assertEqual(len(folder_reads), 1, folder_reads)
+
+        folders, structure = self.counters()
+        self.assertEqual(structure[2], 0)
+        self.assertEqual(folders['A'], (0, 0, 2))
+        self.assertMatchesRecalculation()
+
+    def test_failed_delete_keeps_counters(self):
+        folders = folders_by_code(self.structure)
+        attach(folders['A11'], 'D1')
+        before = self.counters()
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                Document.objects.all().delete()
+                raise RuntimeError
+        self.assertEqual(self.counters(), before)
+
+
+class ReimportDiffTest(TestCase):
+    def test_classification(self):
+        structure = import_structure()
+        levels, errors = parse_folder_tree(ET.fromstring(REIMPORT_XML))
+        self.assertEqual(errors, [])
+        diff = diff_folder_tree(structure, levels)
+        summary = summarize_folder_diff(diff)
+
+        self.assertEqual(summary['counts'], {
+            'added': 1, 'removed': 0, 'renamed': 1, 'moved': 1, 'attributes_changed': 1, 'unchanged': 1
+        })
+        self.assertEqual(summary['added'], ['C'])
+        self.assertEqual(summary['renamed'], ['A2'])
+        self.assertEqual(summary['moved'], ['A1'])
+        self.assertEqual(summary['attributes_changed'], ['B'])
+        # A11 не менялась, но ее путь изменился вместе с A1
+        self.assertIn('A11', [node.code for node in diff['changed']])
+
+        apply_folder_diff(structure, levels, diff)
+        folders = folders_by_code(structure)
+        self.assertEqual(folders['A11'].materialized_path, '/B/A1/A11/')
+        self.assertEqual(folders['A2'].name, '2023 (архив)')
+        self.assertEqual(folders['B'].children_count, 1)
+        self.assertEqual(Structure.objects.get(id=structure.id).folders_count, 6)
+
+    def test_removed(self):
+        structure = import_structure()
+        levels, _ = parse_folder_tree(ET.fromstring(
+            '<structure><folder code="A" name="Договоры"/><folder code="B" name="Отчеты" type="основные"/></structure>'
+        ))
+        diff = diff_folder_tree(structure, levels)
+        removed = set(Folder.objects.filter(id__in=diff['removed']).values_list('code', flat=True))
+        self.assertEqual(removed, {'A1', 'A11', 'A2'})
+        self.assertEqual(diff['unchanged'], 2)
+
+    def test_endpoint_keeps_folder_ids_and_documents(self):
+        structure = import_structure()
+        before = folders_by_code(structure)
+        attach(before['A11'], 'D1')
+        url = f'/api/structures/{structure.id}/reimport/'
+
+        def upload(**data):
+            return self.client.post(url, {'file': SimpleUploadedFile('new.xml', REIMPORT_XML.encode()), **data})
+
+        response = upload(dry_run='true')
+        self.assertEqual(response.json()['diff']['counts']['added'], 1)
+        self.assertNotIn('C', folders_by_code(structure))
+
+        response = upload()
+        self.assertEqual(response.status_code, 200)
+        after = folders_by_code(structure)
+        self.assertEqual({code: folder.id for code, folder in after.items() if code != 'C'},
+                         {code: folder.id for code, folder in before.items()})
+        self.assertEqual(after['B'].subtree_documents_count, 1)
+        self.assertEqual(FolderDocument.objects.get().folder_id, before['A11'].id)
+
+        # Тот же файл повторно - без изменений
+        self.assertTrue(upload().json()['unchanged'])
+
+
+class MoveFolderViewTest(TestCase):
+    def setUp(self):
+        self.structure = import_structure()
+        self.folders = folders_by_code(self.structure)
+
+    def move(self, code, body):
+        url = f'/api/structures/folders/{self.folders[code].id}/move/' if code else '/api/structures/folders/999999/move/'
+        data = body if isinstance(body, str) else json.dumps(body)
+        return self.client.post(url, data, content_type='application/json')
+
+    def test_move_and_back_to_root(self):
+        response = self.move('A1', {'parent_id': self.folders['B'].id})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['folders_updated'], 2)
+        self.assertEqual(response.json()['folder']['materialized_path'], '/B/A1/')
+
+        response = self.move('A1', {'parent_id': None})
+        self.assertEqual(response.json()['folder']['materialized_path'], '/A1/')
+        self.assertEqual(Folder.objects.get(id=self.folders['A11'].id).materialized_path, '/A1/A11/')
+        self.assertTrue(check_structure_consistency(self.structure)['is_consistent'])
+
+    def test_same_parent_is_noop(self):
+        response = self.move('A1', {'parent_id': self.folders['A'].id})
+        self.assertEqual(response.json()['folders_updated'], 0)
+
+    def test_guards(self):
+        other = Folder.objects.get(structure=import_structure(name='Другая'), code='B')
+        cases = [
+            ('A', '{', 400),
+            ('A', {}, 400),
+            ('A', {'parent_id': 'abc'}, 400),
+            (None, {'parent_id': None}, 404),
+            ('A', {'parent_id': 999999}, 400),
+            ('A', {'parent_id': other.id}, 400),
+            ('A', {'parent_id': self.folders['A'].id}, 400),
+            ('A', {'parent_id': self.folders['A11'].id}, 400),
+        ]
+        for code, body, status in cases:
+            self.assertEqual(self.move(code, body).status_code, status, body)
+        self.assertEqual(self.client.get(f"/api/structures/folders/{self.folders['A'].id}/move/").status_code, 405)
+        self.assertTrue(check_structure_consistency(self.structure)['is_consistent'])
+
+    def test_path_length_limit(self):
+        parent = None
+        for letter in 'XYZ':
+            parent = Folder.objects.create(structure=self.structure, code=letter * 250, name=letter, parent=parent)
+        subtree = Folder.objects.create(structure=self.structure, code='S' * 250, name='S')
+        Folder.objects.create(structure=self.structure, code='T' * 250, name='T', parent=subtree)
+        self.folders['S'] = subtree
+
+        response = self.move('S', {'parent_id': parent.id})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(Folder.objects.get(id=subtree.id).materialized_path, f"/{'S' * 250}/")
+
+
+class AutocompleteTest(TestCase):
+    def setUp(self):
+        self.structure = import_structure()
+        self.other = import_structure(name='Другая')
+        # Совпадение по префиксу выше подстроки, хотя по имени идет позже
+        Document.objects.create(code='A1-DOC', name='Яблоко', file_path='x')
+        Document.objects.create(code='ZA1', name='Арбуз', file_path='x')
+
+    def get(self, **params):
+        return self.client.get('/api/structures/autocomplete/', params)
+
+    def test_prefix_before_substring(self):
+        data = self.get(q='a1').json()
+        self.assertEqual([document['code'] for document in data['documents']], ['A1-DOC', 'ZA1'])
+        self.assertEqual({folder['code'] for folder in data['folders']}, {'A1', 'A11'})
+        self.assertEqual(len(data['folders']), 4)
+
+    def test_structure_and_limit(self):
+        data = self.get(q='A1', structure_id=self.structure.id, limit=1).json()
+        self.assertEqual(len(data['folders']), 1)
+        self.assertEqual(data['folders'][0]['structure_id'], self.structure.id)
+        self.assertEqual(len(data['documents']), 1)
+
+        Document.objects.bulk_create(Document(code=f'A-{i}', name=str(i), file_path='x') for i in range(30))
+        self.assertEqual(len(self.get(q='A').json()['documents']), 10)
+        self.assertEqual(len(self.get(q='A', limit=1000).json()['documents']), 20)
+
+    def test_invalid_params(self):
+        for params in ({}, {'q': ' '}, {'q': 'A', 'limit': 'x'}, {'q': 'A', 'limit': 0},
+                       {'q': 'A', 'structure_id': 'x'}):
+            self.assertEqual(self.get(**params).status_code, 400, params)
+
+    def test_substring_search(self):
+        response = self.client.get('/api/structures/search/', {'q': 'a1'})
+        data = response.json()
+        self.assertEqual(len(data['folders']), 4)
+        self.assertEqual({document['code'] for document in data['documents']}, {'A1-DOC', 'ZA1'})
+        self.assertEqual(self.client.get('/api/structures/search/').status_code, 400)
+
+
+class ExportTest(TestCase):
+    def setUp(self):
+        self.structure = import_structure()
+        folders = folders_by_code(self.structure)
+        # Атрибуты, которые нельзя записать атрибутом элемента, и спецсимволы
+        Folder.objects.filter(id=folders['A1'].id).update(
+            attributes={'code': 'X', 'два слова': 'a & b', 'статус': '<архив>'}
+        )
+        Folder.objects.filter(id=folders['A2'].id).update(name='"Кавычки" & <скобки>')
+        attach(folders['A11'], 'D1')
+
+    def export(self, **params):
+        response = self.client.get(f'/api/structures/{self.structure.id}/export/', params)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content)
+
+    def test_round_trip(self):
+        expected = folder_tree(self.structure)
+        with mock.patch('structures.export.STREAM_BUFFER_SIZE', 64):
+            content = self.export()
+        copy = import_structure(content.decode(), name='Копия')
+        self.assertEqual(folder_tree(copy), expected)
+        names = {code: folder.name for code, folder in folders_by_code(copy).items()}
+        self.assertEqual(names, {code: folder.name for code, folder in folders_by_code(self.structure).items()})
+
+        structure = Structure.objects.create(name='Поток')
+        chunks = [content[i:i + 50] for i in range(0, len(content), 50)]
+        _, errors, _, name, _ = stream_import_structure(chunks, structure)
+        self.assertEqual((errors, name), ([], 'Тест'))
+        self.assertEqual(folder_tree(structure), expected)
+
+    def test_documents(self):
+        root = ET.fromstring(self.export(documents='true'))
+        document = root.find('.//folder[@code="A11"]/document')
+        self.assertEqual(document.attrib['code'], 'D1')
+        self.assertIsNone(ET.fromstring(self.export()).find('.//document'))
+        # При загрузке ссылки на документы игнорируются
+        structure = import_structure(ET.tostring(root, encoding='unicode'), name='Копия')
+        self.assertEqual(folder_tree(structure), folder_tree(self.structure))
+
+    def test_missing_structure(self):
+        self.assertEqual(self.client.get('/api/structures/999999/export/').status_code, 404)
+
+
+async def async_response_json(view, path, params=None, **kwargs):
+    """Вызов async представления: (статус, JSON ответа)"""
+    response = await view(AsyncRequestFactory().get(path, params or {}), **kwargs)
+    if response.streaming:
+        return response.status_code, json.loads(b''.join([chunk async for chunk in response.streaming_content]))
+    return response.status_code, json.loads(response.content)
+
+
+class AsyncReadViewsTest(TestCase):
+    """Async представления (ASYNC_READ_VIEWS) отвечают так же, как синхронные"""
+
+    def setUp(self):
+        self.structure = import_structure(ORDER_XML)
+        self.folders = folders_by_code(self.structure)
+        self.document = attach(self.folders['A1'], 'doc-A1')
+        attach(self.folders['A11'], 'doc-A11')
+        FolderDocument.objects.create(folder=self.folders['AB'], document=self.document)
+
+    def assertSameResponses(self, cases):
+        for view, path, params, kwargs in cases:
+            with self.subTest(path=path, params=params):
+                sync_response = self.client.get(path, params)
+                expected = (sync_response.status_code, response_json(sync_response))
+                self.assertEqual(async_to_sync(async_response_json)(view, path, params, **kwargs), expected)
+
+    def test_structures(self):
+        structure = {'structure_id': self.structure.id}
+        tree_url = f'/api/structures/{self.structure.id}/folders/'
+        self.assertSameResponses([
+            (structure_async_views.get_structures, '/api/structures/', {}, {}),
+            (structure_async_views.get_structures, '/api/structures/', {'order': 'name', 'limit': 1}, {}),
+            (structure_async_views.get_structures, '/api/structures/', {'cursor': 'x'}, {}),
+            (structure_async_views.get_structure_details, f'/api/structures/{self.structure.id}/', {}, structure),
+            (structure_async_views.get_folder_tree, tree_url, {}, structure),
+            (structure_async_views.get_folder_tree, tree_url, {'parent_id': self.folders['A'].id}, structure),
+            (structure_async_views.get_folder_tree, tree_url, {'depth': 2}, structure),
+            (structure_async_views.get_folder_tree, tree_url, {'depth': 'x'}, structure),
+            (structure_async_views.get_folder_tree, tree_url, {'parent_id': 999999}, structure),
+            (structure_async_views.search_structure, '/api/structures/search/', {'q': 'A1'}, {}),
+            (structure_async_views.search_structure, '/api/structures/search/', {}, {}),
+        ])
+        with self.assertRaises(Http404):
+            async_to_sync(structure_async_views.get_folder_tree)(AsyncRequestFactory().get('/'), structure_id=999999)
+
+    def test_documents(self):
+        folder = {'folder_id': self.folders['A1'].id}
+        folder_url = f"/api/documents/folder/{self.folders['A1'].id}/"
+        search_url = '/api/documents/search/'
+        self.assertSameResponses([
+            (document_async_views.get_document_details, f'/api/documents/{self.document.id}/',
+             {}, {'document_id': self.document.id}),
+            (document_async_views.get_document_details, '/api/documents/999999/', {}, {'document_id': 999999}),
+            (document_async_views.get_documents_by_folder, folder_url, {}, folder),
+            (document_async_views.get_documents_by_folder, folder_url, {'limit': 1, 'order': 'created'}, folder),
+            (document_async_views.get_documents_by_folder, '/api/documents/folder/999999/', {}, {'folder_id': 999999}),
+            (document_async_views.search_documents, search_url, {'q': 'doc'}, {}),
+            (document_async_views.search_documents, search_url,
+             {'folder_id': self.folders['A'].id, 'include_descendants': 'true'}, {}),
+            (document_async_views.search_documents, search_url, {'folder_id': 'x'}, {}),
+        ])
+
+
+class UploadTimingsTest(TestCase):
+    """Время этапов синхронной загрузки структуры сохраняется в ImportLog.stage_timings"""
+
+    def setUp(self):
+        blob_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(blob_dir.cleanup)
+        patcher = mock.patch('document_manager.storage.BLOB_ROOT', blob_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def upload(self, **data):
+        response = self.client.post('/api/structures/upload/', {
+            'file': SimpleUploadedFile('tree.xml', TREE_XML.encode()), **data
+        })
+        self.assertEqual(response.status_code, 200)
+        return ImportLog.objects.get(operation_type='STRUCTURE_IMPORT').stage_timings
+
+    def test_default(self):
+        self.assertEqual(set(self.upload()), {
+            'hash_ms', 'duplicate_check_ms', 'decode_ms', 'parse_ms', 'folder_resolution_ms',
+            'db_write_ms', 'file_persist_ms', 'total_ms'
+        })
+
+    def test_stream(self):
+        self.assertTrue({'stream_ms', 'folder_resolution_ms', 'db_write_ms', 'file_persist_ms', 'total_ms'}
+                        <= set(self.upload(mode='stream')))
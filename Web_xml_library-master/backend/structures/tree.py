@@ -0,0 +1,201 @@
+from django.db import connection
+from django.db.models import CharField, F, Func
+from django.db.models.functions import Collate
+
+from document_manager.responses import ITERATOR_CHUNK_SIZE, STREAM_BUFFER_SIZE, dumps
+from .models import Folder
+
+
+TREE_FIELDS = (
+    'id', 'parent_id', 'name', 'code', 'attributes',
+    'documents_count', 'subtree_documents_count', 'children_count'
+)
+
+
+def _make_node(row):
+    return {
+        'id': str(row['id']),
+        'name': row['name'],
+        'code': row['code'],
+        'attributes': row['attributes'],
+        'documents_count': row['documents_count'],
+        'subtree_documents_count': row['subtree_documents_count'],
+        'children_count': row['children_count'],
+        'has_children': row['children_count'] > 0,
+        'children': []
+    }
+
+
+def _sort_by_code(nodes):
+    """Сортировка узлов и их детей по коду (без рекурсии)"""
+    stack = [nodes]
+    while stack:
+        level = stack.pop()
+        level.sort(key=lambda node: node['code'])
+        stack.extend(node['children'] for node in level if node['children'])
+    return nodes
+
+
+class TreeSortKey(Func):
+    """
+    Ключ обхода в глубину: путь, где '/' заменен на символ 0x01.
+
+    0x01 меньше любого символа кода, и при побайтовом сравнении (C) строки
+    идут как кортежи кодов, как при сортировке в Python. Выражение без
+    параметров совпадает с индексом structures_folder_tree_order_idx
+    (миграция 0006), поэтому ORDER BY идет по индексу, без сортировки.
+    """
+    template = "REPLACE(%(expressions)s, '/', CHR(1))"
+    output_field = CharField()
+
+    def as_sqlite(self, compiler, connection, **extra_context):
+        return self.as_sql(compiler, connection, template="REPLACE(%(expressions)s, '/', CHAR(1))", **extra_context)
+
+
+def tree_order(path_field='materialized_path'):
+    """Порядок обхода в глубину с сортировкой детей по коду"""
+    key = TreeSortKey(F(path_field))
+    if connection.vendor == 'postgresql':
+        return Collate(key, 'C')
+    return key
+
+
+def tree_key(path):
+    """Значение TreeSortKey для пути, вычисленное в Python"""
+    return path.replace('/', '\x01')
+
+
+def _tree_rows(structure_id, parent):
+    folders = Folder.objects.filter(structure_id=structure_id)
+    if parent is not None:
+        # Поддерево - диапазон ключей (prefix, prefix с 0x02 вместо последнего 0x01)
+        # по тому же индексу, что и сортировка; сама папка в диапазон не входит
+        prefix = tree_key(parent.materialized_path)
+        folders = folders.alias(tree_key=tree_order()).filter(
+            tree_key__gt=prefix, tree_key__lt=prefix[:-1] + '\x02'
+        )
+    return folders.order_by(tree_order()).values(*TREE_FIELDS, 'materialized_path')
+
+
+class _TreeJsonWriter:
+    """
+    Строки папок в порядке обхода в глубину -> куски JSON массива дерева.
+
+    Узел открывается при чтении, закрывается, когда следующий путь уже не
+    внутри него. В памяти только стек открытых путей.
+    """
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.open_paths = []
+        self.separator = b''
+
+    def add(self, row):
+        """Добавить папку; возвращает кусок, когда накопился буфер"""
+        path = row['materialized_path']
+        while self.open_paths and not path.startswith(self.open_paths[-1]):
+            self.open_paths.pop()
+            self.buffer += b']}'
+            self.separator = b','
+
+        node = _make_node(row)
+        del node['children']
+        self.buffer += self.separator
+        self.buffer += dumps(node)[:-1]
+        self.buffer += b',"children":['
+        self.open_paths.append(path)
+        self.separator = b''
+
+        if len(self.buffer) >= STREAM_BUFFER_SIZE:
+            return self.flush()
+        return None
+
+    def close(self):
+        self.buffer += b']}' * len(self.open_paths)
+        self.open_paths = []
+        return self.flush()
+
+    def flush(self):
+        chunk = bytes(self.buffer)
+        self.buffer.clear()
+        return chunk
+
+
+def iter_tree_json(structure_id, parent=None):
+    """
+    Дерево (или поддерево parent) как содержимое JSON массива, кусками bytes.
+
+    Папки читаются одним запросом итератором в порядке обхода в глубину.
+    """
+    writer = _TreeJsonWriter()
+    for row in _tree_rows(structure_id, parent).iterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        chunk = writer.add(row)
+        if chunk:
+            yield chunk
+    chunk = writer.close()
+    if chunk:
+        yield chunk
+
+
+async def aiter_tree_json(structure_id, parent=None):
+    """iter_tree_json для async представлений (QuerySet.aiterator)"""
+    writer = _TreeJsonWriter()
+    async for row in _tree_rows(structure_id, parent).aiterator(chunk_size=ITERATOR_CHUNK_SIZE):
+        chunk = writer.add(row)
+        if chunk:
+            yield chunk
+    chunk = writer.close()
+    if chunk:
+        yield chunk
+
+
+def _level_filter(parent):
+    return {'parent_id': parent.id if parent is not None else None}
+
+
+def _attach_children(level_nodes, child_rows):
+    """Дети уровня к узлам level_nodes; возвращает узлы следующего уровня"""
+    next_level = {}
+    for row in child_rows:
+        node = _make_node(row)
+        parent_node = level_nodes[row['parent_id']]
+        parent_node['children'].append(node)
+        parent_node['has_children'] = True
+        next_level[row['id']] = node
+    return next_level
+
+
+def build_tree_levels(structure_id, parent=None, depth=1):
+    """
+    Дерево на depth уровней вниз от parent (или от корня): один запрос на уровень.
+
+    has_children для нижнего уровня берется из счетчика children_count.
+    """
+    folders = Folder.objects.filter(structure_id=structure_id)
+    level_rows = list(folders.filter(**_level_filter(parent)).values(*TREE_FIELDS))
+    roots = [_make_node(row) for row in level_rows]
+    level_nodes = {row['id']: node for row, node in zip(level_rows, roots)}
+
+    for _ in range(depth - 1):
+        if not level_nodes:
+            break
+        child_rows = list(folders.filter(parent_id__in=list(level_nodes)).values(*TREE_FIELDS))
+        level_nodes = _attach_children(level_nodes, child_rows)
+
+    return _sort_by_code(roots)
+
+
+async def abuild_tree_levels(structure_id, parent=None, depth=1):
+    """build_tree_levels для async представлений"""
+    folders = Folder.objects.filter(structure_id=structure_id)
+    level_rows = [row async for row in folders.filter(**_level_filter(parent)).values(*TREE_FIELDS)]
+    roots = [_make_node(row) for row in level_rows]
+    level_nodes = {row['id']: node for row, node in zip(level_rows, roots)}
+
+    for _ in range(depth - 1):
+        if not level_nodes:
+            break
+        child_rows = [row async for row in folders.filter(parent_id__in=list(level_nodes)).values(*TREE_FIELDS)]
+        level_nodes = _attach_children(level_nodes, child_rows)
+
+    return _sort_by_code(roots)
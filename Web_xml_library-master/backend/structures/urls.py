@@ -1,16 +1,27 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import async_views, views
+
+# Эндпоинты чтения: async представления под ASGI (settings.ASYNC_READ_VIEWS)
+read_views = async_views if settings.ASYNC_READ_VIEWS else views
 
 urlpatterns = [
     # Основные эндпоинты
-    path('', views.get_structures, name='structures'),
+    path('', read_views.get_structures, name='structures'),
     path('upload/', views.upload_structure_xml, name='upload_structure'),
-    path('search/', views.search_structure, name='search_structure'),
+    path('search/', read_views.search_structure, name='search_structure'),
+    path('autocomplete/', views.autocomplete_search, name='autocomplete_search'),
     path('test/', views.api_test, name='api_test'),
+    path('cache-stats/', views.cache_stats, name='cache_stats'),
+    path('folders/<int:folder_id>/move/', views.move_folder_view, name='move_folder'),
 
     # Эндпоинты для конкретной структуры
-    path('<int:structure_id>/', views.get_structure_details, name='structure_details'),
-    path('<int:structure_id>/folders/', views.get_folder_tree, name='folder_tree'),
+    path('<int:structure_id>/', read_views.get_structure_details, name='structure_details'),
+    path('<int:structure_id>/folders/', read_views.get_folder_tree, name='folder_tree'),
+    path('<int:structure_id>/reimport/', views.reimport_structure_xml, name='reimport_structure'),
+    path('<int:structure_id>/export/', views.export_structure, name='export_structure'),
     path('<int:structure_id>/consistency-check/', views.check_consistency, name='consistency_check'),
+    path('<int:structure_id>/consistency-check/<int:report_id>/', views.get_consistency_report,
+         name='consistency_report'),
     path('<int:structure_id>/delete/', views.delete_structure, name='delete_structure'),
 ]
\ No newline at end of file
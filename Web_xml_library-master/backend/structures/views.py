@@ -1,9 +1,11 @@
+import logging
 import tempfile
 from datetime import timezone
 import xml.etree.ElementTree as ET
 from django.db import transaction
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
 from django.views.decorators.csrf import csrf_exempt
 from django.db.models import Q
 import json
@@ -11,110 +13,35 @@ import hashlib
 import os
 import uuid
 from .models import Structure, Folder
+from .importer import (
+    TRACE_STAGES, apply_folder_diff, decode_xml_content, diff_folder_tree, import_folder_tree, parse_folder_tree,
+    summarize_folder_diff
+)
+from .streaming import TRACE_STAGES as STREAM_TRACE_STAGES, stream_import_structure
+from .tree import build_tree_levels, iter_tree_json
+from .export import iter_structure_xml
+from .search import AUTOCOMPLETE_LIMIT, AUTOCOMPLETE_MAX_LIMIT, autocomplete, substring_search
+from .moves import FolderMoveError, move_folder
+from .consistency import check_structure_consistency, get_background_report, start_background_check
+from .caching import (
+    bump_structure_version, bump_structures_list_version, cached_json_response,
+    get_cache_stats, structure_cache_key, structures_list_cache_key
+)
 from documents.models import Document, FolderDocument
+from document_manager.pagination import PaginationError, paginate
+from document_manager.responses import StreamingJsonResponse
+from document_manager.storage import BlobWriter, delete_upload, save_upload, store_blob
+from document_manager.tracing import start_trace
+from import_logs.jobs import enqueue_job, job_status_url
 from import_logs.models import ImportLog
 
+logger = logging.getLogger(__name__)
 
-def process_folder_hierarchy(folder_elem, structure, parent_folder, folder_cache=None, errors=None):
-    """Рекурсивная обработка папок с кэшированием"""
-    if folder_cache is None:
-        folder_cache = {}
-    if errors is None:
-        errors = []
-
-    # Извлекаем данные из XML
-    folder_name = folder_elem.get('name', '')
-    folder_code = folder_elem.get('code', '')
-
-    if not folder_code:
-        errors.append(f"Папка '{folder_name}' не имеет кода (атрибут 'code')")
-        return None, errors  # Пропускаем папку без кода
-
-    # Генерируем ключ кэша
-    cache_key = f"{structure.id}_{folder_code}_{parent_folder.id if parent_folder else 'root'}"
-
-    if cache_key in folder_cache:
-        return folder_cache[cache_key], errors
-
-    # Создаем materialized_path
-    if parent_folder:
-        materialized_path = f"{parent_folder.materialized_path}{folder_code}/"
-    else:
-        materialized_path = f"/{folder_code}/"
-
-    # Извлекаем атрибуты (может быть в разных форматах)
-    attributes = {}
-
-    # Вариант 1: атрибуты как подэлементы
-    for attr_elem in folder_elem.findall('attribute'):
-        attr_name = attr_elem.get('name')
-        attr_value = attr_elem.text
-        if attr_name and attr_value:
-            attributes[attr_name] = attr_value
-
-    # Вариант 2: атрибуты как атрибуты элемента
-    for attr_name, attr_value in folder_elem.attrib.items():
-        if attr_name not in ['name', 'code', 'id']:
-            attributes[attr_name] = attr_value
-
-    # Вариант 3: специальный элемент <attributes> с дочерними элементами
-    attrs_elem = folder_elem.find('attributes')
-    if attrs_elem is not None:
-        for attr_elem in attrs_elem:
-            attr_name = attr_elem.tag
-            attr_value = attr_elem.text or ''
-            attributes[attr_name] = attr_value
-
-    # Создаем или получаем папку
-    try:
-        folder, created = Folder.objects.get_or_create(
-            structure=structure,
-            code=folder_code,
-            defaults={
-                'name': folder_name,
-                'parent': parent_folder,
-                'materialized_path': materialized_path,
-                'attributes': attributes
-            }
-        )
-    except Exception as e:
-        # Если произошла ошибка (например, дубликат), попробуем другой подход
-        folder = Folder.objects.filter(
-            structure=structure,
-            code=folder_code,
-            parent=parent_folder
-        ).first()
-
-        if folder:
-            created = False
-            folder.name = folder_name
-            folder.materialized_path = materialized_path
-            folder.attributes = attributes
-            folder.save()
-        else:
-            raise e
-
-    # Если папка существовала, обновляем
-    if not created:
-        folder.name = folder_name
-        folder.materialized_path = materialized_path
-        folder.attributes = attributes
-        folder.save()
-
-    # Кэшируем результат
-    folder_cache[cache_key] = folder
-
-    # Рекурсивно обрабатываем детей - ВАЖНО: передаем errors тоже!
-    for child_elem in folder_elem.findall('folder'):
-        process_folder_hierarchy(child_elem, structure, folder, folder_cache, errors)
-
-    # Также обрабатываем вложенные папки, которые могут быть в других тегах
-    for child_elem in folder_elem.findall('*'):
-        if child_elem.tag != 'folder' and child_elem.find('folder') is not None:
-            for nested_folder in child_elem.findall('folder'):
-                process_folder_hierarchy(nested_folder, structure, folder, folder_cache, errors)
-
-    return folder, errors
+# Сортировки списка структур для курсорной пагинации
+STRUCTURE_ORDERINGS = {
+    'created': ('-created_at', '-id'),
+    'name': ('name', 'id'),
+}
 
 
 @csrf_exempt
@@ -128,12 +55,23 @@ def upload_structure_xml(request):
 
     uploaded_file = request.FILES['file']
 
+    # Потоковый режим для больших файлов: ?mode=stream или поле mode=stream,
+    # фоновый (ответ 202 с job_id, импорт выполняет run_import_worker): mode=async
+    mode = request.POST.get('mode') or request.GET.get('mode')
+    if mode == 'stream':
+        return upload_structure_xml_streaming(uploaded_file)
+    if mode == 'async':
+        return enqueue_structure_upload(uploaded_file)
+
+    trace = start_trace('STRUCTURE_IMPORT', uploaded_file.name)
     try:
-        file_content = uploaded_file.read()
-        file_hash = hashlib.sha256(file_content).hexdigest()
+        with trace.span('hash'):
+            file_content = uploaded_file.read()
+            file_hash = hashlib.sha256(file_content).hexdigest()
 
         # хеш алгоритм для сверки существующих папок
-        existing_structure = Structure.objects.filter(content_hash=file_hash).first()
+        with trace.span('duplicate_check'):
+            existing_structure = Structure.objects.filter(content_hash=file_hash).first()
         if existing_structure:
             return JsonResponse({
                 'success': True,
@@ -142,22 +80,16 @@ def upload_structure_xml(request):
                 'structure_id': existing_structure.id
             })
 
-        try:
-            xml_content = file_content.decode('utf-8')
-        except UnicodeDecodeError:
-            for encoding in ['cp1251', 'iso-8859-1', 'windows-1251']:
-                try:
-                    xml_content = file_content.decode(encoding)
-                    break
-                except UnicodeDecodeError:
-                    continue
-            else:
-                return JsonResponse({'error': 'Не удалось декодировать файл (поддерживаются UTF-8, CP1251)'},
-                                    status=400)
+        with trace.span('decode'):
+            xml_content = decode_xml_content(file_content)
+        if xml_content is None:
+            return JsonResponse({'error': 'Не удалось декодировать файл (поддерживаются UTF-8, CP1251)'},
+                                status=400)
 
         # Парсим XML
         try:
-            root = ET.fromstring(xml_content)
+            with trace.span('parse'):
+                root = ET.fromstring(xml_content)
         except ET.ParseError as e:
             return JsonResponse({'error': f'Неверный формат XML: {str(e)}'}, status=400)
 
@@ -168,62 +100,108 @@ def upload_structure_xml(request):
             struct_name = root.get('name') or uploaded_file.name.rsplit('.', 1)[0]
 
             # Создаем структуру
-            structure = Structure.objects.create(
-                name=struct_name,
-                description=f'Импортировано из {uploaded_file.name}',
-                content_hash=file_hash
-            )
+            with trace.span('db_write'):
+                structure = Structure.objects.create(
+                    name=struct_name,
+                    description=f'Импортировано из {uploaded_file.name}',
+                    content_hash=file_hash
+                )
+
+            # Обрабатываем папки: разбор всего дерева в память и запись по уровням
+            folders_processed, errors, timings = import_folder_tree(structure, root)
+            trace.merge(timings, TRACE_STAGES)
+
+            if errors:
+                # Откатываем транзакцию и возвращаем ошибки
+                transaction.set_rollback(True)
+                return JsonResponse({
+                    'error': 'Ошибки валидации папок',
+                    'errors': errors[:20]  # первые 20 ошибок
+                }, status=400)
 
-            # Обрабатываем папки
-            folders_processed = 0
-            folder_cache = {}
-            errors = []  # Создаем список ошибок здесь
+            # Сохраняем XML файл в хранилище по хэшу
+            with trace.span('file_persist'):
+                store_blob(file_content, file_hash)
 
-            folder_elements = []
+            bump_structures_list_version()
+
+            # Логируем импорт
+            ImportLog.objects.create(
+                operation_type='STRUCTURE_IMPORT',
+                filename=uploaded_file.name,
+                message=f'Структура "{structure.name}" импортирована. Папок: {folders_processed}',
+                items_processed=folders_processed,
+                stage_timings=trace.finish()
+            )
 
-            # папки прямо в корне
-            folder_elements.extend(root.findall('folder'))
+            return JsonResponse({
+                'success': True,
+                'structure_id': structure.id,
+                'structure_name': structure.name,
+                'folders_processed': folders_processed,
+                'filename': uploaded_file.name,
+                'timings': timings
+            })
 
-            # папки в элементе <folders>
-            folders_elem = root.find('folders')
-            if folders_elem is not None:
-                folder_elements.extend(folders_elem.findall('folder'))
+    except Exception as e:
+        logger.exception('Ошибка импорта структуры из %s', uploaded_file.name)
+        return JsonResponse({'error': f'Ошибка обработки: {str(e)}'}, status=500)
 
-            # папки в элементе <structure>
-            struct_elem = root.find('structure')
-            if struct_elem is not None:
-                folder_elements.extend(struct_elem.findall('folder'))
 
-            # Обрабатываем найденные папки
-            for folder_elem in folder_elements:
-                folder, folder_errors = process_folder_hierarchy(folder_elem, structure, None, folder_cache, errors)
-                # Ошибки уже добавляются в список errors внутри функции
+def upload_structure_xml_streaming(uploaded_file):
+    """Потоковая загрузка XML структуры: память не зависит от размера файла"""
+    trace = start_trace('STRUCTURE_IMPORT', uploaded_file.name)
+    # Файл пишется во временный файл хранилища тем же проходом, что и разбор
+    blob = BlobWriter()
+    try:
+        with transaction.atomic():
+            # Имя уточняется после разбора, хэш - после чтения всего файла
+            with trace.span('db_write'):
+                structure = Structure.objects.create(
+                    name=uploaded_file.name.rsplit('.', 1)[0],
+                    description=f'Импортировано из {uploaded_file.name}'
+                )
+
+            folders_processed, errors, file_hash, struct_name, timings = stream_import_structure(
+                uploaded_file.chunks(), structure, sink=blob
+            )
+            trace.merge(timings, STREAM_TRACE_STAGES)
 
             if errors:
-                # Откатываем транзакцию и возвращаем ошибки
                 transaction.set_rollback(True)
                 return JsonResponse({
                     'error': 'Ошибки валидации папок',
                     'errors': errors[:20]  # первые 20 ошибок
                 }, status=400)
 
-            # Считаем папки
-            folders_processed = Folder.objects.filter(structure=structure).count()
-
-            # Сохраняем XML файл
-            filename = f"{uuid.uuid4()}_{uploaded_file.name}"
-            file_path = os.path.join('media/uploads/structures', filename)
-
-            os.makedirs(os.path.dirname(file_path), exist_ok=True)
-            with open(file_path, 'wb') as f:
-                f.write(file_content)
-
-            # Логируем импорт
+            with trace.span('duplicate_check'):
+                existing_structure = Structure.objects.filter(content_hash=file_hash).exclude(
+                    id=structure.id
+                ).first()
+            if existing_structure:
+                transaction.set_rollback(True)
+                return JsonResponse({
+                    'success': True,
+                    'duplicate': True,
+                    'message': f'Структура уже была загружена ранее: {existing_structure.name}',
+                    'structure_id': existing_structure.id
+                })
+
+            structure.content_hash = file_hash
+            if struct_name:
+                structure.name = struct_name
+            with trace.span('db_write'):
+                structure.save(update_fields=['content_hash', 'name', 'updated_at'])
+            bump_structures_list_version()
+
+            with trace.span('file_persist'):
+                blob.commit(file_hash)
             ImportLog.objects.create(
                 operation_type='STRUCTURE_IMPORT',
                 filename=uploaded_file.name,
                 message=f'Структура "{structure.name}" импортирована. Папок: {folders_processed}',
-                items_processed=folders_processed
+                items_processed=folders_processed,
+                stage_timings=trace.finish()
             )
 
             return JsonResponse({
@@ -231,79 +209,241 @@ def upload_structure_xml(request):
                 'structure_id': structure.id,
                 'structure_name': structure.name,
                 'folders_processed': folders_processed,
-                'filename': uploaded_file.name
+                'filename': uploaded_file.name,
+                'timings': timings
             })
 
+    except ET.ParseError as e:
+        return JsonResponse({'error': f'Неверный формат XML: {str(e)}'}, status=400)
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.exception('Ошибка потокового импорта структуры из %s', uploaded_file.name)
         return JsonResponse({'error': f'Ошибка обработки: {str(e)}'}, status=500)
+    finally:
+        blob.discard()
+
+
+def enqueue_structure_upload(uploaded_file):
+    """Фоновая загрузка XML структуры: файл сохраняется и ставится задача импорта"""
+    upload, file_hash = save_upload(uploaded_file)
+
+    existing_structure = Structure.objects.filter(content_hash=file_hash).first()
+    if existing_structure:
+        delete_upload(upload)
+        return JsonResponse({
+            'success': True,
+            'duplicate': True,
+            'message': f'Структура уже была загружена ранее: {existing_structure.name}',
+            'structure_id': existing_structure.id
+        })
+
+    job = enqueue_job('STRUCTURE_IMPORT', uploaded_file.name, {
+        'upload': upload,
+        'file_hash': file_hash,
+        'file_size': uploaded_file.size
+    })
+    return JsonResponse({
+        'success': True,
+        'job_id': job.id,
+        'status': job.status,
+        'status_url': job_status_url(job)
+    }, status=202)
+
+
+@csrf_exempt
+def reimport_structure_xml(request, structure_id):
+    """
+    Повторный импорт измененного XML в существующую структуру.
+
+    Сравнивает новый файл с папками структуры по коду и применяет только
+    разницу. dry_run=true - только вернуть сводку изменений.
+    """
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Метод не разрешен'}, status=405)
+
+    if not request.FILES.get('file'):
+        return JsonResponse({'error': 'Файл не найден'}, status=400)
+
+    structure = get_object_or_404(Structure, id=structure_id)
+    uploaded_file = request.FILES['file']
+    dry_run = (request.POST.get('dry_run') or request.GET.get('dry_run')) == 'true'
+
+    trace = start_trace('UPDATE', uploaded_file.name)
+    try:
+        with trace.span('hash'):
+            file_content = uploaded_file.read()
+            file_hash = hashlib.sha256(file_content).hexdigest()
+
+        if file_hash == structure.content_hash:
+            return JsonResponse({
+                'success': True,
+                'structure_id': structure.id,
+                'unchanged': True,
+                'message': 'Файл совпадает с текущей версией структуры'
+            })
+
+        with trace.span('decode'):
+            xml_content = decode_xml_content(file_content)
+        if xml_content is None:
+            return JsonResponse({'error': 'Не удалось декодировать файл (поддерживаются UTF-8, CP1251)'},
+                                status=400)
+
+        try:
+            with trace.span('parse'):
+                root = ET.fromstring(xml_content)
+        except ET.ParseError as e:
+            return JsonResponse({'error': f'Неверный формат XML: {str(e)}'}, status=400)
+
+        if root.tag == 'organization':
+            root = root.find('structure') or root
+
+        with trace.span('folder_resolution'):
+            levels, errors = parse_folder_tree(root)
+        if errors:
+            return JsonResponse({
+                'error': 'Ошибки валидации папок',
+                'errors': errors[:20]  # первые 20 ошибок
+            }, status=400)
+
+        with transaction.atomic():
+            with trace.span('diff'):
+                diff = diff_folder_tree(structure, levels)
+                summary = summarize_folder_diff(diff)
+
+            if not dry_run:
+                with trace.span('db_write'):
+                    apply_folder_diff(structure, levels, diff)
+
+                    structure.content_hash = file_hash
+                    structure.save(update_fields=['content_hash', 'updated_at'])
+                bump_structure_version(structure.id)
+
+                ImportLog.objects.create(
+                    operation_type='UPDATE',
+                    filename=uploaded_file.name,
+                    message=f'Структура "{structure.name}" обновлена. Изменения: {summary["counts"]}',
+                    items_processed=len(diff['added']) + len(diff['changed']) + len(diff['removed']),
+                    stage_timings=trace.finish()
+                )
+
+        return JsonResponse({
+            'success': True,
+            'structure_id': structure.id,
+            'dry_run': dry_run,
+            'diff': summary
+        })
+
+    except Exception as e:
+        logger.exception('Ошибка повторного импорта структуры %s из %s', structure.id, uploaded_file.name)
+        return JsonResponse({'error': f'Ошибка обработки: {str(e)}'}, status=500)
+
+
+STRUCTURE_LIST_FIELDS = ('id', 'name', 'description', 'created_at', 'folders_count', 'documents_count')
+
+
+def structures_page_key(request):
+    """Параметры страницы входят в ключ кэша"""
+    page_params = '|'.join(request.GET.get(name, '') for name in ('order', 'cursor', 'limit', 'count'))
+    return hashlib.md5(page_params.encode('utf-8')).hexdigest()
+
+
 def get_structures(request):
     """Получить все структуры"""
-    structures = Structure.objects.filter(is_active=True).order_by('-created_at').values(
-        'id', 'name', 'description', 'created_at'
-    )
-    return JsonResponse({'structures': list(structures)})
+    def build_payload():
+        structures = Structure.objects.filter(is_active=True).values(*STRUCTURE_LIST_FIELDS)
+        try:
+            structures, page_info = paginate(structures, request, STRUCTURE_ORDERINGS)
+        except PaginationError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+        return {'structures': structures, **page_info}
 
+    return cached_json_response(request, structures_list_cache_key(structures_page_key(request)), build_payload)
 
-def get_folder_tree(request, structure_id):
-    """Дерево папок структуры"""
-    structure = get_object_or_404(Structure, id=structure_id)
 
-    def build_tree(parent_id=None):
-        folders = Folder.objects.filter(
-            structure_id=structure_id,
-            parent_id=parent_id
-        ).order_by('code')
+def parse_tree_params(request):
+    """(parent_id, depth) из параметров дерева или JsonResponse с ошибкой"""
+    parent_id = request.GET.get('parent_id')
+    if parent_id:
+        try:
+            parent_id = int(parent_id)
+        except ValueError:
+            return JsonResponse({'error': 'parent_id должен быть числом'}, status=400)
 
-        nodes = []
-        for folder in folders:
-            node = {
-                'id': str(folder.id),
-                'name': folder.name,
-                'code': folder.code,
-                'attributes': folder.attributes,
-                'has_children': Folder.objects.filter(parent=folder).exists(),
-                'children': build_tree(folder.id) if Folder.objects.filter(parent=folder).exists() else []
-            }
-            nodes.append(node)
+    depth = request.GET.get('depth')
+    if depth:
+        try:
+            depth = int(depth)
+        except ValueError:
+            return JsonResponse({'error': 'depth должен быть числом'}, status=400)
+        if depth < 1:
+            return JsonResponse({'error': 'depth должен быть положительным числом'}, status=400)
 
-        return nodes
+    return parent_id, depth
 
-    tree_data = build_tree()
 
-    return JsonResponse({
+def tree_header(structure):
+    return {
         'success': True,
         'structure': {
             'id': structure.id,
             'name': structure.name,
             'description': structure.description
-        },
-        'tree': tree_data
-    })
+        }
+    }
+
+
+def get_folder_tree(request, structure_id):
+    """
+    Дерево папок структуры.
+
+    ?parent_id= - поддерево указанной папки, ?depth= - только N уровней вниз
+    (для ленивой подгрузки в UI). Без depth дерево строится одним запросом.
+    """
+    params = parse_tree_params(request)
+    if isinstance(params, JsonResponse):
+        return params
+    parent_id, depth = params
+
+    def build_payload():
+        structure = get_object_or_404(Structure, id=structure_id)
+
+        parent = None
+        if parent_id:
+            try:
+                parent = Folder.objects.get(id=parent_id, structure_id=structure_id)
+            except Folder.DoesNotExist:
+                return JsonResponse({'error': 'Папка не найдена в структуре'}, status=404)
+
+        structure_data = tree_header(structure)
+        if depth:
+            return {**structure_data, 'tree': build_tree_levels(structure_id, parent, depth)}
+
+        # Полное дерево отдается потоком в порядке обхода, без сборки в памяти
+        return StreamingJsonResponse(
+            structure_data, 'tree', array_chunks=iter_tree_json(structure_id, parent)
+        )
+
+    cache_key = structure_cache_key(structure_id, 'tree', parent_id or '', depth or '')
+    return cached_json_response(request, cache_key, build_payload)
+
+
+def search_querysets(query):
+    """Папки и документы для поиска по подстроке (по 50)"""
+    folders = substring_search(Folder.objects.all(), query).values(
+        'id', 'name', 'code', 'materialized_path', 'structure_id', 'structure__name'
+    )[:50]
+    documents = substring_search(Document.objects.all(), query).values(
+        'id', 'name', 'code', 'created_at'
+    )[:50]
+    return folders, documents
 
 
 def search_structure(request):
     """Поиск по структурам и документам"""
-    from django.db.models import Q
-
     query = request.GET.get('q', '').strip()
     if not query:
         return JsonResponse({'error': 'Пустой запрос'}, status=400)
 
-    # Ищем папки
-    folders = Folder.objects.filter(
-        Q(name__icontains=query) |
-        Q(code__icontains=query)
-    ).select_related('structure').values(
-        'id', 'name', 'code', 'materialized_path', 'structure_id', 'structure__name'
-    )[:50]
-
-    # Ищем документы
-    documents = Document.objects.filter(
-        Q(name__icontains=query) |
-        Q(code__icontains=query)
-    ).values('id', 'name', 'code', 'created_at')[:50]
+    folders, documents = search_querysets(query)
 
     return JsonResponse({
         'success': True,
@@ -313,76 +453,155 @@ def search_structure(request):
     })
 
 
-def check_consistency(request, structure_id):
-    """Проверка консистентности данных структуры"""
-    structure = get_object_or_404(Structure, id=structure_id)
+def autocomplete_search(request):
+    """
+    Подсказки при вводе: папки и документы по префиксу и нечетко.
 
-    issues = []
-    folders = Folder.objects.filter(structure=structure)
-
-    #  Проверка циклов в дереве
-    for folder in folders:
-        current = folder
-        visited = set()
-        while current:
-            if current.id in visited:
-                issues.append(f'Обнаружен цикл в папке {folder.name} (ID: {folder.id})')
-                break
-            visited.add(current.id)
-            current = current.parent
-
-    # Проверка materialized_path
-    for folder in folders:
-        expected_path = '/'
-        if folder.parent:
-            expected_path = f"{folder.parent.materialized_path}{folder.code}/"
-        else:
-            expected_path = f"/{folder.code}/"
-
-        if folder.materialized_path != expected_path:
-            issues.append(
-                f'Несоответствие пути для папки {folder.name}: ожидалось {expected_path}, фактически {folder.materialized_path}')
-
-    from django.db.models import Count
-    duplicate_codes = folders.values('parent_id', 'code').annotate(
-        count=Count('id')
-    ).filter(count__gt=1)
-
-    for dup in duplicate_codes:
-        if dup['parent_id']:
-            parent = Folder.objects.get(id=dup['parent_id'])
-            issues.append(f'Дубликат кода "{dup["code"]}" в папке "{parent.name}"')
-        else:
-            issues.append(f'Дубликат кода "{dup["code"]}" в корневом уровне')
+    Параметры: q, structure_id (только папки этой структуры), limit (до AUTOCOMPLETE_MAX_LIMIT).
+    """
+    query = request.GET.get('q', '').strip()
+    if not query:
+        return JsonResponse({'error': 'Пустой запрос'}, status=400)
+
+    try:
+        limit = min(int(request.GET.get('limit', AUTOCOMPLETE_LIMIT)), AUTOCOMPLETE_MAX_LIMIT)
+    except ValueError:
+        return JsonResponse({'error': 'Некорректный limit'}, status=400)
+    if limit < 1:
+        return JsonResponse({'error': 'Некорректный limit'}, status=400)
+
+    folders_qs = Folder.objects.all()
+    structure_id = request.GET.get('structure_id')
+    if structure_id:
+        if not structure_id.isdigit():
+            return JsonResponse({'error': 'Некорректный structure_id'}, status=400)
+        folders_qs = folders_qs.filter(structure_id=int(structure_id))
+
+    folders = autocomplete(folders_qs, query, limit).values(
+        'id', 'name', 'code', 'structure_id', 'similarity'
+    )
+    documents = autocomplete(Document.objects.all(), query, limit).values(
+        'id', 'name', 'code', 'similarity'
+    )
 
     return JsonResponse({
         'success': True,
-        'structure': structure.name,
-        'total_folders': folders.count(),
-        'issues_found': len(issues),
-        'issues': issues,
-        'is_consistent': len(issues) == 0
+        'query': query,
+        'folders': list(folders),
+        'documents': list(documents)
     })
 
 
-def get_structure_details(request, structure_id):
-    """Получить детальную информацию о структуре"""
+def check_consistency(request, structure_id):
+    """
+    Проверка консистентности данных структуры.
+
+    ?background=true - проверка в фоне, отчет доступен по report_id.
+    """
     structure = get_object_or_404(Structure, id=structure_id)
 
-    # Статистика
-    total_folders = Folder.objects.filter(structure=structure).count()
-    root_folders = Folder.objects.filter(structure=structure, parent=None).count()
+    if request.GET.get('background') == 'true':
+        log = start_background_check(structure)
+        return JsonResponse({
+            'success': True,
+            'status': log.status,
+            'report_id': log.id,
+            'report_url': f'/api/structures/{structure.id}/consistency-check/{log.id}/',
+            'status_url': job_status_url(log)
+        }, status=202)
 
-    return JsonResponse({
+    return JsonResponse(check_structure_consistency(structure))
+
+
+def get_consistency_report(request, structure_id, report_id):
+    """Результат фоновой проверки консистентности"""
+    get_object_or_404(Structure, id=structure_id)
+    try:
+        log = get_background_report(structure_id, report_id)
+    except ImportLog.DoesNotExist:
+        return JsonResponse({'error': 'Отчет не найден'}, status=404)
+
+    if log.status in ('QUEUED', 'RUNNING'):
+        return JsonResponse({
+            'success': True,
+            'status': log.status,
+            'progress': log.progress,
+            'report_id': log.id
+        }, status=202)
+    if log.status == 'FAILED' or not log.result:
+        return JsonResponse({
+            'success': False,
+            'status': log.status,
+            'report_id': log.id,
+            'error': log.message or 'Отчет не сохранен',
+            'errors': log.errors
+        })
+    return JsonResponse(log.result)
+
+
+def structure_details(structure):
+    return {
         'success': True,
         'structure': {
             'id': structure.id,
             'name': structure.name,
             'description': structure.description,
             'created_at': structure.created_at.strftime('%d.%m.%Y %H:%M'),
-            'total_folders': total_folders,
-            'root_folders': root_folders
+            'total_folders': structure.folders_count,
+            'root_folders': structure.root_folders_count,
+            'total_documents': structure.documents_count
         }
+    }
+
+
+def get_structure_details(request, structure_id):
+    """Получить детальную информацию о структуре"""
+    def build_payload():
+        return structure_details(get_object_or_404(Structure, id=structure_id))
+
+    return cached_json_response(request, structure_cache_key(structure_id, 'details'), build_payload)
+
+
+@csrf_exempt
+def move_folder_view(request, folder_id):
+    """Перенос папки с поддеревом: {"parent_id": <id> или null для корня}"""
+    if request.method != 'POST':
+        return JsonResponse({'error': 'Метод не разрешен'}, status=405)
+
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'error': 'Неверный JSON'}, status=400)
+
+    if 'parent_id' not in data:
+        return JsonResponse({'error': 'Не указан parent_id'}, status=400)
+
+    new_parent_id = data['parent_id']
+    if new_parent_id is not None:
+        try:
+            new_parent_id = int(new_parent_id)
+        except (TypeError, ValueError):
+            return JsonResponse({'error': 'parent_id должен быть числом или null'}, status=400)
+
+    try:
+        folder, moved = move_folder(folder_id, new_parent_id)
+    except Folder.DoesNotExist:
+        return JsonResponse({'error': 'Папка не найдена'}, status=404)
+    except FolderMoveError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    if moved:
+        bump_structure_version(folder.structure_id)
+
+    return JsonResponse({
+        'success': True,
+        'folder': {
+            'id': folder.id,
+            'code': folder.code,
+            'parent_id': folder.parent_id,
+            'materialized_path': folder.materialized_path
+        },
+        'folders_updated': moved
     })
 
 
@@ -396,6 +615,7 @@ def delete_structure(request, structure_id):
     structure = get_object_or_404(Structure, id=structure_id)
     structure_name = structure.name
     structure.delete()
+    bump_structure_version(structure_id)
 
     return JsonResponse({
         'success': True,
@@ -403,6 +623,29 @@ def delete_structure(request, structure_id):
     })
 
 
+def export_structure(request, structure_id):
+    """
+    Экспорт структуры в XML (формат загрузки), потоком.
+
+    ?documents=true - добавить в папки ссылки на привязанные документы.
+    """
+    structure = get_object_or_404(Structure, id=structure_id)
+    include_documents = request.GET.get('documents') == 'true'
+
+    response = StreamingHttpResponse(
+        iter_structure_xml(structure, include_documents), content_type='application/xml; charset=utf-8'
+    )
+    response['Content-Disposition'] = content_disposition_header(
+        as_attachment=True, filename=f'{structure.name}.xml'
+    )
+    return response
+
+
+def cache_stats(request):
+    """Статистика попаданий в кэш деревьев и деталей структур"""
+    return JsonResponse({'success': True, 'cache': get_cache_stats()})
+
+
 def api_test(request):
     """Тестовый endpoint для проверки API"""
     return JsonResponse({
@@ -412,6 +655,9 @@ def api_test(request):
             'upload_structure': '/api/structures/upload/',
             'get_structures': '/api/structures/',
             'get_structure_tree': '/api/structures/<id>/folders/',
+            'search': '/api/structures/search/?q=...',
+            'autocomplete': '/api/structures/autocomplete/?q=...',
             'check_consistency': '/api/structures/<id>/consistency-check/',
+            'export_structure': '/api/structures/<id>/export/',
         }
     })
\ No newline at end of file